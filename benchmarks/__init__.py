@@ -0,0 +1,6 @@
+"""
+End-to-end benchmarks of the `query` tool on a synthetic MedicAir database.
+
+    python -m benchmarks generate --scale 1 --output medicair_bench.duckdb
+    python -m benchmarks run --db-path medicair_bench.duckdb --mode direct --mode stream --clients 1 --clients 8
+"""
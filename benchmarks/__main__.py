@@ -0,0 +1,191 @@
+import json
+import logging
+import os
+
+import anyio
+import click
+
+from mcp_server_medicair.capture import read_capture
+
+from .driver import check_server_args, run_direct, run_stdio, run_stream, stream_server
+from .generate import generate
+from .replay import compare, render_replay, replay
+from .report import render, summarize
+from .workload import sample_values
+
+logger = logging.getLogger("mcp_server_medicair")
+
+
+@click.group()
+@click.option("--verbose", is_flag=True, help="Log every query, as the server does")
+def cli(verbose):
+    """Benchmarks of the Medicair MCP Server on a synthetic MedicAir database"""
+    # Importing the server configures logging at INFO, and the database client logs every query it runs
+    logging.getLogger().setLevel(logging.WARNING)
+    logger.setLevel(logging.INFO if verbose else logging.WARNING)
+
+
+@cli.command("generate")
+@click.option("--output", default="medicair_bench.duckdb", show_default=True, help="DuckDB file to write")
+@click.option(
+    "--scale",
+    type=click.FloatRange(min=0, min_open=True),
+    default=1.0,
+    show_default=True,
+    help="Scale factor: 1 is the size of the MedicAir demo database, row counts grow linearly",
+)
+@click.option("--overwrite", is_flag=True, help="Replace the output file if it exists")
+def generate_command(output, scale, overwrite):
+    """Write a synthetic MedicAir database"""
+    logger.setLevel(logging.INFO)
+    generate(output, scale, overwrite)
+
+
+@cli.command("run")
+@click.option("--db-path", required=True, help="Benchmark database, see `generate`")
+@click.option(
+    "--mode",
+    "modes",
+    type=click.Choice(["direct", "stdio", "stream"]),
+    multiple=True,
+    default=["direct", "stdio", "stream"],
+    show_default=True,
+    help="How the query mix reaches the server: `DatabaseClient` in process, or an MCP transport. Can be repeated",
+)
+@click.option(
+    "--clients",
+    type=click.IntRange(min=1),
+    multiple=True,
+    default=[1, 4],
+    show_default=True,
+    help="Concurrent clients. Can be repeated to run each mode at several concurrencies",
+)
+@click.option("--requests", type=click.IntRange(min=1), default=500, show_default=True, help="Calls per run, split across the clients")
+@click.option("--warmup", type=click.IntRange(min=0), default=20, show_default=True, help="Untimed calls before each run")
+@click.option("--seed", type=int, default=0, show_default=True, help="Seed of the query mix")
+@click.option(
+    "--server-arg",
+    "server_args",
+    multiple=True,
+    help="Option passed to the servers of the stdio and stream modes, e.g. `--server-arg=--result-cache-size=0`. Can be repeated",
+)
+@click.option(
+    "--result-cache-size",
+    type=click.IntRange(min=0),
+    default=None,
+    help="Result cache size in MB of the direct mode's client, the server default if not set",
+)
+@click.option("--server-log", default=os.devnull, help="File the servers' logs are appended to")
+@click.option("--json-output", default=None, help="Also write the summaries to this JSON file")
+def run_command(
+    db_path,
+    modes,
+    clients,
+    requests,
+    warmup,
+    seed,
+    server_args,
+    result_cache_size,
+    server_log,
+    json_output,
+):
+    """Run the QUICK REFERENCE query mix and report latencies, throughput and peak RSS"""
+    if not os.path.exists(db_path):
+        raise click.BadParameter(f"{db_path} does not exist, create it with `generate`", param_hint="--db-path")
+    try:
+        check_server_args(list(server_args))
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--server-arg")
+    db_path = os.path.abspath(db_path)
+    values = sample_values(db_path)
+    client_options = {}
+    if result_cache_size is not None:
+        client_options["result_cache_size"] = result_cache_size * 1024 * 1024
+
+    summaries = []
+    for mode in modes:
+        for n in clients:
+            click.echo(f"⏱️ {mode} with {n} clients: {requests} calls", err=True)
+            if mode == "direct":
+                result = run_direct(db_path, values, n, requests, warmup, seed, **client_options)
+            else:
+                run = run_stdio if mode == "stdio" else run_stream
+                result = anyio.run(
+                    lambda: run(
+                        db_path,
+                        values,
+                        n,
+                        requests,
+                        warmup,
+                        seed,
+                        server_args=list(server_args),
+                        server_log=server_log,
+                    )
+                )
+            summaries.append(summarize(result))
+
+    click.echo(render(summaries))
+    if json_output:
+        with open(json_output, "w") as f:
+            json.dump(summaries, f, indent=2)
+
+
+@cli.command("replay")
+@click.option("--capture", "capture_file", required=True, help="Capture log written by the server's `--capture-file`")
+@click.option("--url", default=None, help="`stream` endpoint to replay against, e.g. http://127.0.0.1:8000/mcp")
+@click.option("--db-path", default=None, help="Instead of --url, start a `stream` server of this tree on this database")
+@click.option(
+    "--speed",
+    type=click.FloatRange(min=0),
+    default=1.0,
+    show_default=True,
+    help="Pacing as a multiple of the captured one: 2 replays twice as fast, 0 sends calls back to back",
+)
+@click.option("--concurrency", type=click.IntRange(min=1), default=4, show_default=True, help="Calls in flight at most, over as many sessions")
+@click.option("--server-arg", "server_args", multiple=True, help="Option passed to the server started with --db-path. Can be repeated")
+@click.option("--server-log", default=os.devnull, help="File the started server's logs are appended to")
+@click.option("--json-output", default=None, help="Write every replayed call to this JSON file, for `compare`")
+def replay_command(capture_file, url, db_path, speed, concurrency, server_args, server_log, json_output):
+    """Re-issue captured tool calls against a server and report captured vs replayed latencies"""
+    if (url is None) == (db_path is None):
+        raise click.UsageError("Pass either --url or --db-path")
+    try:
+        check_server_args(list(server_args))
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--server-arg")
+    calls = list(read_capture(capture_file))
+
+    async def run():
+        if url is not None:
+            return await replay(calls, url, speed, concurrency)
+        async with stream_server(os.path.abspath(db_path), list(server_args), server_log, 60.0) as base:
+            return await replay(calls, f"{base}/mcp", speed, concurrency)
+
+    click.echo(f"⏱️ Replaying {len(calls)} calls", err=True)
+    results = anyio.run(run)
+    click.echo(render_replay(results))
+    if json_output:
+        with open(json_output, "w") as f:
+            json.dump(
+                {"capture": os.path.abspath(capture_file), "speed": speed, "concurrency": concurrency, "calls": results},
+                f,
+                indent=2,
+            )
+
+
+@cli.command("compare")
+@click.argument("baseline", type=click.Path(exists=True, dir_okay=False))
+@click.argument("candidate", type=click.Path(exists=True, dir_okay=False))
+def compare_command(baseline, candidate):
+    """Compare two `replay --json-output` files of the same capture, e.g. replays on two builds"""
+    with open(baseline) as f:
+        before = json.load(f)
+    with open(candidate) as f:
+        after = json.load(f)
+    if before["capture"] != after["capture"]:
+        click.echo(f"⚠️ The replays are of different captures: {before['capture']}, {after['capture']}", err=True)
+    click.echo(compare(before["calls"], after["calls"]))
+
+
+if __name__ == "__main__":
+    cli()
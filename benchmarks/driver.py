@@ -0,0 +1,283 @@
+import contextlib
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import logging
+from typing import AsyncIterator, Awaitable, Callable
+
+import anyio
+import httpx
+from mcp import ClientSession
+from mcp.client.stdio import StdioServerParameters, stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+
+from mcp_server_medicair.database import DatabaseClient, RunningQuery
+
+from .report import RunResult, counter_delta, gauge, parse_metrics, phase_histograms
+from .workload import Workload
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger("mcp_server_medicair")
+
+METRICS_URI = "medicair://metrics"
+# Runs the server of the working tree, as the `mcp-server-medicair` script does
+SERVER_COMMAND = [sys.executable, "-c", "from mcp_server_medicair import main; main()"]
+
+
+def _split(requests: int, clients: int) -> list[int]:
+    """Calls each client makes so that they add up to `requests`"""
+    return [requests // clients + (1 if i < requests % clients else 0) for i in range(clients)]
+
+
+def _peak_rss() -> int | None:
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def run_direct(
+    db_path: str,
+    values: dict[str, list],
+    clients: int,
+    requests: int,
+    warmup: int = 0,
+    seed: int = 0,
+    **client_options,
+) -> RunResult:
+    """
+    Run the query mix on a `DatabaseClient` from `clients` threads. Phase
+    timings are exact per call. The peak RSS is the benchmark process's, so
+    it includes anything run before in the same process.
+    """
+    client = DatabaseClient(db_path=db_path, pool_size=clients, **client_options)
+    result = RunResult(mode="direct", clients=clients, duration=0.0)
+    lock = threading.Lock()
+
+    def call(workload: Workload, record: bool):
+        query, params = workload.next()
+        running = RunningQuery()
+        started = time.perf_counter()
+        try:
+            page = client.query_result(query.query, params=params or None, running=running)
+        except ValueError as e:
+            logger.warning(f"⚠️ {query.name} failed: {e}")
+            if record:
+                with lock:
+                    result.errors += 1
+            return
+        latency = time.perf_counter() - started
+        if record:
+            with lock:
+                result.latencies.append(latency)
+                result.per_query[query.name].append(latency)
+                for phase, seconds in running.timings.items():
+                    result.phases[phase].append(seconds)
+                result.rows += page.row_count
+                result.bytes += len(page.formatted.encode())
+
+    warm = Workload(values, seed=seed - 1)
+    for _ in range(warmup):
+        call(warm, record=False)
+
+    def worker(calls: int, n: int):
+        workload = Workload(values, seed=seed + n)
+        for _ in range(calls):
+            call(workload, record=True)
+
+    threads = [
+        threading.Thread(target=worker, args=(calls, n), daemon=True)
+        for n, calls in enumerate(_split(requests, clients))
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    result.duration = time.perf_counter() - started
+    result.peak_rss = _peak_rss()
+    client.pool.close()
+    return result
+
+
+async def _read_metrics(session: ClientSession):
+    contents = (await session.read_resource(METRICS_URI)).contents
+    return parse_metrics(contents[0].text)
+
+
+async def _drive(
+    result: RunResult,
+    sessions: list[ClientSession],
+    values: dict[str, list],
+    requests: int,
+    warmup: int,
+    seed: int,
+    scrape: Callable[[], Awaitable],
+):
+    """Run the query mix through `sessions`, one concurrent client each, and read the server's metrics around it"""
+
+    async def call(session: ClientSession, workload: Workload, record: bool):
+        query, params = workload.next()
+        arguments = {"query": query.query}
+        if params:
+            arguments["params"] = params
+        started = time.perf_counter()
+        try:
+            response = await session.call_tool("query", arguments)
+            failed = response.isError
+        except Exception as e:
+            logger.warning(f"⚠️ {query.name} failed: {e}")
+            failed = True
+        latency = time.perf_counter() - started
+        if not record:
+            return
+        if failed:
+            result.errors += 1
+        else:
+            result.latencies.append(latency)
+            result.per_query[query.name].append(latency)
+
+    warm = Workload(values, seed=seed - 1)
+    for _ in range(warmup):
+        await call(sessions[0], warm, record=False)
+
+    async def worker(session: ClientSession, calls: int, n: int):
+        workload = Workload(values, seed=seed + n)
+        for _ in range(calls):
+            await call(session, workload, record=True)
+
+    before = await scrape()
+    started = time.perf_counter()
+    async with anyio.create_task_group() as tg:
+        for n, calls in enumerate(_split(requests, len(sessions))):
+            tg.start_soon(worker, sessions[n], calls, n)
+    result.duration = time.perf_counter() - started
+    after = await scrape()
+    result.phase_histograms = phase_histograms(before, after)
+    result.rows = int(counter_delta(before, after, "medicair_rows_returned_total"))
+    result.bytes = int(counter_delta(before, after, "medicair_bytes_returned_total"))
+    peak_rss = gauge(after, "medicair_process_max_rss_bytes")
+    result.peak_rss = int(peak_rss) if peak_rss is not None else None
+
+
+async def run_stdio(
+    db_path: str,
+    values: dict[str, list],
+    clients: int,
+    requests: int,
+    warmup: int = 0,
+    seed: int = 0,
+    server_args: list[str] = (),
+    server_log: str = os.devnull,
+) -> RunResult:
+    """
+    Run the query mix through a server started on stdio. A stdio server has a
+    single client, so the `clients` are concurrent calls on one session.
+    """
+    result = RunResult(mode="stdio", clients=clients, duration=0.0)
+    parameters = StdioServerParameters(
+        command=SERVER_COMMAND[0],
+        args=[*SERVER_COMMAND[1:], "--transport", "stdio", "--db-path", db_path, *server_args],
+        env=dict(os.environ),
+    )
+    with open(server_log, "a") as errlog:
+        async with stdio_client(parameters, errlog=errlog) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                await _drive(
+                    result, [session] * clients, values, requests, warmup, seed, lambda: _read_metrics(session)
+                )
+    return result
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.asynccontextmanager
+async def stream_server(db_path: str, server_args: list[str], server_log: str, startup_timeout: float) -> AsyncIterator[str]:
+    """A `stream` server on a free local port, yielding its base URL once /health answers"""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    with open(server_log, "a") as errlog:
+        process = subprocess.Popen(
+            [
+                *SERVER_COMMAND,
+                "--transport",
+                "stream",
+                "--host",
+                "127.0.0.1",
+                "--port",
+                str(port),
+                "--db-path",
+                db_path,
+                *server_args,
+            ],
+            stdout=errlog,
+            stderr=errlog,
+        )
+        try:
+            async with httpx.AsyncClient() as http:
+                with anyio.fail_after(startup_timeout):
+                    while True:
+                        if process.poll() is not None:
+                            raise ValueError(f"The server exited with status {process.returncode}, see {server_log}")
+                        try:
+                            if (await http.get(f"{url}/health")).status_code == 200:
+                                break
+                        except httpx.TransportError:
+                            pass
+                        await anyio.sleep(0.2)
+            yield url
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+async def run_stream(
+    db_path: str,
+    values: dict[str, list],
+    clients: int,
+    requests: int,
+    warmup: int = 0,
+    seed: int = 0,
+    server_args: list[str] = (),
+    server_log: str = os.devnull,
+    startup_timeout: float = 60.0,
+) -> RunResult:
+    """Run the query mix through a `stream` server with one MCP session per client, scraping its /metrics"""
+    result = RunResult(mode="stream", clients=clients, duration=0.0)
+    async with stream_server(db_path, list(server_args), server_log, startup_timeout) as url:
+        async with contextlib.AsyncExitStack() as stack, httpx.AsyncClient() as http:
+            sessions = []
+            for _ in range(clients):
+                read, write, _ = await stack.enter_async_context(streamablehttp_client(f"{url}/mcp"))
+                session = await stack.enter_async_context(ClientSession(read, write))
+                await session.initialize()
+                sessions.append(session)
+
+            async def scrape():
+                return parse_metrics((await http.get(f"{url}/metrics")).text)
+
+            await _drive(result, sessions, values, requests, warmup, seed, scrape)
+    return result
+
+
+def check_server_args(server_args: list[str]):
+    for arg in server_args:
+        if arg.split("=")[0] in ("--transport", "--port", "--host", "--db-path"):
+            raise ValueError(f"{arg} is set by the benchmark driver")
+
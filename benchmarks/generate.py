@@ -0,0 +1,237 @@
+import logging
+import os
+
+import duckdb
+
+logger = logging.getLogger("mcp_server_medicair")
+
+# Rows (or entities) at scale factor 1, sized on the figures in prompt.py
+ARTICLES = 12_770
+SUPPLIERS = 304
+MACROGESTIONI = 107
+MATRICOLE = 1_765
+LABORATORIO_ARTICLES = 400
+SXT_ARTICLES = 40
+MOVEMENTS = 250_000
+
+DEPOSITS = ["50 Origgio (VA)", "10 Roma", "20 Napoli", "30 Bari", "40 Padova"]
+PHASES = [
+    "Inbound",
+    "Verifica e Analisi",
+    "Preparazione invio fornitore",
+    "Lavorazioni e collaudo",
+    "Outbound",
+]
+CAUSALI = ["Conto assegnazione", "Trasferimento tra depositi", "Reso a fornitore", "Vendita", "Rottamazione"]
+LINES = ["Ventilazione", "CPAP", "Ossigenoterapia", "Aspirazione", "Monitoraggio", "Ricambi", "Consumabili"]
+SXT_MODELS = ["AutoCPAP", "AutoCPAP cloud", "CPAP", "CPAP cloud"]
+MONTHS = ["GEN", "FEB", "MAR", "APR", "MAG", "GIU", "LUG", "AGO", "SET", "OTT", "NOV", "DIC"]
+YEARS = [2023, 2024, 2025]
+_WORK_STATES = ["IN LAVORAZIONE INTERNA", "IN LAVORAZIONE ESTERNA"]
+
+
+def _list(values: list[str]) -> str:
+    return "[" + ", ".join("'" + v.replace("'", "''") + "'" for v in values) + "]"
+
+
+def _machines_columns(machines: str, states: list[str]) -> str:
+    """Columns shared by `laboratorio` and `sxt`: stock, coverage, machines per state and monthly outflows"""
+    monthly = ",\n".join(
+        f'(rnd(i, {year * 100 + m}) * 4 * weekly)::INTEGER AS "{month} {year}"'
+        for year in YEARS
+        for m, month in enumerate(MONTHS, start=1)
+    )
+    yearly = ",\n".join(
+        f'(rnd(i, {year}) * 52 * weekly)::INTEGER AS "TOTALE {year}"' for year in YEARS
+    )
+    by_state = ",\n".join(
+        f'(rnd(i, {100 + n}) * machines / {len(states)})::INTEGER AS "{state}"'
+        for n, state in enumerate(states)
+    )
+    return f"""
+        "GIACENZA NUOVE",
+        "GIACENZA USATE",
+        "GIACENZA NUOVE" + "GIACENZA USATE" AS "GIACENZA TOTALE",
+        round(weekly, 2) AS "USCITE SETTIMANALI MEDIE 6 MESI",
+        round(("GIACENZA NUOVE" + "GIACENZA USATE") / greatest(weekly, 0.1), 1) AS "COPERTURA SETTIMANE",
+        (weekly * 4)::INTEGER AS "STOCK MINIMO",
+        machines::INTEGER AS "{machines}",
+        {by_state},
+        {monthly},
+        {yearly}
+    """
+
+
+def generate(path: str, scale: float = 1.0, overwrite: bool = False):
+    """
+    Write a synthetic MedicAir database to `path`, with the tables and columns
+    described in prompt.py. Row counts grow linearly with `scale`. Values are
+    derived from hashes of the row number, so the same scale always yields the
+    same data.
+    """
+    if scale <= 0:
+        raise ValueError("The scale factor must be positive")
+    if os.path.exists(path):
+        if not overwrite:
+            raise ValueError(f"{path} already exists")
+        os.remove(path)
+
+    def scaled(n: int) -> int:
+        return max(1, round(n * scale))
+
+    articles = scaled(ARTICLES)
+    matricole = scaled(MATRICOLE)
+    conn = duckdb.connect(path)
+    try:
+        # Uniform in [0, 1), deterministic in the row number and a per column salt
+        conn.execute("CREATE TEMP MACRO rnd(i, salt) AS (hash(i, salt) % 1000003) / 1000003.0")
+        # Article codes are skewed: a few codes account for most of the traffic
+        conn.execute(
+            f"CREATE TEMP MACRO articolo(i, salt) AS "
+            f"'ART' || lpad((floor(pow(rnd(i, salt), 3) * {articles}))::INTEGER::VARCHAR, 6, '0')"
+        )
+
+        logger.info(f"🧪 Generating dati ({articles} rows)")
+        conn.execute(f"""
+            CREATE TABLE dati AS
+            SELECT
+                'ART' || lpad(i::VARCHAR, 6, '0') AS "Codice articolo",
+                {_list(LINES)}[1 + (rnd(i, 1) * {len(LINES)})::INTEGER % {len(LINES)}]
+                    || ' modello ' || (i % 997)::VARCHAR AS "Descrizione",
+                'Fornitore ' || lpad(((rnd(i, 2) * {SUPPLIERS})::INTEGER)::VARCHAR, 3, '0') AS "Fornitore",
+                {_list(LINES)}[1 + (rnd(i, 1) * {len(LINES)})::INTEGER % {len(LINES)}] AS "Linea articolo",
+                'MG' || lpad(((rnd(i, 3) * {MACROGESTIONI})::INTEGER)::VARCHAR, 3, '0') AS "MACROGESTIONE",
+                round(5 + pow(rnd(i, 4), 2) * 4995, 2) AS "Prezzo acquisto",
+                rnd(i, 5) < 0.08 AS "Obsoleto"
+            FROM range({articles}) t(i)
+        """)
+
+        logger.info("🧪 Generating giacenze")
+        conn.execute(f"""
+            CREATE TABLE giacenze AS
+            SELECT
+                'ART' || lpad(a::VARCHAR, 6, '0') AS "Codice articolo",
+                {_list(DEPOSITS)}[1 + d] AS "Deposito",
+                nuove + usate AS "Giacenza",
+                nuove AS "Giacenza nuove",
+                usate AS "Giacenza usate",
+                (rnd(i, 13) * 20)::INTEGER AS "Ordini cliente in logistica",
+                (rnd(i, 14) * 10)::INTEGER AS "Altri ordini cliente",
+                (rnd(i, 15) * 8)::INTEGER AS "Ordini di trasferimento",
+                (rnd(i, 16) * 5)::INTEGER AS "DDT interni da ricevere"
+            FROM (
+                SELECT
+                    i, a, d,
+                    -- The main deposit holds most of the stock
+                    (pow(rnd(i, 11), 4) * (CASE WHEN d = 0 THEN 2000 ELSE 150 END))::INTEGER AS nuove,
+                    (pow(rnd(i, 12), 4) * (CASE WHEN d = 0 THEN 600 ELSE 40 END))::INTEGER AS usate
+                FROM (SELECT a * {len(DEPOSITS)} + d AS i, a, d FROM range({articles}) r(a), range({len(DEPOSITS)}) s(d))
+                WHERE d = 0 OR rnd(i, 10) < 0.15
+            )
+        """)
+
+        logger.info(f"🧪 Generating inbound_garage ({matricole} matricole)")
+        conn.execute(f"""
+            CREATE TABLE inbound_garage AS
+            SELECT
+                'MT' || lpad(m::VARCHAR, 7, '0') AS "Matricola",
+                CASE WHEN phases = {len(PHASES)} THEN 'Completato' ELSE 'In Corso' END AS "Stato flusso",
+                {_list(PHASES)}[1 + p] AS "Fase",
+                'Operatore ' || (1 + (rnd(i, 21) * 25)::INTEGER)::VARCHAR AS "Operatore",
+                inizio AS "Data inizio",
+                CASE WHEN p < phases - 1 OR phases = {len(PHASES)}
+                    THEN inizio + to_seconds((600 + rnd(i, 22) * 14400)::BIGINT) END AS "Data fine",
+                CASE WHEN p < phases - 1 OR phases = {len(PHASES)}
+                    THEN inizio + to_seconds((900 + rnd(i, 22) * 14400)::BIGINT) END AS "Data firma",
+                CASE WHEN p = 3 AND rnd(i, 23) < 0.6 THEN articolo(i, 24) END AS "Codice ricambio",
+                CASE WHEN p = 3 AND rnd(i, 23) < 0.6 THEN 'Ricambio ' || articolo(i, 24) END AS "Descrizione ricambio",
+                CASE WHEN p = 3 AND rnd(i, 23) < 0.6 THEN 'L' || (hash(i, 25) % 100000)::VARCHAR END AS "Seriale/Lotto",
+                {_list(DEPOSITS)}[1 + (CASE WHEN rnd(m, 26) < 0.8 THEN 0 ELSE (rnd(m, 27) * {len(DEPOSITS)})::INTEGER % {len(DEPOSITS)} END)] AS "Deposito",
+                'v' || (1 + (rnd(m, 28) * 4)::INTEGER)::VARCHAR || '.' || ((rnd(m, 29) * 10)::INTEGER)::VARCHAR AS "Versione firmware",
+                CASE WHEN p = 3 THEN CASE WHEN rnd(i, 30) < 0.95 THEN 'OK' ELSE 'KO' END END AS "Esito aggiornamento",
+                {_list(SXT_MODELS)}[1 + (rnd(m, 31) * {len(SXT_MODELS)})::INTEGER % {len(SXT_MODELS)}] AS "Modello",
+                articolo(m, 32) AS "Codice articolo",
+                'B' || lpad((hash(m, 33) % 1000000)::VARCHAR, 6, '0') AS "Numero bolla",
+                ['BRT', 'GLS', 'SDA', 'DHL'][1 + (rnd(m, 34) * 4)::INTEGER % 4] AS "Vettore"
+            FROM (
+                SELECT
+                    m, p, phases, m * {len(PHASES)} + p AS i,
+                    TIMESTAMP '2024-01-01' + to_seconds((rnd(m, 35) * 60 * 86400 * 10)::BIGINT)
+                        + to_seconds((p * 86400 * (1 + rnd(m, 36) * 3))::BIGINT) AS inizio
+                FROM (
+                    -- Half of the machines went through every phase, the others are still in one
+                    SELECT m, CASE WHEN rnd(m, 20) < 0.5 THEN {len(PHASES)}
+                        ELSE 1 + (rnd(m, 37) * {len(PHASES) - 1})::INTEGER % {len(PHASES) - 1} END AS phases
+                    FROM range({matricole}) t(m)
+                ), range({len(PHASES)}) s(p)
+                WHERE p < phases
+            )
+        """)
+
+        for table, count, machines, states, salt in (
+            ("laboratorio", scaled(LABORATORIO_ARTICLES), "MACCHINE DA LAVORARE", ["IN ATTESA", *_WORK_STATES], 40),
+            ("sxt", scaled(SXT_ARTICLES), "MACCHINE DA VALUTARE", ["STATO INIZIALE", *_WORK_STATES], 60),
+        ):
+            logger.info(f"🧪 Generating {table} ({count} rows)")
+            description = (
+                f"{_list(SXT_MODELS)}[1 + i % {len(SXT_MODELS)}] || ' SXT ' || i::VARCHAR"
+                if table == "sxt"
+                else "d.\"Descrizione\""
+            )
+            conn.execute(f"""
+                CREATE TABLE {table} AS
+                SELECT
+                    "CODICE ARTICOLO",
+                    "DESCRIZIONE",
+                    "MACROGESTIONE",
+                    "FORNITORE",
+                    {_machines_columns(machines, states)}
+                FROM (
+                    SELECT
+                        i,
+                        d."Codice articolo" AS "CODICE ARTICOLO",
+                        {description} AS "DESCRIZIONE",
+                        d."MACROGESTIONE" AS "MACROGESTIONE",
+                        {"'SXT S.r.l.'" if table == "sxt" else 'd."Fornitore"'} AS "FORNITORE",
+                        (pow(rnd(i, {salt}), 3) * 300)::INTEGER AS "GIACENZA NUOVE",
+                        (pow(rnd(i, {salt + 1}), 3) * 120)::INTEGER AS "GIACENZA USATE",
+                        0.2 + pow(rnd(i, {salt + 2}), 2) * 40 AS weekly,
+                        pow(rnd(i, {salt + 3}), 2) * {60 if table == "sxt" else 20} AS machines
+                    FROM (
+                        SELECT row_number() OVER () - 1 AS i, *
+                        FROM (SELECT * FROM dati ORDER BY hash("Codice articolo", {salt}) LIMIT {count})
+                    ) d
+                )
+            """)
+
+        movements = scaled(MOVEMENTS)
+        logger.info(f"🧪 Generating uscite_tot ({movements} rows)")
+        conn.execute(f"""
+            CREATE TABLE uscite_tot AS
+            SELECT
+                u.codice AS "Codice articolo",
+                d."Descrizione" AS "Descrizione articolo",
+                u."Anno",
+                u."Mese",
+                u."Causale",
+                u."Deposito",
+                u."Quantità",
+                d."Linea articolo",
+                l."CODICE ARTICOLO" IS NOT NULL AS "Foglio laboratorio"
+            FROM (
+                SELECT
+                    articolo(i, 50) AS codice,
+                    {YEARS[0]} + (rnd(i, 51) * {len(YEARS)})::INTEGER % {len(YEARS)} AS "Anno",
+                    1 + (rnd(i, 52) * 12)::INTEGER % 12 AS "Mese",
+                    {_list(CAUSALI)}[1 + (pow(rnd(i, 53), 2) * {len(CAUSALI)})::INTEGER % {len(CAUSALI)}] AS "Causale",
+                    {_list(DEPOSITS)}[1 + (CASE WHEN rnd(i, 54) < 0.85 THEN 0 ELSE (rnd(i, 55) * {len(DEPOSITS)})::INTEGER % {len(DEPOSITS)} END)] AS "Deposito",
+                    1 + (pow(rnd(i, 56), 6) * 200)::INTEGER AS "Quantità"
+                FROM range({movements}) t(i)
+            ) u
+            JOIN dati d ON d."Codice articolo" = u.codice
+            LEFT JOIN laboratorio l ON l."CODICE ARTICOLO" = u.codice
+        """)
+        conn.execute("CHECKPOINT")
+    finally:
+        conn.close()
+    logger.info(f"✅ Synthetic MedicAir database written to {path}")
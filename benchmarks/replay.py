@@ -0,0 +1,172 @@
+import contextlib
+import time
+import logging
+from collections import defaultdict
+
+import anyio
+from mcp import ClientSession
+from mcp.client.streamable_http import streamablehttp_client
+from tabulate import tabulate
+
+from .report import QUANTILES, quantile
+
+logger = logging.getLogger("mcp_server_medicair")
+
+# Their arguments refer to state of the captured server (result cursors), so
+# they can't be re-issued
+NOT_REPLAYABLE = {"query_next_page"}
+
+
+async def replay(
+    calls: list[dict],
+    url: str,
+    speed: float = 1.0,
+    concurrency: int = 4,
+) -> list[dict]:
+    """
+    Re-issue captured tool calls to the `stream` server at `url`. Calls start
+    at their captured offsets divided by `speed`, or back to back when `speed`
+    is 0, with at most `concurrency` in flight over as many MCP sessions. The
+    calls of one captured session always go through the same replay session.
+    Returns, per call, its captured and replayed latency, and when paced, how
+    late it started because every slot was busy.
+    """
+    calls = [c for c in calls if c["tool"] not in NOT_REPLAYABLE]
+    if not calls:
+        return []
+    origin = calls[0]["ts"]
+    limiter = anyio.CapacityLimiter(concurrency)
+    sessions: list[ClientSession] = []
+    # Captured session -> replay session
+    assigned: dict[str, int] = {}
+    results: list[dict] = []
+
+    async def call(index: int, entry: dict, session: ClientSession, scheduled: float | None):
+        async with limiter:
+            lag = None if scheduled is None else max(time.perf_counter() - scheduled, 0.0)
+            started = time.perf_counter()
+            error = None
+            try:
+                response = await session.call_tool(entry["tool"], entry["args"])
+                if response.isError:
+                    error = "".join(getattr(c, "text", "") for c in response.content)
+            except Exception as e:
+                error = str(e) or type(e).__name__
+            results.append(
+                {
+                    "index": index,
+                    "tool": entry["tool"],
+                    "capturedMs": entry.get("ms"),
+                    "capturedError": entry.get("error") is not None,
+                    "ms": round((time.perf_counter() - started) * 1000, 3),
+                    "lagMs": None if lag is None else round(lag * 1000, 3),
+                    "error": error,
+                }
+            )
+
+    async with contextlib.AsyncExitStack() as stack:
+        for _ in range(concurrency):
+            read, write, _ = await stack.enter_async_context(streamablehttp_client(url))
+            session = await stack.enter_async_context(ClientSession(read, write))
+            await session.initialize()
+            sessions.append(session)
+
+        start = time.perf_counter()
+        async with anyio.create_task_group() as tg:
+            for index, entry in enumerate(calls):
+                scheduled = None
+                if speed > 0:
+                    scheduled = start + (entry["ts"] - origin) / speed
+                    await anyio.sleep(max(0.0, scheduled - time.perf_counter()))
+                slot = assigned.setdefault(entry.get("session", ""), len(assigned) % concurrency)
+                tg.start_soon(call, index, entry, sessions[slot], scheduled)
+    return sorted(results, key=lambda r: r["index"])
+
+
+def _quantiles(values: list[float]) -> list[float | None]:
+    return [None if (v := quantile(values, q)) is None else round(v, 2) for q in QUANTILES]
+
+
+def render_replay(results: list[dict]) -> str:
+    """Captured against replayed latency quantiles per tool"""
+    by_tool: defaultdict[str, list[dict]] = defaultdict(list)
+    for result in results:
+        by_tool[result["tool"]].append(result)
+    rows = []
+    for tool, entries in sorted(by_tool.items()):
+        ok = [e for e in entries if e["error"] is None]
+        rows.append(
+            [
+                tool,
+                len(entries),
+                len(entries) - len(ok),
+                *_quantiles([e["capturedMs"] for e in ok if e["capturedMs"] is not None]),
+                *_quantiles([e["ms"] for e in ok]),
+                _quantiles([e["lagMs"] for e in entries if e["lagMs"] is not None])[1],
+            ]
+        )
+    return tabulate(
+        rows,
+        headers=[
+            "tool",
+            "calls",
+            "errors",
+            "captured p50",
+            "p95",
+            "p99",
+            "replayed p50",
+            "p95",
+            "p99",
+            "lag p95",
+        ],
+    )
+
+
+def compare(baseline: list[dict], candidate: list[dict]) -> str:
+    """
+    Latency quantiles per tool of two replays of the same capture, e.g. on two
+    builds, and the median ratio of their latencies call by call
+    """
+    paired = {r["index"]: r for r in baseline if r["error"] is None}
+    ratios: defaultdict[str, list[float]] = defaultdict(list)
+    for result in candidate:
+        before = paired.get(result["index"])
+        if before is not None and result["error"] is None and before["ms"] > 0:
+            ratios[result["tool"]].append(result["ms"] / before["ms"])
+            ratios["(all)"].append(result["ms"] / before["ms"])
+
+    def latencies(results: list[dict]) -> defaultdict[str, list[float]]:
+        out: defaultdict[str, list[float]] = defaultdict(list)
+        for r in results:
+            if r["error"] is None:
+                out[r["tool"]].append(r["ms"])
+                out["(all)"].append(r["ms"])
+        return out
+
+    before, after = latencies(baseline), latencies(candidate)
+    rows = []
+    for tool in sorted(set(before) | set(after)):
+        a, b = _quantiles(before[tool]), _quantiles(after[tool])
+        change = [
+            None if x is None or y is None or x == 0 else f"{(y - x) / x:+.1%}" for x, y in zip(a, b)
+        ]
+        median_ratio = quantile(ratios[tool], 0.5)
+        rows.append(
+            [tool, *a, *b, *change, None if median_ratio is None else round(median_ratio, 3)]
+        )
+    return tabulate(
+        rows,
+        headers=[
+            "tool",
+            "base p50",
+            "p95",
+            "p99",
+            "new p50",
+            "p95",
+            "p99",
+            "Δ p50",
+            "Δ p95",
+            "Δ p99",
+            "median new/base",
+        ],
+    )
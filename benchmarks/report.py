@@ -0,0 +1,170 @@
+import math
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from tabulate import tabulate
+
+PHASES = ("execute", "fetch", "format")
+QUANTILES = (0.5, 0.95, 0.99)
+
+_SAMPLE = re.compile(r'^([A-Za-z_:][A-Za-z0-9_:]*)(?:\{(.*)\})?\s+(\S+)$')
+_LABEL = re.compile(r'([A-Za-z_][A-Za-z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+# name -> [(labels, value)]
+Samples = dict[str, list[tuple[dict[str, str], float]]]
+
+
+@dataclass
+class RunResult:
+    """What one benchmark run measured, before it is summarized"""
+
+    mode: str
+    clients: int
+    duration: float
+    # Seconds per call, as seen by the client
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+    per_query: defaultdict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    # Exact seconds per phase and call, known when the client runs in process
+    phases: defaultdict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    # Otherwise the server's phase histograms over the run: phase -> [(upper bound, count)]
+    phase_histograms: dict[str, list[tuple[float, float]]] = field(default_factory=dict)
+    rows: int = 0
+    bytes: int = 0
+    peak_rss: int | None = None
+
+
+def quantile(values: list[float], q: float) -> float | None:
+    """Linearly interpolated quantile of `values`"""
+    if not values:
+        return None
+    values = sorted(values)
+    position = (len(values) - 1) * q
+    low = math.floor(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def histogram_quantile(buckets: list[tuple[float, float]], q: float) -> float | None:
+    """Quantile of cumulative (upper bound, count) buckets, interpolated within a bucket as Prometheus does"""
+    if not buckets or buckets[-1][1] <= 0:
+        return None
+    rank = q * buckets[-1][1]
+    lower, below = 0.0, 0.0
+    for bound, count in buckets:
+        if count >= rank:
+            if math.isinf(bound):
+                # Beyond the last finite bucket, its bound is the best estimate
+                return lower
+            return lower + (bound - lower) * (rank - below) / max(count - below, 1e-12)
+        lower, below = bound, count
+    return lower
+
+
+def parse_metrics(text: str) -> Samples:
+    """Samples of a Prometheus text exposition, by metric name"""
+    samples: Samples = defaultdict(list)
+    for line in text.splitlines():
+        match = _SAMPLE.match(line.strip())
+        if not match or line.startswith("#"):
+            continue
+        name, labels, value = match.groups()
+        parsed = {k: v.encode().decode("unicode_escape") for k, v in _LABEL.findall(labels or "")}
+        samples[name].append((parsed, float(value)))
+    return samples
+
+
+def phase_histograms(before: Samples, after: Samples) -> dict[str, list[tuple[float, float]]]:
+    """Per phase buckets of the query phase histograms observed between two scrapes, all databases summed"""
+    deltas: defaultdict[str, defaultdict[float, float]] = defaultdict(lambda: defaultdict(float))
+    for samples, sign in ((after, 1), (before, -1)):
+        for labels, value in samples.get("medicair_query_phase_seconds_bucket", []):
+            deltas[labels["phase"]][float(labels["le"])] += sign * value
+    return {phase: sorted(buckets.items()) for phase, buckets in deltas.items()}
+
+
+def counter_delta(before: Samples, after: Samples, name: str) -> float:
+    total = sum(value for _, value in after.get(name, []))
+    return total - sum(value for _, value in before.get(name, []))
+
+
+def gauge(samples: Samples, name: str) -> float | None:
+    values = [value for _, value in samples.get(name, [])]
+    return max(values) if values else None
+
+
+def _ms(seconds: float | None) -> float | None:
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def summarize(result: RunResult) -> dict:
+    """Throughput, p50/p95/p99 latencies overall, per phase and per query, and peak RSS of one run"""
+    calls = len(result.latencies) + result.errors
+    phases = {}
+    for phase in PHASES:
+        if result.phases.get(phase):
+            phases[phase] = {f"p{round(q * 100)}": _ms(quantile(result.phases[phase], q)) for q in QUANTILES}
+        elif result.phase_histograms.get(phase):
+            buckets = result.phase_histograms[phase]
+            phases[phase] = {f"p{round(q * 100)}": _ms(histogram_quantile(buckets, q)) for q in QUANTILES}
+    return {
+        "mode": result.mode,
+        "clients": result.clients,
+        "calls": calls,
+        "errors": result.errors,
+        "seconds": round(result.duration, 3),
+        "throughput": round(calls / result.duration, 2) if result.duration else None,
+        "latencyMs": {f"p{round(q * 100)}": _ms(quantile(result.latencies, q)) for q in QUANTILES},
+        "phasesMs": phases,
+        # Exact per call in process, estimated from the server's histogram buckets otherwise
+        "phasesExact": bool(result.phases),
+        "queriesMs": {
+            name: {f"p{round(q * 100)}": _ms(quantile(values, q)) for q in QUANTILES}
+            for name, values in sorted(result.per_query.items())
+        },
+        "rows": result.rows,
+        "bytes": result.bytes,
+        "peakRssMb": round(result.peak_rss / 1024 / 1024, 1) if result.peak_rss else None,
+    }
+
+
+def render(summaries: list[dict]) -> str:
+    """Text tables of summarized runs: one row per run, then per phase and per query latencies"""
+    runs = tabulate(
+        [
+            [
+                s["mode"],
+                s["clients"],
+                s["calls"],
+                s["errors"],
+                s["throughput"],
+                s["latencyMs"]["p50"],
+                s["latencyMs"]["p95"],
+                s["latencyMs"]["p99"],
+                s["peakRssMb"],
+            ]
+            for s in summaries
+        ],
+        headers=["mode", "clients", "calls", "errors", "calls/s", "p50 ms", "p95 ms", "p99 ms", "peak RSS MB"],
+    )
+    phases = tabulate(
+        [
+            [s["mode"], s["clients"], phase + ("" if s["phasesExact"] else " ~"), *values.values()]
+            for s in summaries
+            for phase, values in s["phasesMs"].items()
+        ],
+        headers=["mode", "clients", "phase", "p50 ms", "p95 ms", "p99 ms"],
+    )
+    queries = tabulate(
+        [
+            [s["mode"], s["clients"], name, *values.values()]
+            for s in summaries
+            for name, values in s["queriesMs"].items()
+        ],
+        headers=["mode", "clients", "query", "p50 ms", "p95 ms", "p99 ms"],
+    )
+    return (
+        f"{runs}\n\nPhases (~: estimated from the server's histogram buckets)\n{phases}"
+        f"\n\nQueries\n{queries}\n"
+    )
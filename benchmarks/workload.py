@@ -0,0 +1,186 @@
+import random
+from dataclasses import dataclass, field
+
+import duckdb
+
+
+@dataclass
+class BenchmarkQuery:
+    """One question of the QUICK REFERENCE in prompt.py, as the SQL an assistant would run for it"""
+
+    name: str
+    question: str
+    query: str
+    # Relative frequency in the mix
+    weight: int = 1
+    # What the `$1`, `$2`, ... placeholders stand for, in order. Values are
+    # sampled from the database and bound as the `query` tool's `params`.
+    parameters: tuple[str, ...] = ()
+
+
+QUERY_MIX = [
+    BenchmarkQuery(
+        name="disponibilita_articolo",
+        question="Disponibilità articolo X?",
+        query="""
+            SELECT g.*, d."Descrizione", d."Fornitore"
+            FROM giacenze g JOIN dati d ON d."Codice articolo" = g."Codice articolo"
+            WHERE g."Codice articolo" = $1
+        """,
+        weight=6,
+        parameters=("codice",),
+    ),
+    BenchmarkQuery(
+        name="fornitore_articolo",
+        question="Chi è il fornitore di X?",
+        query="""
+            SELECT "Codice articolo", "Descrizione", "Fornitore", "Prezzo acquisto"
+            FROM dati WHERE "Codice articolo" = $1
+        """,
+        weight=4,
+        parameters=("codice",),
+    ),
+    BenchmarkQuery(
+        name="stato_matricola",
+        question="Dove si trova la matricola Y?",
+        query="""
+            SELECT i."Matricola", i."Stato flusso", i."Fase", i."Operatore", i."Data inizio", i."Data fine",
+                   i."Deposito", d."Descrizione"
+            FROM inbound_garage i LEFT JOIN dati d ON d."Codice articolo" = i."Codice articolo"
+            WHERE i."Matricola" = $1
+            ORDER BY i."Data inizio" DESC
+        """,
+        weight=5,
+        parameters=("matricola",),
+    ),
+    BenchmarkQuery(
+        name="tempi_riparazione",
+        question="Quanto tempo per riparare Z?",
+        query="""
+            SELECT "Fase", count(*) AS lavorazioni,
+                   round(avg(epoch("Data fine") - epoch("Data inizio")) / 3600, 2) AS ore_medie
+            FROM inbound_garage
+            WHERE "Modello" = $1 AND "Data fine" IS NOT NULL
+            GROUP BY "Fase"
+            ORDER BY ore_medie DESC
+        """,
+        weight=2,
+        parameters=("modello",),
+    ),
+    BenchmarkQuery(
+        name="macchine_da_lavorare",
+        question="Quante macchine da lavorare?",
+        query="""
+            SELECT 'laboratorio' AS origine, "MACROGESTIONE", sum("MACCHINE DA LAVORARE") AS macchine
+            FROM laboratorio GROUP BY ALL
+            UNION ALL
+            SELECT 'sxt', "MACROGESTIONE", sum("MACCHINE DA VALUTARE") FROM sxt GROUP BY ALL
+            ORDER BY macchine DESC
+        """,
+        weight=2,
+    ),
+    BenchmarkQuery(
+        name="trend_uscite",
+        question="Trend uscite ultimo anno?",
+        query="""
+            SELECT "Anno", "Mese", sum("Quantità") AS uscite, count(DISTINCT "Codice articolo") AS articoli
+            FROM uscite_tot
+            WHERE "Anno" = $1
+            GROUP BY "Anno", "Mese"
+            ORDER BY "Anno", "Mese"
+        """,
+        weight=3,
+        parameters=("anno",),
+    ),
+    BenchmarkQuery(
+        name="stock_critico",
+        question="Stock critico?",
+        query="""
+            SELECT l."CODICE ARTICOLO", d."Descrizione", d."Fornitore", l."GIACENZA TOTALE", l."STOCK MINIMO",
+                   l."COPERTURA SETTIMANE", g.giacenza
+            FROM laboratorio l
+            JOIN dati d ON d."Codice articolo" = l."CODICE ARTICOLO"
+            LEFT JOIN (
+                SELECT "Codice articolo", sum("Giacenza") AS giacenza FROM giacenze GROUP BY ALL
+            ) g ON g."Codice articolo" = l."CODICE ARTICOLO"
+            WHERE l."GIACENZA TOTALE" < l."STOCK MINIMO"
+            ORDER BY l."COPERTURA SETTIMANE"
+        """,
+        weight=2,
+    ),
+    BenchmarkQuery(
+        name="ricambi_matricola",
+        question="Ricambi usati su matricola?",
+        query="""
+            SELECT i."Codice ricambio", i."Descrizione ricambio", i."Seriale/Lotto", d."Prezzo acquisto"
+            FROM inbound_garage i LEFT JOIN dati d ON d."Codice articolo" = i."Codice ricambio"
+            WHERE i."Matricola" = $1 AND i."Codice ricambio" IS NOT NULL
+        """,
+        weight=3,
+        parameters=("matricola",),
+    ),
+    BenchmarkQuery(
+        name="sxt_da_valutare",
+        question="Macchine SXT da valutare?",
+        query="""
+            SELECT s."CODICE ARTICOLO", s."DESCRIZIONE", s."MACCHINE DA VALUTARE", s."STATO INIZIALE",
+                   g.giacenza
+            FROM sxt s
+            LEFT JOIN (
+                SELECT "Codice articolo", sum("Giacenza") AS giacenza FROM giacenze GROUP BY ALL
+            ) g ON g."Codice articolo" = s."CODICE ARTICOLO"
+            WHERE s."MACCHINE DA VALUTARE" > 0
+            ORDER BY s."MACCHINE DA VALUTARE" DESC
+        """,
+        weight=1,
+    ),
+    BenchmarkQuery(
+        name="movimenti_mese",
+        question="Movimenti magazzino mese X?",
+        query="""
+            SELECT u."Causale", u."Deposito", d."Linea articolo", sum(u."Quantità") AS quantita, count(*) AS movimenti
+            FROM uscite_tot u JOIN dati d ON d."Codice articolo" = u."Codice articolo"
+            WHERE u."Anno" = $1 AND u."Mese" = $2
+            GROUP BY ALL
+            ORDER BY quantita DESC
+        """,
+        weight=3,
+        parameters=("anno", "mese"),
+    ),
+]
+
+# Values the placeholders are drawn from. Codes follow the traffic of uscite_tot,
+# so popular articles are asked about more often.
+_SAMPLES = {
+    "codice": 'SELECT "Codice articolo" FROM uscite_tot USING SAMPLE reservoir(500 ROWS) REPEATABLE (42)',
+    "matricola": 'SELECT DISTINCT "Matricola" FROM inbound_garage',
+    "modello": 'SELECT DISTINCT "Modello" FROM inbound_garage',
+    "anno": 'SELECT DISTINCT "Anno" FROM uscite_tot',
+    "mese": 'SELECT DISTINCT "Mese" FROM uscite_tot',
+}
+
+
+def sample_values(db_path: str) -> dict[str, list]:
+    """Parameter values to draw from, read from the benchmark database"""
+    conn = duckdb.connect(db_path, read_only=True)
+    try:
+        return {name: [row[0] for row in conn.execute(query).fetchall()] for name, query in _SAMPLES.items()}
+    finally:
+        conn.close()
+
+
+@dataclass
+class Workload:
+    """Draws the next query of the mix, and its parameters, by weight"""
+
+    values: dict[str, list]
+    queries: list[BenchmarkQuery] = field(default_factory=lambda: list(QUERY_MIX))
+    seed: int = 0
+
+    def __post_init__(self):
+        self._random = random.Random(self.seed)
+
+    def next(self) -> tuple[BenchmarkQuery, list]:
+        query = self._random.choices(self.queries, weights=[q.weight for q in self.queries])[0]
+        params = [self._random.choice(self.values[name]) for name in query.parameters]
+        return query, params
@@ -1,8 +1,56 @@
+import time
+
+# Start of the startup report's timeline, before the server's own imports
+_IMPORT_STARTED = time.perf_counter()
+
+import os
+import json
 import anyio
 import logging
 import click
 from .server import build_application
-from .configs import SERVER_VERSION, SERVER_LOCALHOST, UVICORN_LOGGING_CONFIG
+from .monitoring import Monitor
+from .startup import Startup
+from .routing import check_unique, load_databases, parse_database_option
+from .s3 import S3Options
+from .formatters import FORMATTERS
+from .workers import WORKER_OPTIONS_ENV, WorkerMetrics, check_worker_options, run_workers
+from .configs import (
+    SERVER_VERSION,
+    SERVER_LOCALHOST,
+    UVICORN_LOGGING_CONFIG,
+    DEFAULT_QUERY_WORKERS,
+    DEFAULT_QUERY_QUEUE_SIZE,
+    DEFAULT_POOL_IDLE_TIMEOUT,
+    DEFAULT_READ_ONLY_IDLE_TIMEOUT,
+    DEFAULT_RESULT_CACHE_SIZE,
+    DEFAULT_RESULT_CACHE_TTL,
+    DEFAULT_MAX_ROWS,
+    DEFAULT_MAX_RESULT_BYTES,
+    DEFAULT_CURSOR_TTL,
+    DEFAULT_MAX_CURSORS_PER_SESSION,
+    DEFAULT_RESULT_FORMAT,
+    DEFAULT_SPOOL_MAX_BYTES,
+    DEFAULT_PROGRESS_INTERVAL,
+    DEFAULT_QUERY_TIMEOUT,
+    DEFAULT_SCHEMA_CATALOG_TTL,
+    DEFAULT_SUMMARY_REFRESH_INTERVAL,
+    DEFAULT_MIRROR_REFRESH_INTERVAL,
+    DEFAULT_S3_CACHE_MAX_BYTES,
+    DEFAULT_S3_HTTP_TIMEOUT,
+    DEFAULT_S3_HTTP_RETRIES,
+    DEFAULT_PREPARED_CACHE_SIZE,
+    DEFAULT_ADVISOR_MIN_QUERIES,
+    DEFAULT_ADVISOR_REPLAY_ROWS,
+    DEFAULT_PROFILE_HISTORY,
+    DEFAULT_HEALTH_TIMEOUT,
+    DEFAULT_SESSION_IDLE_TIMEOUT,
+    DEFAULT_MAX_SESSIONS,
+    DEFAULT_EVENT_STORE_SIZE,
+    DEFAULT_SHUTDOWN_TIMEOUT,
+)
+
+_IMPORT_FINISHED = time.perf_counter()
 
 __version__ = SERVER_VERSION
 
@@ -30,6 +78,24 @@ logging.basicConfig(
     default="md:",
     help="(Default: `md:`) Path to local DuckDB database file or MotherDuck database",
 )
+@click.option(
+    "--database",
+    "extra_databases",
+    multiple=True,
+    help="Another database to serve, as NAME=PATH. Tool calls choose it with their `database` argument. Can be repeated.",
+)
+@click.option(
+    "--attach",
+    "attached_databases",
+    multiple=True,
+    help="A database to attach read-only to the --db-path one as NAME=PATH, so queries can join its tables as NAME.table. Can be repeated.",
+)
+@click.option(
+    "--databases-file",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="JSON file listing other databases to serve, with their own settings: [{name, db_path, read_only, saas_mode, motherduck_token, query_workers, query_queue_size, attach}]",
+)
 @click.option(
     "--motherduck-token",
     default=None,
@@ -50,12 +116,340 @@ logging.basicConfig(
     is_flag=True,
     help="Flag for connecting to DuckDB in read-only mode. Only supported for local DuckDB databases. Also makes use of short lived connections so multiple MCP clients or other systems can remain active (though each operation must be done sequentially).",
 )
+@click.option(
+    "--read-only-idle-timeout",
+    type=click.FloatRange(min=0),
+    default=DEFAULT_READ_ONLY_IDLE_TIMEOUT,
+    show_default=True,
+    help="Seconds the read-only connection is kept warm after the last query before the file is released. Set to 0 to close it after every query. Only used with `--read-only`.",
+)
 @click.option(
     "--json-response",
     is_flag=True,
     default=False,
     help="(Default: `False`) Enable JSON responses instead of SSE streams. Only supported for `stream` transport.",
 )
+@click.option(
+    "--query-workers",
+    type=click.IntRange(min=1),
+    default=DEFAULT_QUERY_WORKERS,
+    show_default=True,
+    help="Number of worker threads used to run queries off the event loop",
+)
+@click.option(
+    "--query-queue-size",
+    type=click.IntRange(min=0),
+    default=DEFAULT_QUERY_QUEUE_SIZE,
+    show_default=True,
+    help="Maximum number of queries waiting for a free worker. Further calls are rejected until the queue drains.",
+)
+@click.option(
+    "--pool-size",
+    type=click.IntRange(min=1),
+    default=None,
+    help="(Default: `--query-workers`) Maximum number of pooled DuckDB cursors used to run queries in parallel",
+)
+@click.option(
+    "--pool-idle-timeout",
+    type=click.FloatRange(min=0),
+    default=DEFAULT_POOL_IDLE_TIMEOUT,
+    show_default=True,
+    help="Seconds an idle pooled cursor is kept before it is closed",
+)
+@click.option(
+    "--result-cache-size",
+    type=click.IntRange(min=0),
+    default=DEFAULT_RESULT_CACHE_SIZE // (1024 * 1024),
+    show_default=True,
+    help="Size in MB of the in-process cache for results of deterministic read-only queries. Set to 0 to disable it.",
+)
+@click.option(
+    "--result-cache-ttl",
+    type=click.FloatRange(min=0),
+    default=DEFAULT_RESULT_CACHE_TTL,
+    show_default=True,
+    help="Seconds cached results stay valid for MotherDuck and S3 databases. Local DuckDB files are invalidated when the file changes.",
+)
+@click.option(
+    "--max-rows",
+    type=click.IntRange(min=1),
+    default=DEFAULT_MAX_ROWS,
+    show_default=True,
+    help="Maximum number of rows returned per page by the query tool. Larger results come back with a cursor for the next page.",
+)
+@click.option(
+    "--max-result-bytes",
+    type=click.IntRange(min=1),
+    default=DEFAULT_MAX_RESULT_BYTES,
+    show_default=True,
+    help="Approximate maximum size in bytes of one page of rendered results",
+)
+@click.option(
+    "--cursor-ttl",
+    type=click.FloatRange(min=0),
+    default=DEFAULT_CURSOR_TTL,
+    show_default=True,
+    help="Seconds an unread result cursor is kept open on the server",
+)
+@click.option(
+    "--max-cursors-per-session",
+    type=click.IntRange(min=0),
+    default=DEFAULT_MAX_CURSORS_PER_SESSION,
+    show_default=True,
+    help="Maximum number of result cursors one MCP session can keep open. The oldest is closed to make room. Set to 0 to disable pagination.",
+)
+@click.option(
+    "--structured-content",
+    is_flag=True,
+    default=False,
+    help="(Default: `False`) Also return query results as MCP `structuredContent` (columns and rows), e.g. for Apps SDK widgets",
+)
+@click.option(
+    "--result-format",
+    type=click.Choice(list(FORMATTERS)),
+    default=DEFAULT_RESULT_FORMAT,
+    show_default=True,
+    help="Default format of query results. Clients can override it per call with the `format` argument of the query tool.",
+)
+@click.option(
+    "--max-col-width",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Truncate rendered values longer than this many characters (e.g. long `descrizione` text). Not truncated by default.",
+)
+@click.option(
+    "--spool-dir",
+    default=None,
+    help="Directory where the `export_query` tool writes Arrow/Parquet results. A temporary directory is used by default.",
+)
+@click.option(
+    "--spool-max-size",
+    type=click.IntRange(min=1),
+    default=DEFAULT_SPOOL_MAX_BYTES // (1024 * 1024),
+    show_default=True,
+    help="Size in MB of exported results kept in the spool directory. The oldest exports are deleted first.",
+)
+@click.option(
+    "--progress-interval",
+    type=click.FloatRange(min=0),
+    default=DEFAULT_PROGRESS_INTERVAL,
+    show_default=True,
+    help="Seconds between progress notifications sent for long running tool calls, when the client asks for progress. Set to 0 to disable them.",
+)
+@click.option(
+    "--query-timeout",
+    type=click.FloatRange(min=0),
+    default=DEFAULT_QUERY_TIMEOUT,
+    show_default=True,
+    help="Seconds a query may run before it is interrupted. Clients can pass a lower `timeout` per call. Set to 0 to disable it.",
+)
+@click.option(
+    "--schema-catalog-ttl",
+    type=click.FloatRange(min=0),
+    default=DEFAULT_SCHEMA_CATALOG_TTL,
+    show_default=True,
+    help="Seconds the cached schema of a MotherDuck or S3 database is used before it is reloaded. Local files are reloaded when they change. Set to 0 to only reload after DDL run through this server.",
+)
+@click.option(
+    "--summaries-file",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="JSON file with the materialized summaries to build, a list of {name, query, description, refresh_interval}. Defaults to the built-in MedicAir summaries.",
+)
+@click.option(
+    "--summaries/--no-summaries",
+    "enable_summaries",
+    default=True,
+    show_default=True,
+    help="Build materialized summary tables and answer matching aggregate queries from them",
+)
+@click.option(
+    "--summary-refresh-interval",
+    type=click.FloatRange(min=0),
+    default=DEFAULT_SUMMARY_REFRESH_INTERVAL,
+    show_default=True,
+    help="Seconds after which summaries of a MotherDuck or S3 database are rebuilt. Local files are rebuilt when they change. Set to 0 to only rebuild after writes through this server.",
+)
+@click.option(
+    "--mirror/--no-mirror",
+    default=False,
+    show_default=True,
+    help="Keep a local DuckDB copy of a MotherDuck or S3 database and answer SELECT queries from it",
+)
+@click.option(
+    "--mirror-dir",
+    type=click.Path(file_okay=False),
+    default=None,
+    help="Directory for the local mirror, reused across restarts. Defaults to a temporary directory removed on exit.",
+)
+@click.option(
+    "--mirror-tables",
+    default=None,
+    help="Comma separated tables (`table` or `schema.table`) to mirror. Defaults to every table and view of the database.",
+)
+@click.option(
+    "--mirror-refresh-interval",
+    type=click.FloatRange(min=0),
+    default=DEFAULT_MIRROR_REFRESH_INTERVAL,
+    show_default=True,
+    help="Seconds between checks of a mirrored S3 database for changes, or between copies of a mirrored MotherDuck database. Set to 0 to only refresh after writes through this server.",
+)
+@click.option(
+    "--templates-file",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="JSON file with the query templates to expose as tools, a list of {name, description, query, parameters, database, cache}. Defaults to the built-in MedicAir lookups.",
+)
+@click.option(
+    "--templates/--no-templates",
+    "enable_templates",
+    default=True,
+    show_default=True,
+    help="Expose the query templates as tools",
+)
+@click.option(
+    "--prepared-cache-size",
+    type=click.IntRange(min=0),
+    default=DEFAULT_PREPARED_CACHE_SIZE,
+    show_default=True,
+    help="Prepared statements kept per pooled cursor for queries with `params`, least recently used first out. Set to 0 to disable.",
+)
+@click.option(
+    "--advisor/--no-advisor",
+    default=False,
+    show_default=True,
+    help="Record the columns queries filter on and expose the `advise_indexes` tool, which proposes indexes and sort orders. Off by default: every executed SELECT is parsed once more to record its filters",
+)
+@click.option(
+    "--advisor-min-queries",
+    type=click.IntRange(min=1),
+    default=DEFAULT_ADVISOR_MIN_QUERIES,
+    show_default=True,
+    help="Queries that must have filtered on a column before the index advisor proposes a change for it",
+)
+@click.option(
+    "--advisor-replay-rows",
+    type=click.IntRange(min=1),
+    default=DEFAULT_ADVISOR_REPLAY_ROWS,
+    show_default=True,
+    help="Rows of a table copied to replay the index advisor's proposals on, larger tables are cut at this size",
+)
+@click.option(
+    "--profile-history",
+    type=click.IntRange(min=0),
+    default=DEFAULT_PROFILE_HISTORY,
+    show_default=True,
+    help="Query profiles (`explain` and `query` with `profile`) kept for the medicair://profiles resource, oldest evicted first",
+)
+@click.option(
+    "--s3-cache-dir",
+    type=click.Path(file_okay=False),
+    default=None,
+    help="(S3 only) Directory of a persistent on-disk cache of remote file blocks (cache_httpfs extension), kept across restarts",
+)
+@click.option(
+    "--s3-cache-max-size",
+    type=click.IntRange(min=1),
+    default=DEFAULT_S3_CACHE_MAX_BYTES // (1024 * 1024),
+    show_default=True,
+    help="(S3 only) Size cap in MB of the block cache directory, least recently used blocks are evicted",
+)
+@click.option(
+    "--s3-http-keep-alive/--no-s3-http-keep-alive",
+    default=True,
+    show_default=True,
+    help="(S3 only) Reuse HTTP connections between requests",
+)
+@click.option(
+    "--s3-http-timeout",
+    type=click.FloatRange(min=1),
+    default=DEFAULT_S3_HTTP_TIMEOUT,
+    show_default=True,
+    help="(S3 only) Seconds before an HTTP request times out",
+)
+@click.option(
+    "--s3-http-retries",
+    type=click.IntRange(min=0),
+    default=DEFAULT_S3_HTTP_RETRIES,
+    show_default=True,
+    help="(S3 only) Retries of a failed HTTP request",
+)
+@click.option(
+    "--s3-threads",
+    type=click.IntRange(min=1),
+    default=None,
+    help="(S3 only) DuckDB threads, i.e. byte ranges fetched in parallel. Defaults to the number of CPUs",
+)
+@click.option(
+    "--s3-prefetch/--no-s3-prefetch",
+    default=False,
+    show_default=True,
+    help="(S3 only) Read every table in the background on startup to fill the block cache",
+)
+@click.option(
+    "--health-timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    default=DEFAULT_HEALTH_TIMEOUT,
+    show_default=True,
+    help="(SSE/stream only) Seconds /health waits for each database to answer before reporting 503",
+)
+@click.option(
+    "--capture-file",
+    default=None,
+    help="Append every tool call (arguments, session, latency, result size) to this JSON lines file, for `python -m benchmarks replay`",
+)
+@click.option(
+    "--compact-descriptions",
+    is_flag=True,
+    default=False,
+    help="(Default: `False`) Keep tool descriptions short and serve the MedicAir context as the `medicair://context` resource, fetched once by the client",
+)
+@click.option(
+    "--stateful",
+    is_flag=True,
+    default=False,
+    help="(Default: `False`) (stream only) Keep MCP sessions between requests, so result cursors and session accounting survive reconnects and dropped SSE streams can be resumed",
+)
+@click.option(
+    "--session-idle-timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    default=DEFAULT_SESSION_IDLE_TIMEOUT,
+    show_default=True,
+    help="Seconds without a request after which a session is closed and its result cursors released",
+)
+@click.option(
+    "--max-sessions",
+    type=click.IntRange(min=1),
+    default=DEFAULT_MAX_SESSIONS,
+    show_default=True,
+    help="(stream with --stateful only) Sessions open at once, new sessions are refused beyond it",
+)
+@click.option(
+    "--event-store-size",
+    type=click.IntRange(min=0),
+    default=DEFAULT_EVENT_STORE_SIZE,
+    show_default=True,
+    help="(stream with --stateful only) Messages kept for clients to resume a dropped SSE stream with Last-Event-ID. `0` disables resumption",
+)
+@click.option(
+    "--event-store-path",
+    default=None,
+    help="(stream with --stateful only) Keep the resumable messages in this SQLite file instead of in memory",
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="(stream only) Server processes sharing the port, each with its own database connections. Local database files are opened read-only",
+)
+@click.option(
+    "--shutdown-timeout",
+    type=click.FloatRange(min=0),
+    default=DEFAULT_SHUTDOWN_TIMEOUT,
+    show_default=True,
+    help="(SSE/stream only) Seconds to wait for requests in flight when the server is stopped. `0` waits for them indefinitely",
+)
 def main(
     port,
     host,
@@ -65,21 +459,155 @@ def main(
     home_dir,
     saas_mode,
     read_only,
+    read_only_idle_timeout,
     json_response,
+    query_workers,
+    query_queue_size,
+    pool_size,
+    pool_idle_timeout,
+    result_cache_size,
+    result_cache_ttl,
+    max_rows,
+    max_result_bytes,
+    cursor_ttl,
+    max_cursors_per_session,
+    structured_content,
+    result_format,
+    max_col_width,
+    spool_dir,
+    spool_max_size,
+    progress_interval,
+    query_timeout,
+    schema_catalog_ttl,
+    summaries_file,
+    enable_summaries,
+    summary_refresh_interval,
+    mirror,
+    mirror_dir,
+    mirror_tables,
+    mirror_refresh_interval,
+    templates_file,
+    enable_templates,
+    prepared_cache_size,
+    advisor,
+    advisor_min_queries,
+    advisor_replay_rows,
+    profile_history,
+    s3_cache_dir,
+    s3_cache_max_size,
+    s3_http_keep_alive,
+    s3_http_timeout,
+    s3_http_retries,
+    s3_threads,
+    s3_prefetch,
+    extra_databases,
+    attached_databases,
+    databases_file,
+    health_timeout,
+    capture_file,
+    compact_descriptions,
+    stateful,
+    session_idle_timeout,
+    max_sessions,
+    event_store_size,
+    event_store_path,
+    workers,
+    shutdown_timeout,
+    worker_metrics_dir=None,
 ):
-    """Main entry point for the package."""
-
-    logger.info("🦆 Medicair MCP Server v" + SERVER_VERSION)
-    logger.info("Ready to execute SQL queries via DuckDB/MotherDuck")
-
+    """Main entry point for the package. `worker_metrics_dir` is set in the processes of `--workers`"""
+
+    if worker_metrics_dir is None:
+        logger.info("🦆 Medicair MCP Server v" + SERVER_VERSION)
+        logger.info("Ready to execute SQL queries via DuckDB/MotherDuck")
+
+    databases = [parse_database_option(value) for value in extra_databases]
+    databases += [parse_database_option(value, attach=True) for value in attached_databases]
+    if databases_file:
+        databases += load_databases(databases_file)
+    check_unique(databases)
+    if workers > 1:
+        read_only, databases = check_worker_options(transport, stateful, mirror, db_path, read_only, databases)
+        if worker_metrics_dir is None:
+            # The processes build their servers from the same options
+            run_workers(click.get_current_context().params, host, port, workers, shutdown_timeout or None)
+            return
+
+    startup = Startup(started_at=_IMPORT_STARTED)
+    startup.add("import", _IMPORT_STARTED, _IMPORT_FINISHED - _IMPORT_STARTED)
+    monitor = Monitor()
+    if worker_metrics_dir is not None:
+        monitor.workers = WorkerMetrics(worker_metrics_dir)
     app, init_opts = build_application(
         db_path=db_path,
         motherduck_token=motherduck_token,
         home_dir=home_dir,
         saas_mode=saas_mode,
         read_only=read_only,
+        read_only_idle_timeout=read_only_idle_timeout,
+        query_workers=query_workers,
+        query_queue_size=query_queue_size,
+        pool_size=pool_size,
+        pool_idle_timeout=pool_idle_timeout,
+        result_cache_size=result_cache_size * 1024 * 1024,
+        result_cache_ttl=result_cache_ttl,
+        max_rows=max_rows,
+        max_result_bytes=max_result_bytes,
+        cursor_ttl=cursor_ttl,
+        max_cursors_per_session=max_cursors_per_session,
+        structured_content=structured_content,
+        result_format=result_format,
+        max_col_width=max_col_width,
+        spool_dir=spool_dir,
+        spool_max_bytes=spool_max_size * 1024 * 1024,
+        progress_interval=progress_interval,
+        query_timeout=query_timeout,
+        schema_catalog_ttl=schema_catalog_ttl,
+        summaries_file=summaries_file,
+        enable_summaries=enable_summaries,
+        summary_refresh_interval=summary_refresh_interval,
+        mirror=mirror,
+        mirror_dir=mirror_dir,
+        mirror_tables=[t.strip() for t in mirror_tables.split(",") if t.strip()] if mirror_tables else None,
+        mirror_refresh_interval=mirror_refresh_interval,
+        s3_options=S3Options(
+            cache_dir=s3_cache_dir,
+            cache_max_bytes=s3_cache_max_size * 1024 * 1024,
+            http_keep_alive=s3_http_keep_alive,
+            http_timeout=s3_http_timeout,
+            http_retries=s3_http_retries,
+            threads=s3_threads,
+            prefetch=s3_prefetch,
+        ),
+        databases=databases,
+        prepared_cache_size=prepared_cache_size,
+        templates_file=templates_file,
+        enable_templates=enable_templates,
+        advisor=advisor,
+        advisor_min_queries=advisor_min_queries,
+        advisor_replay_rows=advisor_replay_rows,
+        profile_history=profile_history,
+        monitor=monitor,
+        capture_file=capture_file,
+        startup=startup,
+        compact_descriptions=compact_descriptions,
+        session_idle_timeout=session_idle_timeout,
     )
 
+    async def handle_health(request):
+        from starlette.responses import JSONResponse
+
+        healthy, status = await monitor.health(health_timeout)
+        return JSONResponse(
+            {"status": "ok" if healthy else "unavailable", "databases": status},
+            status_code=200 if healthy else 503,
+        )
+
+    async def handle_metrics(request):
+        from starlette.responses import PlainTextResponse
+
+        return PlainTextResponse(monitor.render(), media_type="text/plain; version=0.0.4")
+
     if transport == "sse":
         from mcp.server.sse import SseServerTransport
         from starlette.applications import Starlette
@@ -97,9 +625,6 @@ def main(
                 await app.run(read_stream, write_stream, init_opts)
             return Response()
 
-        async def handle_health(request):
-            return Response("OK", status_code=200)
-
         logger.info(
             f"🦆 Connect to Medicair MCP Server at \033[1m\033[36mhttp://{SERVER_LOCALHOST}:{port}/sse\033[0m"
         )
@@ -108,6 +633,7 @@ def main(
             debug=True,
             routes=[
                 Route("/health", endpoint=handle_health, methods=["GET"]),
+                Route("/metrics", endpoint=handle_metrics, methods=["GET"]),
                 Route("/sse", endpoint=handle_sse, methods=["GET"]),
                 Mount("/messages/", app=sse.handle_post_message),
             ],
@@ -120,6 +646,7 @@ def main(
             host=host,
             port=port,
             log_config=UVICORN_LOGGING_CONFIG,
+            timeout_graceful_shutdown=shutdown_timeout or None,
         )
 
     elif transport == "stream":
@@ -127,41 +654,62 @@ def main(
         from collections.abc import AsyncIterator
         from starlette.applications import Starlette
         from starlette.routing import Mount, Route
-        from starlette.responses import Response
         from starlette.types import Receive, Scope, Send
         from starlette.middleware.cors import CORSMiddleware
         import contextlib
 
         logger.info("MCP server initialized in \033[32mhttp-streamable\033[0m mode")
 
-        # Create the session manager with true stateless mode
+        event_store = None
+        if stateful and event_store_size:
+            from .events import MemoryEventStore, SQLiteEventStore, handle_scoped
+
+            if event_store_path:
+                event_store = SQLiteEventStore(event_store_path, event_store_size)
+            else:
+                event_store = MemoryEventStore(event_store_size)
+            monitor.event_store = event_store
+        if stateful:
+            logger.info(f"Sessions are kept between requests, closed after {session_idle_timeout:g} s idle")
+
+        session_options = {}
+        if stateful:
+            # Idle eviction and the session limit only apply to kept sessions
+            session_options = {"session_idle_timeout": session_idle_timeout, "max_sessions": max_sessions}
+        # Stateless by default: every request is a session of its own
         session_manager = StreamableHTTPSessionManager(
             app=app,
-            event_store=None,
+            event_store=event_store,
             json_response=json_response,
-            stateless=True,
+            stateless=not stateful,
+            **session_options,
         )
 
         async def handle_streamable_http(
             scope: Scope, receive: Receive, send: Send
         ) -> None:
-            await session_manager.handle_request(scope, receive, send)
+            if event_store is not None:
+                await handle_scoped(session_manager.handle_request, scope, receive, send)
+            else:
+                await session_manager.handle_request(scope, receive, send)
 
         @contextlib.asynccontextmanager
         async def lifespan(app: Starlette) -> AsyncIterator[None]:
             """Context manager for session manager."""
             async with session_manager.run():
                 logger.info("MCP server started with StreamableHTTP session manager")
+                startup.mark("listening")
+                if monitor.workers is not None:
+                    monitor.workers.start(monitor.families)
                 try:
                     yield
                 finally:
+                    if monitor.workers is not None:
+                        monitor.workers.stop()
                     logger.info(
                         "🦆 Medicair MCP Server in \033[32mhttp-streamable\033[0m mode shutting down"
                     )
 
-        async def handle_health(request):
-            return Response("OK", status_code=200)
-
         logger.info(
             f"🦆 Connect to Medicair MCP Server at \033[1m\033[36mhttp://{SERVER_LOCALHOST}:{port}/mcp\033[0m"
         )
@@ -171,6 +719,7 @@ def main(
             debug=True,
             routes=[
                 Route("/health", endpoint=handle_health, methods=["GET"]),
+                Route("/metrics", endpoint=handle_metrics, methods=["GET"]),
                 Mount("/mcp", app=handle_streamable_http),
             ],
             lifespan=lifespan,
@@ -189,6 +738,10 @@ def main(
         
         logger.info("CORS middleware configured for Apps SDK integration")
 
+        if worker_metrics_dir is not None:
+            # Served by the `--workers` parent process
+            return starlette_app
+
         import uvicorn
 
         uvicorn.run(
@@ -196,6 +749,7 @@ def main(
             host=host,
             port=port,
             log_config=UVICORN_LOGGING_CONFIG,
+            timeout_graceful_shutdown=shutdown_timeout or None,
         )
 
     else:
@@ -206,6 +760,7 @@ def main(
 
         async def arun():
             async with stdio_server() as (read_stream, write_stream):
+                startup.mark("listening")
                 await app.run(read_stream, write_stream, init_opts)
 
         anyio.run(arun)
@@ -215,8 +770,14 @@ def main(
         )
 
 
+def create_app():
+    """App factory of the `--workers` processes: the `stream` server of the options the parent was started with"""
+    options = json.loads(os.environ[WORKER_OPTIONS_ENV])
+    return main.callback(**options["options"], worker_metrics_dir=options["metrics_dir"])
+
+
 # Optionally expose other important items at package level
-__all__ = ["main"]
+__all__ = ["main", "create_app"]
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,497 @@
+import json
+import re
+import statistics
+import threading
+import time
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Literal
+
+import duckdb
+
+from .cache import quote_identifier
+from .metrics import Metrics
+from .prepared import PreparedStatements, render_literal
+from .configs import DEFAULT_ADVISOR_MIN_QUERIES, DEFAULT_ADVISOR_REPLAY_ROWS
+
+if TYPE_CHECKING:
+    from .database import SchemaCatalog, TableInfo
+
+logger = logging.getLogger("mcp_server_medicair")
+
+_EQUALITY = {"COMPARE_EQUAL"}
+_RANGE = {
+    "COMPARE_LESSTHAN",
+    "COMPARE_GREATERTHAN",
+    "COMPARE_LESSTHANOREQUALTO",
+    "COMPARE_GREATERTHANOREQUALTO",
+}
+# Sample queries kept per filtered column, replayed to estimate a change
+_MAX_SAMPLES = 5
+# Columns replayed per report, by time spent in queries filtering on them
+_MAX_CANDIDATES = 5
+# Runs of each sample query per measurement, the median is kept
+_REPLAY_RUNS = 3
+# A change is only recommended if its replay is at least this much faster
+_MIN_SPEEDUP = 1.2
+# Temporary tables of the replays, on the replaying cursor only
+_COPY = "medicair_advisor_copy"
+_TUNED = "medicair_advisor_tuned"
+# Sorted rows of a table being rebuilt by `apply`
+_SORTED = "medicair_advisor_sorted"
+
+
+def _walk(node):
+    yield node
+    if isinstance(node, dict):
+        for value in node.values():
+            yield from _walk(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk(value)
+
+
+def _is_value(node: dict) -> bool:
+    """A constant or a parameter, possibly cast (`DATE '2024-01-01'`)"""
+    if node.get("class") in ("CONSTANT", "PARAMETER"):
+        return True
+    return node.get("class") == "CAST" and _is_value(node.get("child") or {})
+
+
+def _filters(where: dict):
+    """(column reference, "eq" or "range") of the filters of a WHERE clause that an index or sort order can help"""
+    if where.get("class") == "CONJUNCTION":
+        for child in where["children"]:
+            yield from _filters(child)
+    elif where.get("class") == "COMPARISON" and where["type"] in _EQUALITY | _RANGE:
+        kind = "eq" if where["type"] in _EQUALITY else "range"
+        left, right = where["left"], where["right"]
+        if left.get("class") == "COLUMN_REF" and _is_value(right):
+            yield left["column_names"], kind
+        elif right.get("class") == "COLUMN_REF" and _is_value(left):
+            yield right["column_names"], kind
+    elif where.get("class") == "BETWEEN":
+        if where["input"].get("class") == "COLUMN_REF" and _is_value(where["lower"]) and _is_value(where["upper"]):
+            yield where["input"]["column_names"], "range"
+    elif where.get("type") == "COMPARE_IN":
+        column, *values = where["children"]
+        if column.get("class") == "COLUMN_REF" and values and all(_is_value(v) for v in values):
+            yield column["column_names"], "eq"
+
+
+def _base_tables(from_table: dict | None) -> list[dict]:
+    """BASE_TABLE nodes read directly by a SELECT node, through joins but not subqueries"""
+    if not from_table:
+        return []
+    if from_table.get("type") == "BASE_TABLE":
+        return [from_table]
+    if from_table.get("type") == "JOIN":
+        return _base_tables(from_table.get("left")) + _base_tables(from_table.get("right"))
+    return []
+
+
+@dataclass
+class ColumnUsage:
+    """How often, and how expensively, queries filtered on one column"""
+
+    table: str
+    column: str
+    equality: int = 0
+    range: int = 0
+    # Seconds spent in the queries filtering on the column
+    total_time: float = 0.0
+    # (query, params) of recent distinct queries, for replays
+    samples: deque = field(default_factory=lambda: deque(maxlen=_MAX_SAMPLES))
+
+    @property
+    def queries(self) -> int:
+        return self.equality + self.range
+
+    def as_dict(self) -> dict:
+        return {
+            "table": self.table,
+            "column": self.column,
+            "equality": self.equality,
+            "range": self.range,
+            "totalTime": round(self.total_time, 3),
+        }
+
+
+@dataclass
+class Recommendation:
+    """A proposed index or sort order, with the latencies of its replay"""
+
+    table: str
+    column: str
+    kind: Literal["index", "sort"]
+    statement: str
+    queries: int
+    total_time: float
+    # Rows of the table copy the samples were replayed on
+    replayed_rows: int | None = None
+    # Median latency of the sample queries, in milliseconds
+    before_ms: float | None = None
+    after_ms: float | None = None
+    applied: bool = False
+    error: str | None = None
+
+    @property
+    def beneficial(self) -> bool:
+        if self.before_ms is None or self.after_ms is None:
+            return False
+        return self.before_ms >= self.after_ms * _MIN_SPEEDUP
+
+    def as_dict(self) -> dict:
+        return {
+            "table": self.table,
+            "column": self.column,
+            "kind": self.kind,
+            "statement": self.statement,
+            "queries": self.queries,
+            "totalTime": round(self.total_time, 3),
+            "replayedRows": self.replayed_rows,
+            "beforeMs": self.before_ms,
+            "afterMs": self.after_ms,
+            "beneficial": self.beneficial,
+            "applied": self.applied,
+            "error": self.error,
+        }
+
+
+class IndexAdvisor:
+    """
+    Records which columns executed queries filter on, and proposes an ART index
+    for columns mostly looked up by value and a copy of the table sorted on
+    columns mostly filtered by range (so DuckDB's per row group min/max skip
+    more of it). Each proposal is replayed on a temporary copy of the table,
+    before and after the change, with the recorded queries that would benefit.
+    """
+
+    def __init__(
+        self,
+        catalog: "SchemaCatalog",
+        min_queries: int = DEFAULT_ADVISOR_MIN_QUERIES,
+        replay_rows: int = DEFAULT_ADVISOR_REPLAY_ROWS,
+    ):
+        self.catalog = catalog
+        self.min_queries = min_queries
+        self.replay_rows = replay_rows
+        self._parser = duckdb.connect(":memory:")
+        self._usage: dict[tuple[str, str], ColumnUsage] = {}
+        self._report: list[Recommendation] = []
+        self._lock = threading.Lock()
+        # Replays mirror how `query` runs parameterized queries, without sharing its statements
+        self._prepared = PreparedStatements(_MAX_SAMPLES, Metrics())
+
+    def _parse(self, query: str) -> list[dict] | None:
+        cursor = self._parser.cursor()
+        try:
+            serialized = json.loads(cursor.execute("SELECT json_serialize_sql(?)", [query]).fetchone()[0])
+        finally:
+            cursor.close()
+        if serialized.get("error"):
+            return None
+        return serialized["statements"]
+
+    def _table(self, node: dict, cte_names: set[str]) -> "TableInfo | None":
+        """Catalog table a BASE_TABLE node reads, None for CTEs, views and unknown or ambiguous names"""
+        if not node["schema_name"] and not node["catalog_name"] and node["table_name"].lower() in cte_names:
+            return None
+        name = ".".join(p for p in (node["catalog_name"], node["schema_name"], node["table_name"]) if p)
+        try:
+            table = self.catalog.find(name)
+        except ValueError:
+            return None
+        return table if table.kind == "table" else None
+
+    @staticmethod
+    def _column(column_names: list[str], sources: list[tuple[str, "TableInfo"]]) -> tuple["TableInfo", str] | None:
+        """Table and catalog spelling of a column reference among the tables of a SELECT"""
+        name = column_names[-1].lower()
+        if len(column_names) > 1:
+            qualifier = column_names[-2].lower()
+            sources = [(alias, t) for alias, t in sources if alias == qualifier]
+        matches = [
+            (table, column["name"])
+            for _, table in sources
+            for column in table.columns
+            if column["name"].lower() == name
+        ]
+        return matches[0] if len(matches) == 1 else None
+
+    def record(self, query: str, params: list | dict | None, elapsed: float):
+        """Count the filters of a successfully executed SELECT"""
+        try:
+            statements = self._parse(query)
+        except duckdb.Error:
+            return
+        if not statements:
+            return
+        nodes = [n for n in _walk(statements) if isinstance(n, dict)]
+        cte_names = {
+            entry["key"].lower()
+            for n in nodes
+            if isinstance(n.get("cte_map"), dict)
+            for entry in n["cte_map"].get("map", [])
+        }
+        # Strongest use of each column in this query: a lookup by value wins over a range
+        filtered: dict[tuple[str, str], str] = {}
+        for node in nodes:
+            if node.get("type") != "SELECT_NODE" or not node.get("where_clause"):
+                continue
+            sources = []
+            for base in _base_tables(node["from_table"]):
+                table = self._table(base, cte_names)
+                if table is not None:
+                    sources.append(((base["alias"] or base["table_name"]).lower(), table))
+            if not sources:
+                continue
+            for column_names, kind in _filters(node["where_clause"]):
+                resolved = self._column(column_names, sources)
+                if resolved is None:
+                    continue
+                key = (resolved[0].qualified_name, resolved[1])
+                if filtered.get(key) != "eq":
+                    filtered[key] = kind
+
+        with self._lock:
+            for key, kind in filtered.items():
+                usage = self._usage.setdefault(key, ColumnUsage(*key))
+                if kind == "eq":
+                    usage.equality += 1
+                else:
+                    usage.range += 1
+                usage.total_time += elapsed
+                sample = (query, params)
+                if sample not in usage.samples:
+                    usage.samples.append(sample)
+
+    def usage(self) -> list[ColumnUsage]:
+        """Filtered columns, most expensive first"""
+        with self._lock:
+            return sorted(self._usage.values(), key=lambda u: u.total_time, reverse=True)
+
+    @staticmethod
+    def _qualified(table: "TableInfo") -> str:
+        return ".".join(quote_identifier(p) for p in (table.database, table.schema, table.name))
+
+    @staticmethod
+    def _indexed_columns(conn: duckdb.DuckDBPyConnection) -> set[tuple[str, str]]:
+        """(qualified table, lowercase column) of the existing single column indexes"""
+        rows = conn.execute(
+            "SELECT database_name, schema_name, table_name, expressions FROM duckdb_indexes()"
+        ).fetchall()
+        indexed = set()
+        for database, schema, table, expressions in rows:
+            columns = [c.strip().strip('"').lower() for c in (expressions or "").strip("[]").split(",")]
+            if len(columns) == 1:
+                indexed.add((f"{database}.{schema}.{table}", columns[0]))
+        return indexed
+
+    def _rebuild(self, conn: duckdb.DuckDBPyConnection, table: "TableInfo", column: str) -> list[str]:
+        """
+        Statements rebuilding `table` sorted on `column`. `CREATE OR REPLACE TABLE
+        ... AS SELECT` would drop its constraints, defaults, comments and indexes,
+        so the table is created again from its own DDL and refilled in order.
+        """
+        qualified = self._qualified(table)
+        key = [table.database, table.schema, table.name]
+        where = "WHERE database_name = $1 AND schema_name = $2 AND table_name = $3"
+        ddl, comment = conn.execute(f"SELECT sql, comment FROM duckdb_tables() {where}", key).fetchone()
+        indexes = conn.execute(f"SELECT sql FROM duckdb_indexes() {where} AND sql IS NOT NULL", key).fetchall()
+        comments = conn.execute(
+            f"SELECT column_name, comment FROM duckdb_columns() {where} AND comment IS NOT NULL ORDER BY column_index",
+            key,
+        ).fetchall()
+        statements = [
+            f"CREATE TEMP TABLE {_SORTED} AS SELECT * FROM {qualified} ORDER BY {quote_identifier(column)}",
+            f"DROP TABLE {qualified}",
+            # The DDL of duckdb_tables() and duckdb_indexes() names the table without its database and schema
+            f"USE {quote_identifier(table.database)}.{quote_identifier(table.schema)}",
+            ddl.rstrip(";"),
+            f"INSERT INTO {qualified} BY NAME SELECT * FROM temp.main.{_SORTED}",
+            f"DROP TABLE temp.main.{_SORTED}",
+        ]
+        statements += [sql.rstrip(";") for (sql,) in indexes]
+        if comment:
+            statements.append(f"COMMENT ON TABLE {qualified} IS {render_literal(comment)}")
+        statements += [
+            f"COMMENT ON COLUMN {qualified}.{quote_identifier(name)} IS {render_literal(text)}"
+            for name, text in comments
+        ]
+        return statements
+
+    def _proposal(self, conn: duckdb.DuckDBPyConnection, usage: ColumnUsage, table: "TableInfo") -> Recommendation:
+        qualified = self._qualified(table)
+        column = quote_identifier(usage.column)
+        if usage.equality >= usage.range:
+            index = re.sub(r"\W+", "_", f"medicair_idx_{table.name}_{usage.column}").lower()
+            kind = "index"
+            statement = f"CREATE INDEX IF NOT EXISTS {quote_identifier(index)} ON {qualified} ({column})"
+        else:
+            kind = "sort"
+            statement = ";\n".join(self._rebuild(conn, table, usage.column))
+        return Recommendation(
+            table=usage.table,
+            column=usage.column,
+            kind=kind,
+            statement=statement,
+            queries=usage.queries,
+            total_time=usage.total_time,
+        )
+
+    def _retarget(self, query: str, table: "TableInfo", target: str) -> str | None:
+        """`query` reading the temporary table `target` instead of `table`, None if it can't be rewritten"""
+        statements = self._parse(query)
+        if not statements:
+            return None
+        nodes = [n for n in _walk(statements) if isinstance(n, dict)]
+        cte_names = {
+            entry["key"].lower()
+            for n in nodes
+            if isinstance(n.get("cte_map"), dict)
+            for entry in n["cte_map"].get("map", [])
+        }
+        found = False
+        for node in nodes:
+            if node.get("type") != "BASE_TABLE":
+                continue
+            info = self._table(node, cte_names)
+            if info is None or info.qualified_name != table.qualified_name:
+                continue
+            # Keep the table's name as alias so qualified column references still resolve
+            node["alias"] = node["alias"] or node["table_name"]
+            node.update(catalog_name="temp", schema_name="main", table_name=target)
+            found = True
+        if not found:
+            return None
+        cursor = self._parser.cursor()
+        try:
+            return cursor.execute(
+                "SELECT json_deserialize_sql(?)", [json.dumps({"error": False, "statements": statements})]
+            ).fetchone()[0]
+        finally:
+            cursor.close()
+
+    def _time(self, conn: duckdb.DuckDBPyConnection, samples: list[tuple[str, list | dict | None]]) -> float:
+        """Mean over the samples of their median latency, in milliseconds"""
+        latencies = []
+        for query, params in samples:
+            runs = []
+            for _ in range(_REPLAY_RUNS):
+                started = time.perf_counter()
+                if params is not None:
+                    self._prepared.execute(conn, query, params).fetchall()
+                else:
+                    conn.execute(query).fetchall()
+                runs.append(time.perf_counter() - started)
+            latencies.append(statistics.median(runs))
+        return round(1000 * statistics.mean(latencies), 3)
+
+    def _replay(self, conn: duckdb.DuckDBPyConnection, usage: ColumnUsage, table: "TableInfo", proposal: Recommendation):
+        """Time the sample queries on a copy of the table, then on the copy indexed or sorted as proposed"""
+        column = quote_identifier(usage.column)
+        samples = list(usage.samples)
+        before = after = []
+        try:
+            # LIMIT keeps the current physical order of the rows
+            conn.execute(
+                f"CREATE OR REPLACE TEMP TABLE {_COPY} AS "
+                f"SELECT * FROM {self._qualified(table)} LIMIT {self.replay_rows}"
+            )
+            proposal.replayed_rows = conn.execute(f"SELECT count(*) FROM temp.main.{_COPY}").fetchone()[0]
+            before = [(self._retarget(q, table, _COPY), p) for q, p in samples]
+            before = [(q, p) for q, p in before if q is not None]
+            if not before:
+                proposal.error = "le query registrate non si possono rieseguire sulla copia"
+                return
+            proposal.before_ms = self._time(conn, before)
+            if proposal.kind == "index":
+                conn.execute(f"CREATE INDEX medicair_advisor_idx ON temp.main.{_COPY} ({column})")
+                after = before
+            else:
+                conn.execute(
+                    f"CREATE OR REPLACE TEMP TABLE {_TUNED} AS SELECT * FROM temp.main.{_COPY} ORDER BY {column}"
+                )
+                after = [(self._retarget(q, table, _TUNED), p) for q, p in samples]
+                after = [(q, p) for q, p in after if q is not None]
+            proposal.after_ms = self._time(conn, after)
+        finally:
+            for query, _ in before + after:
+                self._prepared.forget(conn, query)
+            conn.execute(f"DROP TABLE IF EXISTS temp.main.{_TUNED}")
+            conn.execute(f"DROP TABLE IF EXISTS temp.main.{_COPY}")
+
+    def advise(
+        self,
+        conn: duckdb.DuckDBPyConnection,
+        min_queries: int | None = None,
+        replay: bool = True,
+    ) -> list[Recommendation]:
+        """
+        Propose an index or sort order for the most expensive columns filtered
+        by at least `min_queries` queries, replaying each proposal unless `replay` is False
+        """
+        min_queries = self.min_queries if min_queries is None else min_queries
+        indexed = self._indexed_columns(conn)
+        report = []
+        for usage in self.usage():
+            if len(report) == _MAX_CANDIDATES:
+                break
+            if usage.queries < min_queries:
+                continue
+            try:
+                table = self.catalog.find(usage.table)
+            except ValueError:
+                continue  # Dropped since
+            proposal = self._proposal(conn, usage, table)
+            if proposal.kind == "index" and (usage.table, usage.column.lower()) in indexed:
+                continue
+            if replay:
+                try:
+                    self._replay(conn, usage, table, proposal)
+                except duckdb.InterruptException:
+                    raise
+                except duckdb.Error as e:
+                    proposal.error = str(e)
+            report.append(proposal)
+        with self._lock:
+            self._report = report
+        return report
+
+    def apply(self, conn: duckdb.DuckDBPyConnection, proposal: Recommendation):
+        """Run the statement of a proposal on the database, a sort order in a single transaction"""
+        if proposal.kind == "index":
+            conn.execute(proposal.statement)
+        else:
+            # From the DDL the table has now, which may have changed since the proposal
+            statements = self._rebuild(conn, self.catalog.find(proposal.table), proposal.column)
+            proposal.statement = ";\n".join(statements)
+            database, schema = conn.execute("SELECT current_database(), current_schema()").fetchone()
+            conn.execute("BEGIN TRANSACTION")
+            try:
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute("COMMIT")
+            except BaseException:
+                try:
+                    conn.execute("ROLLBACK")
+                except duckdb.Error:
+                    pass  # A failed COMMIT already rolled back
+                raise
+            finally:
+                conn.execute(f"USE {quote_identifier(database)}.{quote_identifier(schema)}")
+        proposal.applied = True
+        logger.info(f"🧭 Applied: {proposal.statement}")
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            report = list(self._report)
+        return {
+            "filters": [u.as_dict() for u in self.usage()],
+            "recommendations": [r.as_dict() for r in report],
+        }
+
+    def close(self):
+        self._parser.close()
@@ -0,0 +1,176 @@
+import re
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Hashable
+
+logger = logging.getLogger("mcp_server_medicair")
+
+# Functions whose result changes between calls with the same SQL text.
+# Queries using any of these are never served from the cache.
+VOLATILE_FUNCTIONS = (
+    "now",
+    "current_timestamp",
+    "current_date",
+    "current_time",
+    "current_localtimestamp",
+    "current_localtime",
+    "localtimestamp",
+    "localtime",
+    "get_current_timestamp",
+    "get_current_time",
+    "transaction_timestamp",
+    "today",
+    "random",
+    "setseed",
+    "uuid",
+    "gen_random_uuid",
+    "nextval",
+    "currval",
+)
+
+# Table functions and file scans that read data outside the database, which
+# can change without the database itself changing
+EXTERNAL_SOURCES = (
+    r"read_\w+",
+    r"glob",
+    r"parquet_scan",
+    r"sniff_csv",
+    r"query_table",
+)
+
+_VOLATILE_RE = re.compile(
+    r"\b(" + "|".join(VOLATILE_FUNCTIONS + EXTERNAL_SOURCES) + r")\b"
+)
+# `FROM 'file.csv'` style replacement scans
+_FILE_SCAN_RE = re.compile(r"\b(from|join)\s+'")
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Normalize SQL text for use as a cache key: drop comments, collapse
+    whitespace and lowercase everything outside string literals.
+    Identifiers are case insensitive in DuckDB, even when quoted.
+    """
+    out = []
+    i = 0
+    n = len(sql)
+    pending_space = False
+    while i < n:
+        ch = sql[i]
+        if ch == "'":
+            # String literal, kept verbatim ('' is an escaped quote)
+            j = i + 1
+            while j < n:
+                if sql[j] == "'":
+                    if j + 1 < n and sql[j + 1] == "'":
+                        j += 2
+                        continue
+                    break
+                j += 1
+            if pending_space and out:
+                out.append(" ")
+            pending_space = False
+            out.append(sql[i : j + 1])
+            i = j + 1
+        elif sql.startswith("--", i):
+            j = sql.find("\n", i)
+            i = n if j == -1 else j
+            pending_space = True
+        elif sql.startswith("/*", i):
+            j = sql.find("*/", i + 2)
+            i = n if j == -1 else j + 2
+            pending_space = True
+        elif ch.isspace():
+            pending_space = True
+            i += 1
+        else:
+            if pending_space and out:
+                out.append(" ")
+            pending_space = False
+            out.append(ch.lower())
+            i += 1
+    return "".join(out).rstrip("; ")
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def is_volatile(normalized_sql: str) -> bool:
+    """Whether a normalized query calls non-deterministic functions or reads external files"""
+    return bool(
+        _VOLATILE_RE.search(normalized_sql) or _FILE_SCAN_RE.search(normalized_sql)
+    )
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache of query results bounded by an approximate byte budget.
+    Entries also expire after `ttl` seconds when a TTL is given.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float | None = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (value, size, stored_at), least recently used first
+        self._entries: OrderedDict[Hashable, tuple[Any, int, float]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _drop_locked(self, key: Hashable):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key: Hashable) -> Any | None:
+        """Return the cached value for `key`, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None:
+                if time.monotonic() - entry[2] > self.ttl:
+                    self._drop_locked(key)
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, size: int):
+        """Store a value, evicting least recently used entries to stay within the byte budget"""
+        if size > self.max_bytes:
+            logger.debug(f"Result of {size} bytes is larger than the whole cache, not caching")
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop_locked(key)
+            while self._entries and self._bytes + size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop_locked(oldest)
+                self.evictions += 1
+            self._entries[key] = (value, size, time.monotonic())
+            self._bytes += size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current occupancy"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
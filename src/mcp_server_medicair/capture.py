@@ -0,0 +1,84 @@
+import json
+import os
+import threading
+import logging
+from typing import Iterator
+
+from mcp import types
+
+logger = logging.getLogger("mcp_server_medicair")
+
+
+def result_size(result) -> int:
+    """Bytes of text a tool call returned, structured content included"""
+    content, structured = result if isinstance(result, tuple) else (result, None)
+    size = sum(len(c.text.encode()) for c in content if isinstance(c, types.TextContent))
+    if structured is not None:
+        size += len(json.dumps(structured, default=str).encode())
+    return size
+
+
+class CaptureLog:
+    """
+    Append-only log of the tool calls the server handles, one JSON object per
+    line: start time, session, tool, arguments, latency, result size and
+    error. `python -m benchmarks replay` re-issues it against a server.
+    """
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        # Line buffered, so a crash loses at most the call being written
+        self._file = open(self.path, "a", buffering=1, encoding="utf-8")
+        self._lock = threading.Lock()
+        logger.info(f"📼 Capturing tool calls to {self.path}")
+
+    def record(
+        self,
+        tool: str,
+        arguments: dict | None,
+        session: str,
+        started_at: float,
+        seconds: float,
+        size: int | None,
+        error: str | None = None,
+    ):
+        entry = {
+            "ts": round(started_at, 6),
+            "session": session,
+            "tool": tool,
+            "args": arguments or {},
+            "ms": round(seconds * 1000, 3),
+            "bytes": size,
+        }
+        if error is not None:
+            entry["error"] = error
+        line = json.dumps(entry, separators=(",", ":"), ensure_ascii=False, default=str)
+        with self._lock:
+            if self._file.closed:
+                return
+            try:
+                self._file.write(line + "\n")
+            except OSError as e:
+                # Capturing must never fail the call itself
+                logger.warning(f"⚠️ Could not capture tool call: {e}")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def read_capture(path: str) -> Iterator[dict]:
+    """Calls of a capture log, in the order they started"""
+    with open(path, encoding="utf-8") as f:
+        entries = []
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                # The last line of a log whose server was killed may be cut short
+                logger.warning(f"⚠️ Skipping malformed line {number} of {path}")
+    # Calls are written when they finish
+    yield from sorted(entries, key=lambda entry: entry["ts"])
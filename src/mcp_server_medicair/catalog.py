@@ -0,0 +1,27 @@
+import mcp.types as types
+from pydantic import PrivateAttr
+
+# Options the MCP session dumps every response with before writing it
+_SESSION_DUMP = {"by_alias": True, "mode": "json", "exclude_none": True}
+
+
+class CachedResult(types.ServerResult):
+    """
+    A response that is dumped once. The session turns every response into a
+    dict with `model_dump` before writing it, so answering repeated requests
+    (e.g. `tools/list` on every stateless HTTP request) with the same
+    CachedResult skips rebuilding and re-serializing the models.
+    """
+
+    _dumped: dict | None = PrivateAttr(default=None)
+
+    @classmethod
+    def of(cls, result: types.Result) -> "CachedResult":
+        cached = cls(result)
+        cached._dumped = types.ServerResult.model_dump(cached, **_SESSION_DUMP)
+        return cached
+
+    def model_dump(self, **kwargs) -> dict:
+        if self._dumped is not None and kwargs == _SESSION_DUMP:
+            return self._dumped
+        return super().model_dump(**kwargs)
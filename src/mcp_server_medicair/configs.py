@@ -1,9 +1,111 @@
+import os
 from typing import Any
 
 SERVER_VERSION = "0.7.2"
 
 SERVER_LOCALHOST = "127.0.0.1"
 
+# Worker threads used to run DuckDB queries off the event loop
+DEFAULT_QUERY_WORKERS = os.cpu_count() or 4
+
+# Queries allowed to wait for a free worker before new calls are rejected
+DEFAULT_QUERY_QUEUE_SIZE = 64
+
+# Seconds an idle pooled cursor is kept before it is closed
+DEFAULT_POOL_IDLE_TIMEOUT = 300.0
+
+# Seconds an idle pooled cursor may sit unused before it is health checked on checkout
+DEFAULT_POOL_HEALTH_CHECK_INTERVAL = 60.0
+
+# Seconds the read-only connection stays open after the last query (`--read-only` mode)
+DEFAULT_READ_ONLY_IDLE_TIMEOUT = 5.0
+
+# Byte budget of the in-process query result cache (0 disables it)
+DEFAULT_RESULT_CACHE_SIZE = 64 * 1024 * 1024
+
+# Seconds cached results stay valid for MotherDuck and S3 databases.
+# Local DuckDB files are invalidated through their modification time instead.
+DEFAULT_RESULT_CACHE_TTL = 60.0
+
+# Rows returned per page by the query tool, larger results come back with a cursor
+DEFAULT_MAX_ROWS = 500
+
+# Approximate size in bytes of one rendered page of results
+DEFAULT_MAX_RESULT_BYTES = 256 * 1024
+
+# Seconds an unread result cursor is kept open on the server
+DEFAULT_CURSOR_TTL = 300.0
+
+# Result cursors a single MCP session can keep open at once
+DEFAULT_MAX_CURSORS_PER_SESSION = 4
+
+# Formatter used to render query results: pretty, csv, tsv or markdown
+DEFAULT_RESULT_FORMAT = "pretty"
+
+# Byte budget of the directory holding exported (Arrow/Parquet) results
+DEFAULT_SPOOL_MAX_BYTES = 1024 * 1024 * 1024
+
+# Rows per Arrow record batch when streaming an export to disk
+DEFAULT_EXPORT_BATCH_ROWS = 100_000
+
+# Seconds between progress notifications sent while a tool call runs
+DEFAULT_PROGRESS_INTERVAL = 1.0
+
+# Seconds a query may run before it is interrupted (0 disables the timeout)
+DEFAULT_QUERY_TIMEOUT = 300.0
+
+# Seconds the schema catalog of a MotherDuck or S3 database is trusted before
+# it is reloaded. Local DuckDB files are reloaded when their modification time changes.
+DEFAULT_SCHEMA_CATALOG_TTL = 300.0
+
+# Rows sampled to compute approximate column statistics for `describe_table`
+DEFAULT_STATS_SAMPLE_ROWS = 100_000
+
+# Seconds after which materialized summaries are rebuilt even if the database
+# did not visibly change (MotherDuck/S3). Local files are rebuilt when they change.
+DEFAULT_SUMMARY_REFRESH_INTERVAL = 600.0
+
+# Seconds between checks of a mirrored S3 database for changes; a mirrored
+# MotherDuck database, which can't be checked cheaply, is copied again
+DEFAULT_MIRROR_REFRESH_INTERVAL = 900.0
+
+# Byte budget of the persistent S3 block cache directory, least recently used blocks are evicted
+DEFAULT_S3_CACHE_MAX_BYTES = 10 * 1024 * 1024 * 1024
+
+# Seconds before an S3 request times out, and how often a failed request is retried
+DEFAULT_S3_HTTP_TIMEOUT = 30.0
+DEFAULT_S3_HTTP_RETRIES = 3
+
+# Prepared statements kept per pooled cursor for parameterized queries (0 disables the cache)
+DEFAULT_PREPARED_CACHE_SIZE = 64
+
+# Queries that must have filtered on a column before the index advisor proposes a change for it
+DEFAULT_ADVISOR_MIN_QUERIES = 5
+
+# Rows of a table copied to replay the advisor's proposals on, larger tables are cut at this size
+DEFAULT_ADVISOR_REPLAY_ROWS = 1_000_000
+
+# Query profiles (`explain`, `query` with `profile`) kept for the medicair://profiles resource
+DEFAULT_PROFILE_HISTORY = 50
+
+# Seconds /health waits for each database to answer a trivial query before reporting it unhealthy
+DEFAULT_HEALTH_TIMEOUT = 5.0
+
+# Seconds without a request after which a stateful `stream` session is closed and its cursors released
+DEFAULT_SESSION_IDLE_TIMEOUT = 1800.0
+
+# Stateful `stream` sessions open at once, new ones are refused beyond it
+DEFAULT_MAX_SESSIONS = 1000
+
+# Messages kept for stateful `stream` clients to resume a dropped SSE stream, oldest evicted first
+DEFAULT_EVENT_STORE_SIZE = 1000
+
+# Seconds an HTTP server waits for requests in flight to finish when it is stopped
+DEFAULT_SHUTDOWN_TIMEOUT = 30.0
+
+# Seconds between the metric snapshots each `--workers` process shares with the others
+DEFAULT_WORKER_METRICS_INTERVAL = 2.0
+
 UVICORN_LOGGING_CONFIG: dict[str, Any] = {
     "version": 1,
     "disable_existing_loggers": False,
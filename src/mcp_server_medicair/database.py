@@ -1,14 +1,538 @@
+import json
 import os
+import re
+import threading
+import time
 import duckdb
-from typing import Literal, Optional
+from dataclasses import dataclass, field
+from typing import Callable, ContextManager, Hashable, Iterator, Literal, Optional
 import io
-from contextlib import redirect_stdout
-from tabulate import tabulate
+from contextlib import contextmanager, nullcontext, redirect_stdout
 import logging
-from .configs import SERVER_VERSION
+from .cache import ResultCache, normalize_sql, is_volatile, quote_identifier
+from .pagination import CursorStore
+from .formatters import FORMATTERS, render
+from .spool import ResultSpool, SpooledResult
+from .metrics import Metrics
+from .summaries import SummaryDefinition, SummaryStore
+from .mirror import DatabaseMirror
+from . import s3
+from .s3 import S3Options
+from .routing import DatabaseConfig
+from .prepared import PreparedStatements
+from .advisor import IndexAdvisor, Recommendation
+from . import profiling
+from .profiling import Profile, ProfileLog
+from .configs import (
+    SERVER_VERSION,
+    DEFAULT_RESULT_CACHE_SIZE,
+    DEFAULT_RESULT_CACHE_TTL,
+    DEFAULT_MAX_ROWS,
+    DEFAULT_MAX_RESULT_BYTES,
+    DEFAULT_CURSOR_TTL,
+    DEFAULT_MAX_CURSORS_PER_SESSION,
+    DEFAULT_POOL_IDLE_TIMEOUT,
+    DEFAULT_POOL_HEALTH_CHECK_INTERVAL,
+    DEFAULT_QUERY_WORKERS,
+    DEFAULT_READ_ONLY_IDLE_TIMEOUT,
+    DEFAULT_RESULT_FORMAT,
+    DEFAULT_SPOOL_MAX_BYTES,
+    DEFAULT_EXPORT_BATCH_ROWS,
+    DEFAULT_QUERY_TIMEOUT,
+    DEFAULT_SCHEMA_CATALOG_TTL,
+    DEFAULT_STATS_SAMPLE_ROWS,
+    DEFAULT_SUMMARY_REFRESH_INTERVAL,
+    DEFAULT_MIRROR_REFRESH_INTERVAL,
+    DEFAULT_PREPARED_CACHE_SIZE,
+    DEFAULT_ADVISOR_MIN_QUERIES,
+    DEFAULT_ADVISOR_REPLAY_ROWS,
+    DEFAULT_PROFILE_HISTORY,
+)
 
 logger = logging.getLogger("mcp_server_medicair")
 
+# Statements whose effect stays on the cursor that ran them, after leading comments
+_SESSION_STATE = re.compile(
+    r"(?:\s|--[^\n]*\n?|/\*.*?\*/)*"
+    r"(?:(?:SET|RESET)(?!\s+GLOBAL\b)|USE|PREPARE|CREATE\s+(?:OR\s+REPLACE\s+)?TEMP(?:ORARY)?)\b",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+@dataclass
+class QueryResult:
+    """One page of query results, rendered as text"""
+
+    formatted: str
+    column_names: list[str]
+    column_types: list[str]
+    rows: list[tuple]
+    truncated: bool = False
+    cursor: str | None = None
+    # Operator timings of the query, when it was run with profiling
+    profile: Profile | None = None
+
+    @property
+    def row_count(self) -> int:
+        return len(self.rows)
+
+    def structured(self) -> dict:
+        """
+        Structured data for the Apps SDK widget. Only built when it is actually
+        returned to the client, and shares the fetched rows instead of copying
+        them: tuples serialize to the same JSON arrays as lists.
+        """
+        # ChatGPT expects: {columns: [...], rows: [[...], [...]], rowCount: int}
+        structured_data = {
+            "columns": self.column_names,
+            "rows": self.rows,
+            "rowCount": self.row_count,
+            "truncated": self.truncated,
+            "cursor": self.cursor,
+        }
+        logger.debug(f"📦 Structured data created: columns={len(self.column_names)}, rowCount={self.row_count}")
+        return structured_data
+
+
+class RunningQuery:
+    """
+    Handle on one call running on a worker thread. The worker keeps its
+    progress up to date; the event loop reads it and may interrupt the query
+    on timeout, MCP cancellation or client disconnect.
+    """
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.phase = "executing"
+        self.rows_fetched = 0
+        # Seconds spent executing, fetching and formatting, for the metrics
+        self.timings: dict[str, float] = {}
+        # Why the query was interrupted: "timeout" or "cancelled"
+        self.interrupted: str | None = None
+        self._conn: duckdb.DuckDBPyConnection | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @contextmanager
+    def timed(self, phase: str) -> Iterator[None]:
+        """Add the duration of the block to the time spent in `phase`"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[phase] = self.timings.get(phase, 0.0) + time.perf_counter() - started
+
+    def interrupt(self, reason: str):
+        """Interrupt the query on its DuckDB cursor, the first reason given wins"""
+        with self._lock:
+            if self.interrupted is None:
+                self.interrupted = reason
+            if self._conn is not None:
+                self._conn.interrupt()
+
+    @contextmanager
+    def attached(self, conn: duckdb.DuckDBPyConnection) -> Iterator[None]:
+        """
+        Make `conn` the cursor to interrupt for the duration of the block.
+        It is detached before it goes back to the pool, so a late interrupt
+        can't hit another query.
+        """
+        with self._lock:
+            if self.interrupted is not None:
+                raise duckdb.InterruptException("INTERRUPT Error: Interrupted!")
+            self._conn = conn
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._conn = None
+
+class CursorPool:
+    """
+    Pool of DuckDB cursors created from one root connection.
+    Cursors share the root's database instance (and its buffer cache) but
+    have their own client context, so they can run queries in parallel from
+    different threads, which a single connection cannot.
+
+    The root connection is opened lazily through `connect`. With
+    `root_idle_timeout` set, the root and all its cursors are closed once the
+    pool has been idle that long, and `is_stale` lets the owner force a reopen
+    (e.g. when the database file changed on disk).
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], duckdb.DuckDBPyConnection],
+        max_size: int,
+        idle_timeout: float = DEFAULT_POOL_IDLE_TIMEOUT,
+        health_check_interval: float = DEFAULT_POOL_HEALTH_CHECK_INTERVAL,
+        setup: Callable[[duckdb.DuckDBPyConnection], None] | None = None,
+        root_idle_timeout: float | None = None,
+        is_stale: Callable[[], bool] | None = None,
+    ):
+        if max_size < 1:
+            raise ValueError("The cursor pool needs at least one cursor")
+
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.root_idle_timeout = root_idle_timeout
+        self._connect = connect
+        self._setup = setup
+        self._is_stale = is_stale
+        self._root: duckdb.DuckDBPyConnection | None = None
+        # Bumped every time the root is reopened, so cursors of an old root are dropped on checkin
+        self._generation = 0
+        self._generations: dict[int, int] = {}
+        # Idle cursors with the time they were checked in, most recent last
+        self._idle: list[tuple[duckdb.DuckDBPyConnection, float]] = []
+        self._size = 0
+        self._last_used = time.monotonic()
+        self._closed = False
+        self._cond = threading.Condition()
+
+        self._stop = threading.Event()
+        self._reaper = None
+        if root_idle_timeout is not None and root_idle_timeout > 0:
+            self._reaper = threading.Thread(
+                target=self._reap, name="medicair-pool-reaper", daemon=True
+            )
+            self._reaper.start()
+
+    def _new_cursor(self) -> duckdb.DuckDBPyConnection:
+        if self._root is None:
+            self._root = self._connect()
+            self._generation += 1
+        cursor = self._root.cursor()
+        if self._setup is not None:
+            self._setup(cursor)
+        self._generations[id(cursor)] = self._generation
+        return cursor
+
+    @staticmethod
+    def is_healthy(cursor: duckdb.DuckDBPyConnection) -> bool:
+        try:
+            cursor.execute("SELECT 1").fetchall()
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ Discarding unhealthy cursor: {e}")
+            return False
+
+    def _close_cursor_locked(self, cursor: duckdb.DuckDBPyConnection):
+        self._generations.pop(id(cursor), None)
+        self._size -= 1
+        try:
+            cursor.close()
+        except Exception:
+            pass
+
+    def _release_root_locked(self):
+        """Close the root connection and its idle cursors; busy cursors close on checkin"""
+        for cursor, _ in self._idle:
+            self._close_cursor_locked(cursor)
+        self._idle = []
+        if self._root is not None:
+            try:
+                self._root.close()
+            except Exception:
+                pass
+            self._root = None
+            logger.debug("Released the root database connection")
+
+    def _evict_idle_locked(self, now: float):
+        """Close cursors that have been idle for longer than `idle_timeout`"""
+        keep = []
+        for cursor, since in self._idle:
+            if now - since > self.idle_timeout:
+                self._close_cursor_locked(cursor)
+            else:
+                keep.append((cursor, since))
+        if len(keep) != len(self._idle):
+            logger.debug(f"Evicted {len(self._idle) - len(keep)} idle cursors")
+        self._idle = keep
+
+        if (
+            self.root_idle_timeout is not None
+            and self._root is not None
+            and self._size == len(self._idle)
+            and now - self._last_used >= self.root_idle_timeout
+        ):
+            self._release_root_locked()
+
+    def _reap(self):
+        interval = min(self.root_idle_timeout, self.idle_timeout) / 2
+        while not self._stop.wait(max(interval, 0.1)):
+            self.evict_idle()
+
+    def checkout(self, timeout: float | None = None) -> duckdb.DuckDBPyConnection:
+        """
+        Take a cursor from the pool, creating one if the pool is below its max size.
+        Blocks for up to `timeout` seconds when every cursor is in use.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise ValueError("The cursor pool is closed")
+
+                now = time.monotonic()
+                in_use = self._size - len(self._idle)
+                stale = (
+                    self._root is not None
+                    and self._is_stale is not None
+                    and self._is_stale()
+                )
+                if stale and in_use == 0:
+                    logger.info("🔄 Database changed on disk, reopening connection")
+                    self._release_root_locked()
+                elif not stale:
+                    self._evict_idle_locked(now)
+
+                    if self._idle:
+                        cursor, since = self._idle.pop()
+                        if now - since > self.health_check_interval and not self.is_healthy(cursor):
+                            self._close_cursor_locked(cursor)
+                            continue
+                        self._last_used = now
+                        return cursor
+
+                    if self._size < self.max_size:
+                        cursor = self._new_cursor()
+                        self._size += 1
+                        self._last_used = now
+                        return cursor
+
+                # Either every cursor is busy, or the root is stale and we wait
+                # for the busy cursors to drain before reopening it
+                remaining = None if deadline is None else deadline - now
+                if remaining is not None and remaining <= 0:
+                    raise ValueError("Timed out waiting for a free database cursor")
+                self._cond.wait(remaining)
+
+    def checkin(self, cursor: duckdb.DuckDBPyConnection, healthy: bool = True):
+        """Return a cursor to the pool, closing it if it is unhealthy, outdated or the pool is closed"""
+        with self._cond:
+            self._last_used = time.monotonic()
+            outdated = self._generations.get(id(cursor)) != self._generation or self._root is None
+            if self._closed or not healthy or outdated:
+                self._close_cursor_locked(cursor)
+            else:
+                self._idle.append((cursor, self._last_used))
+            if self.root_idle_timeout == 0 and self._size == len(self._idle):
+                # No keep-alive requested: release the database as soon as it is unused
+                self._release_root_locked()
+            self._cond.notify_all()
+
+    @contextmanager
+    def cursor(self, timeout: float | None = None) -> Iterator[duckdb.DuckDBPyConnection]:
+        """Check out a cursor for the duration of the `with` block"""
+        cursor = self.checkout(timeout)
+        healthy = True
+        try:
+            yield cursor
+        except Exception:
+            # A failed statement can leave the cursor in an aborted transaction
+            healthy = self.is_healthy(cursor)
+            raise
+        finally:
+            self.checkin(cursor, healthy)
+
+    def evict_idle(self):
+        """Close idle cursors, and the root connection if the whole pool has been idle too long"""
+        with self._cond:
+            self._evict_idle_locked(time.monotonic())
+
+    def stats(self) -> dict:
+        """Current pool utilization"""
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max_size": self.max_size,
+                "connected": self._root is not None,
+            }
+
+    def close(self):
+        """Close the root connection and idle cursors and refuse new checkouts"""
+        self._stop.set()
+        with self._cond:
+            self._closed = True
+            self._release_root_locked()
+            self._cond.notify_all()
+
+
+@dataclass
+class TableInfo:
+    """Catalog entry of one table or view"""
+
+    database: str
+    schema: str
+    name: str
+    kind: Literal["table", "view"]
+    estimated_rows: int | None
+    comment: str | None
+    # name, type, nullable and comment of each column, in table order
+    columns: list[dict] = field(default_factory=list)
+
+    @property
+    def qualified_name(self) -> str:
+        return f"{self.database}.{self.schema}.{self.name}"
+
+    def as_dict(self, statistics: dict[str, dict] | None = None) -> dict:
+        columns = self.columns
+        if statistics is not None:
+            columns = [{**c, "statistics": statistics.get(c["name"])} for c in columns]
+        return {
+            "name": self.qualified_name,
+            "type": self.kind,
+            "estimatedRows": self.estimated_rows,
+            "comment": self.comment,
+            "columns": columns,
+        }
+
+
+class SchemaCatalog:
+    """
+    Snapshot of the tables, views and columns of every attached database, so
+    schema questions are answered without a query round trip.
+    The snapshot is reloaded when `version()` changes (local file written, or a
+    statement run through this server that may have changed it), and after `ttl`
+    seconds for remote databases that can change behind our back.
+    Column statistics are computed on a sample the first time a table is
+    described, and kept until the snapshot is reloaded.
+    """
+
+    def __init__(
+        self,
+        connection: Callable[[], ContextManager[duckdb.DuckDBPyConnection]],
+        version: Callable[[], Hashable],
+        ttl: float | None = None,
+        stats_sample_rows: int = DEFAULT_STATS_SAMPLE_ROWS,
+    ):
+        self._connection = connection
+        self._version = version
+        self.ttl = ttl
+        self.stats_sample_rows = stats_sample_rows
+        self._tables: dict[str, TableInfo] | None = None
+        self._statistics: dict[str, dict[str, dict]] = {}
+        self._loaded_version = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _is_stale(self) -> bool:
+        if self._tables is None or self._version() != self._loaded_version:
+            return True
+        return bool(self.ttl) and time.monotonic() - self._loaded_at > self.ttl
+
+    def refresh(self):
+        """Reload the snapshot from DuckDB's catalog functions"""
+        version = self._version()
+        with self._connection() as conn:
+            table_rows = conn.execute(
+                """
+                SELECT database_name, schema_name, table_name, 'table', estimated_size, comment
+                FROM duckdb_tables() WHERE NOT internal
+                UNION ALL
+                SELECT database_name, schema_name, view_name, 'view', NULL, comment
+                FROM duckdb_views() WHERE NOT internal
+                ORDER BY 1, 2, 3
+                """
+            ).fetchall()
+            column_rows = conn.execute(
+                """
+                SELECT database_name, schema_name, table_name, column_name, data_type, is_nullable, comment
+                FROM duckdb_columns() WHERE NOT internal
+                ORDER BY database_name, schema_name, table_name, column_index
+                """
+            ).fetchall()
+
+        tables = {}
+        for database, schema, name, kind, estimated_rows, comment in table_rows:
+            table = TableInfo(database, schema, name, kind, estimated_rows, comment)
+            tables[table.qualified_name] = table
+        for database, schema, name, column, data_type, nullable, comment in column_rows:
+            table = tables.get(f"{database}.{schema}.{name}")
+            if table is not None:
+                table.columns.append(
+                    {"name": column, "type": data_type, "nullable": nullable, "comment": comment}
+                )
+
+        with self._lock:
+            self._tables = tables
+            self._statistics = {}
+            self._loaded_version = version
+            self._loaded_at = time.monotonic()
+        logger.info(f"📚 Schema catalog loaded: {len(tables)} tables and views")
+
+    def _snapshot(self) -> dict[str, TableInfo]:
+        if self._is_stale():
+            self.refresh()
+        return self._tables
+
+    def tables(self, database: str | None = None, schema: str | None = None) -> list[TableInfo]:
+        """Tables and views, optionally filtered by database and schema (case insensitive)"""
+        return [
+            t
+            for t in self._snapshot().values()
+            if (database is None or t.database.lower() == database.lower())
+            and (schema is None or t.schema.lower() == schema.lower())
+        ]
+
+    def find(self, name: str) -> TableInfo:
+        """
+        Look up a table by name, qualified (`db.schema.table`, `schema.table`) or not.
+        Raises ValueError if there is no match or the name is ambiguous.
+        """
+        parts = [p.strip('"').lower() for p in name.split(".")]
+        matches = [
+            t
+            for t in self._snapshot().values()
+            if [p.lower() for p in (t.database, t.schema, t.name)][-len(parts) :] == parts
+        ]
+        if not matches:
+            raise ValueError(f"Table `{name}` not found, use `list_tables` to see the available tables")
+        if len(matches) > 1:
+            candidates = ", ".join(t.qualified_name for t in matches)
+            raise ValueError(f"Table name `{name}` is ambiguous, use one of: {candidates}")
+        return matches[0]
+
+    def statistics(self, table: TableInfo, conn: duckdb.DuckDBPyConnection) -> dict[str, dict]:
+        """
+        Approximate statistics of each column, computed on a sample of the table.
+        `conn` is only used when they are not cached yet.
+        """
+        snapshot = self._snapshot()
+        with self._lock:
+            cached = self._statistics.get(table.qualified_name)
+        if cached is not None:
+            return cached
+
+        qualified = ".".join(quote_identifier(p) for p in (table.database, table.schema, table.name))
+        rows = conn.execute(
+            f"SUMMARIZE SELECT * FROM {qualified} USING SAMPLE {self.stats_sample_rows} ROWS"
+        ).fetchall()
+        statistics = {
+            column: {
+                "min": min_value,
+                "max": max_value,
+                "approxUnique": approx_unique,
+                "nullPercentage": float(null_percentage) if null_percentage is not None else None,
+            }
+            for column, _, min_value, max_value, approx_unique, *_, null_percentage in rows
+        }
+        with self._lock:
+            # Don't cache statistics of a snapshot that was replaced meanwhile
+            if self._tables is snapshot:
+                self._statistics[table.qualified_name] = statistics
+        return statistics
+
+    def as_dict(self) -> dict:
+        return {"tables": [t.as_dict() for t in self._snapshot().values()]}
+
 
 class DatabaseClient:
     def __init__(
@@ -18,8 +542,52 @@ class DatabaseClient:
         home_dir: str | None = None,
         saas_mode: bool = False,
         read_only: bool = False,
+        pool_size: int = DEFAULT_QUERY_WORKERS,
+        pool_idle_timeout: float = DEFAULT_POOL_IDLE_TIMEOUT,
+        read_only_idle_timeout: float = DEFAULT_READ_ONLY_IDLE_TIMEOUT,
+        result_cache_size: int = DEFAULT_RESULT_CACHE_SIZE,
+        result_cache_ttl: float = DEFAULT_RESULT_CACHE_TTL,
+        max_rows: int = DEFAULT_MAX_ROWS,
+        max_result_bytes: int = DEFAULT_MAX_RESULT_BYTES,
+        cursor_ttl: float = DEFAULT_CURSOR_TTL,
+        max_cursors_per_session: int = DEFAULT_MAX_CURSORS_PER_SESSION,
+        result_format: str = DEFAULT_RESULT_FORMAT,
+        max_col_width: int | None = None,
+        spool_dir: str | None = None,
+        spool_max_bytes: int = DEFAULT_SPOOL_MAX_BYTES,
+        query_timeout: float = DEFAULT_QUERY_TIMEOUT,
+        schema_catalog_ttl: float = DEFAULT_SCHEMA_CATALOG_TTL,
+        summaries: list[SummaryDefinition] | None = None,
+        summary_refresh_interval: float = DEFAULT_SUMMARY_REFRESH_INTERVAL,
+        mirror: bool = False,
+        mirror_dir: str | None = None,
+        mirror_tables: list[str] | None = None,
+        mirror_refresh_interval: float = DEFAULT_MIRROR_REFRESH_INTERVAL,
+        s3_options: S3Options | None = None,
+        attach: list[DatabaseConfig] | None = None,
+        prepared_cache_size: int = DEFAULT_PREPARED_CACHE_SIZE,
+        advisor: bool = False,
+        advisor_min_queries: int = DEFAULT_ADVISOR_MIN_QUERIES,
+        advisor_replay_rows: int = DEFAULT_ADVISOR_REPLAY_ROWS,
+        profile_history: int = DEFAULT_PROFILE_HISTORY,
     ):
+        if result_format not in FORMATTERS:
+            raise ValueError(
+                f"Unknown result format `{result_format}`, expected one of: {', '.join(FORMATTERS)}"
+            )
         self._read_only = read_only
+        self.s3_options = s3_options or S3Options()
+        self.attached = attach or []
+        # Size cap of the persistent S3 block cache, when it is enabled
+        self.s3_cache = None
+        self.result_format = result_format
+        self.max_col_width = max_col_width
+        self.query_timeout = query_timeout
+        self.metrics = Metrics()
+        self.prepared = PreparedStatements(prepared_cache_size, self.metrics)
+        self.profiles = ProfileLog(profile_history)
+        self.max_rows = max_rows
+        self.max_result_bytes = max_result_bytes
         self.db_path, self.db_type = self._resolve_db_path_type(
             db_path, motherduck_token, saas_mode
         )
@@ -29,7 +597,121 @@ class DatabaseClient:
         if home_dir:
             os.environ["HOME"] = home_dir
 
+        # Seconds spent in each step of the connection setup, for the startup report
+        self.setup_timings: dict[str, float] = {}
+        if max_cursors_per_session > 0 and pool_size < 2:
+            # Every open result pins a pooled cursor and one must stay free for
+            # new queries, so a single cursor would turn pagination off
+            logger.info("Raising the cursor pool to 2 cursors so truncated results can be paginated")
+            pool_size = 2
         self.conn = self._initialize_connection()
+        if self.conn is not None:
+            with self._setup_step("attach databases"):
+                self._attach_databases(self.conn)
+        # DuckDB connections must not be shared between threads, so queries
+        # run on pooled cursors of `self.conn` instead of `self.conn` itself
+        if self.conn is None:
+            # Read-only local file: keep a warm connection for bursts of queries,
+            # but release the file once idle or when another process changed it
+            self._file_signature = None
+            self.pool = CursorPool(
+                self._connect_read_only,
+                max_size=pool_size,
+                idle_timeout=pool_idle_timeout,
+                setup=self._setup_cursor,
+                root_idle_timeout=read_only_idle_timeout,
+                is_stale=self._file_changed,
+            )
+        else:
+            self.pool = CursorPool(
+                lambda: self.conn,
+                max_size=pool_size,
+                idle_timeout=pool_idle_timeout,
+                setup=self._setup_cursor,
+            )
+
+        # Local files are invalidated through their mtime, remote databases
+        # can change behind our back so their entries expire after a TTL
+        self.result_cache = None
+        if result_cache_size > 0:
+            self.result_cache = ResultCache(
+                max_bytes=result_cache_size,
+                ttl=None if self.db_type == "duckdb" else result_cache_ttl,
+            )
+        # Bumped after every statement that may have changed the database
+        self._write_generation = 0
+
+        # Every open result pins a pooled cursor, so always leave one free for new queries
+        self.cursors = CursorStore(
+            ttl=cursor_ttl,
+            max_per_session=max_cursors_per_session,
+            max_open=pool_size - 1,
+        )
+
+        # Exported results, created on first use so no directory is made unless needed
+        self._spool_dir = spool_dir
+        self._spool_max_bytes = spool_max_bytes
+        self._spool = None
+        self._spool_lock = threading.Lock()
+
+        self.catalog = SchemaCatalog(
+            self._connection,
+            self._database_version,
+            ttl=None if self.db_type == "duckdb" else schema_catalog_ttl,
+        )
+        try:
+            with self._setup_step("schema catalog"):
+                self.catalog.refresh()
+        except Exception as e:
+            # Not fatal, the catalog is loaded again on first use
+            logger.warning(f"⚠️ Could not load the schema catalog: {e}")
+        # Histogram of filtered columns, for index and sort order proposals
+        self.advisor = None
+        if advisor:
+            self.advisor = IndexAdvisor(
+                self.catalog, min_queries=advisor_min_queries, replay_rows=advisor_replay_rows
+            )
+        if self.db_type == "s3" and self.s3_options.prefetch:
+            threading.Thread(target=self._prefetch, name="medicair-s3-prefetch", daemon=True).start()
+
+        # Materialized summaries, built in the background so startup isn't delayed
+        self.summaries = None
+        if summaries:
+            self.summaries = SummaryStore(
+                summaries,
+                self._connection,
+                self._database_version,
+                refresh_interval=summary_refresh_interval,
+            )
+            self.summaries.start()
+
+        # Local copy of a remote database for reads, built in the background
+        self.mirror = None
+        if mirror:
+            if self.db_type == "duckdb":
+                logger.warning("⚠️ The local mirror only applies to MotherDuck and S3 databases, ignoring it")
+            elif self._read_only:
+                raise ValueError("The local mirror is not supported in read-only mode")
+            else:
+                self.mirror = DatabaseMirror(
+                    # Without the token, the source is persisted next to the mirror
+                    source=self.db_path.split("?")[0],
+                    connection=self._connection,
+                    version=self._database_version,
+                    directory=mirror_dir,
+                    tables=mirror_tables,
+                    refresh_interval=mirror_refresh_interval,
+                    signature=self._s3_signature if self.db_type == "s3" else None,
+                )
+                self.mirror.start()
+
+    @contextmanager
+    def _setup_step(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.setup_timings[name] = time.perf_counter() - started
 
     def _initialize_connection(self) -> Optional[duckdb.DuckDBPyConnection]:
         """Initialize connection to the MotherDuck or DuckDB database"""
@@ -43,15 +725,16 @@ class DatabaseClient:
         if self.db_type == "duckdb" and self._read_only:
             # check that we can connect, issue a `select 1` and then close + return None
             try:
-                conn = duckdb.connect(
-                    self.db_path,
-                    config={
-                        "custom_user_agent": f"mcp-server-medicair/{SERVER_VERSION}"
-                    },
-                    read_only=self._read_only,
-                )
-                conn.execute("SELECT 1")
-                conn.close()
+                with self._setup_step("connect"):
+                    conn = duckdb.connect(
+                        self.db_path,
+                        config={
+                            "custom_user_agent": f"mcp-server-medicair/{SERVER_VERSION}"
+                        },
+                        read_only=self._read_only,
+                    )
+                    conn.execute("SELECT 1")
+                    conn.close()
                 return None
             except Exception as e:
                 logger.error(f"❌ Read-only check failed: {e}")
@@ -62,36 +745,17 @@ class DatabaseClient:
             # For S3, we need to create an in-memory connection and attach the S3 database
             conn = duckdb.connect(':memory:')
             
-            # Install and load the httpfs extension for S3 support
-            import io
-            from contextlib import redirect_stdout, redirect_stderr
-            
-            null_file = io.StringIO()
-            with redirect_stdout(null_file), redirect_stderr(null_file):
-                try:
-                    conn.execute("INSTALL httpfs;")
-                except:
-                    pass  # Extension might already be installed
-                conn.execute("LOAD httpfs;")
-            
-            # Configure S3 credentials from environment variables using CREATE SECRET
-            aws_access_key = os.environ.get('AWS_ACCESS_KEY_ID')
-            aws_secret_key = os.environ.get('AWS_SECRET_ACCESS_KEY')
-            aws_region = os.environ.get('AWS_DEFAULT_REGION', 'us-east-1')
-            
-            
-            if aws_access_key and aws_secret_key:
-                # Use CREATE SECRET for better credential management
-                conn.execute(f"""
-                    CREATE SECRET IF NOT EXISTS s3_secret (
-                        TYPE S3,
-                        KEY_ID '{aws_access_key}',
-                        SECRET '{aws_secret_key}',
-                        REGION '{aws_region}'
-                    );
-                """)
-            
+            # Install and load httpfs with the S3 performance settings, then the credentials
+            with self._setup_step("httpfs"):
+                if s3.configure(conn, self.s3_options):
+                    self.s3_cache = s3.CacheDirectoryLRU(
+                        self.s3_options.cache_dir, self.s3_options.cache_max_bytes
+                    )
+                    self.s3_cache.start()
+                s3.create_secret(conn)
+
             # Attach the S3 database
+            attach_started = time.perf_counter()
             try:
                 # For S3, we always attach as READ_ONLY since S3 storage is typically read-only
                 # Even when not in read_only mode, we attach as READ_ONLY for S3
@@ -114,18 +778,77 @@ class DatabaseClient:
                         raise
                 else:
                     raise
+            self.setup_timings["attach s3"] = time.perf_counter() - attach_started
                 
             return conn
 
+        with self._setup_step("connect"):
+            conn = duckdb.connect(
+                self.db_path,
+                config={"custom_user_agent": f"mcp-server-medicair/{SERVER_VERSION}"},
+                read_only=self._read_only,
+            )
+
+        logger.info(f"✅ Successfully connected to {self.db_type} database")
+
+        return conn
+
+    def _read_file_signature(self) -> tuple:
+        """Modification times of the database file and its WAL, used to detect writes by other processes"""
+        signature = []
+        for path in (self.db_path, self.db_path + ".wal"):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _file_changed(self) -> bool:
+        return self._read_file_signature() != self._file_signature
+
+    def _connect_read_only(self) -> duckdb.DuckDBPyConnection:
+        """Open the read-only connection used by the pool in `--read-only` mode"""
+        self._file_signature = self._read_file_signature()
+        logger.debug(f"🔌 Opening read-only connection to {self.db_path}")
         conn = duckdb.connect(
             self.db_path,
             config={"custom_user_agent": f"mcp-server-medicair/{SERVER_VERSION}"},
-            read_only=self._read_only,
+            read_only=True,
         )
+        self._attach_databases(conn)
+        return conn
 
-        logger.info(f"✅ Successfully connected to {self.db_type} database")
+    def _attach_databases(self, conn: duckdb.DuckDBPyConnection):
+        """Attach the databases configured with `attach`, for cross-database queries"""
+        for database in self.attached:
+            read_only = self._read_only if database.read_only is None else database.read_only
+            path = "'" + database.db_path.replace("'", "''") + "'"
+            options = " (READ_ONLY)" if read_only or self._read_only else ""
+            conn.execute(f"ATTACH IF NOT EXISTS {path} AS {quote_identifier(database.name)}{options}")
+            logger.info(f"🔗 Attached {database.name} for cross-database queries")
 
-        return conn
+    def _prefetch(self):
+        """Warm the S3 block cache with the data of every table"""
+        try:
+            tables = [
+                (t.database, t.schema, t.name) for t in self.catalog.tables() if t.kind == "table"
+            ]
+            with self._connection() as conn:
+                s3.prefetch(conn, tables)
+        except Exception as e:
+            logger.warning(f"⚠️ S3 prefetch failed: {e}")
+
+    def _s3_signature(self, conn: duckdb.DuckDBPyConnection) -> tuple:
+        """Size and modification time of the S3 database file, read without downloading it"""
+        return conn.execute(
+            "SELECT size, last_modified FROM read_blob(?)", [self.db_path]
+        ).fetchone()
+
+    def _setup_cursor(self, cursor: duckdb.DuckDBPyConnection):
+        """Apply per-connection state that cursors don't inherit from the root connection"""
+        if self.db_type == "s3":
+            cursor.execute("USE s3db;")
 
     def _resolve_db_path_type(
         self, db_path: str, motherduck_token: str | None = None, saas_mode: bool = False
@@ -168,62 +891,555 @@ class DatabaseClient:
 
         return db_path, "duckdb"
 
-    def _execute(self, query: str) -> tuple[str, dict]:
+    def _database_version(self) -> tuple:
+        """Token that changes whenever cached results for this database may be stale"""
+        if self.db_type == "duckdb" and self.db_path != ":memory:":
+            return (self._write_generation, self._read_file_signature())
+        return (self._write_generation,)
+
+    @staticmethod
+    def _is_read_only_statement(conn: duckdb.DuckDBPyConnection, query: str) -> bool:
+        """Whether every statement in `query` is a plain SELECT"""
+        try:
+            statements = conn.extract_statements(query)
+        except Exception:
+            return False
+        return bool(statements) and all(
+            statement.type == duckdb.StatementType.SELECT for statement in statements
+        )
+
+    @staticmethod
+    def _check_session_state(conn: duckdb.DuckDBPyConnection, query: str):
         """
-        Execute a query and return both formatted string and structured data.
-        Returns: (formatted_string, structured_data_dict)
+        Refuse statements that would change the state of the pooled cursor they
+        run on (SET, USE, temporary objects, ...): the next query of the client
+        may run on another cursor, and this one may serve another client
+        """
+        try:
+            statements = conn.extract_statements(query)
+        except Exception:
+            # Syntax errors are reported by DuckDB when the query runs
+            return
+        for statement in statements:
+            if _SESSION_STATE.match(statement.query):
+                raise ValueError(
+                    f"`{statement.query.strip()}` would only apply to one of the server's pooled "
+                    "connections, so it is not supported: qualify names with their database and "
+                    "schema, use regular tables instead of temporary ones, and SET GLOBAL for settings"
+                )
+
+    @contextmanager
+    def _connection(self) -> Iterator[duckdb.DuckDBPyConnection]:
+        """Provide a pooled cursor for one query"""
+        with self.pool.cursor() as cursor:
+            yield cursor
+
+    @contextmanager
+    def _read_connection(self, query: str) -> Iterator[duckdb.DuckDBPyConnection]:
+        """Provide a cursor to run a read on: on the local mirror when it can answer `query`"""
+        cursor = self.mirror.cursor(query) if self.mirror is not None else None
+        if cursor is None:
+            with self._connection() as cursor:
+                yield cursor
+            return
+        logger.info("🪞 Reading from the local mirror")
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+    def _format(
+        self,
+        column_names: list[str],
+        column_types: list[str],
+        rows: list[tuple],
+        result_format: str | None = None,
+    ) -> str:
+        """Render rows with the requested formatter, the server default if none"""
+        return render(
+            result_format or self.result_format,
+            column_names,
+            column_types,
+            rows,
+            self.max_col_width,
+        )
+
+    def _timeout(self, timeout: float | None = None) -> float | None:
+        """Effective timeout of a call: a per-call timeout may only lower the server's"""
+        if not timeout or timeout <= 0:
+            return self.query_timeout or None
+        if self.query_timeout:
+            return min(timeout, self.query_timeout)
+        return timeout
+
+    @contextmanager
+    def _interruptible(
+        self,
+        conn: duckdb.DuckDBPyConnection,
+        running: RunningQuery,
+        timeout: float | None,
+    ) -> Iterator[None]:
+        """Run a block that can be interrupted through `running`, or after `timeout` seconds"""
+        timer = None
+        if timeout:
+            timer = threading.Timer(timeout, running.interrupt, args=("timeout",))
+            timer.daemon = True
+            timer.start()
+        try:
+            with running.attached(conn):
+                yield
+        except duckdb.InterruptException:
+            if running.interrupted == "timeout":
+                self.metrics.inc("queries_timed_out")
+                logger.warning(f"⏱️ Query interrupted after the {timeout:g} s timeout")
+                raise ValueError(
+                    f"Query interrupted after the {timeout:g} s timeout, add filters or a LIMIT to make it cheaper"
+                )
+            if running.interrupted == "cancelled":
+                self.metrics.inc("queries_cancelled")
+                logger.info("🛑 Query cancelled by the client")
+                raise ValueError("Query cancelled by the client")
+            raise
+        finally:
+            if timer is not None:
+                timer.cancel()
+
+    def _fetch_page(
+        self,
+        conn: duckdb.DuckDBPyConnection,
+        column_names: list[str],
+        column_types: list[str],
+        buffer: list[tuple],
+        result_format: str | None = None,
+        running: RunningQuery | None = None,
+    ) -> tuple[str, list[tuple], list[tuple], bool]:
+        """
+        Fetch and render the next page of an executed result.
+        The page holds at most `max_rows` rows and, when possible, renders to at
+        most `max_result_bytes`; trailing rows that don't fit are kept for the next page.
+        Returns: (formatted_string, page_rows, leftover_rows, has_more)
+        """
+        running = running or RunningQuery()
+        wanted = self.max_rows + 1 - len(buffer)
+        with running.timed("fetch"):
+            rows = buffer + (conn.fetchmany(wanted) if wanted > 0 else [])
+        page, leftover = rows[: self.max_rows], rows[self.max_rows :]
+        exhausted = len(rows) <= self.max_rows
+
+        with running.timed("format"):
+            formatted_output = self._format(column_names, column_types, page, result_format)
+            size = len(formatted_output.encode())
+            while size > self.max_result_bytes and len(page) > 1:
+                # Shrink proportionally (with some slack) until the rendered page fits
+                keep = min(len(page) - 1, max(1, int(len(page) * self.max_result_bytes / size * 0.9)))
+                leftover = page[keep:] + leftover
+                page = page[:keep]
+                formatted_output = self._format(column_names, column_types, page, result_format)
+                size = len(formatted_output.encode())
+
+        has_more = bool(leftover) or not exhausted
+        return formatted_output, page, leftover, has_more
+
+    def _execute(
+        self,
+        query: str,
+        session_id: Hashable = None,
+        result_format: str | None = None,
+        params: list | dict | None = None,
+        running: RunningQuery | None = None,
+        timeout: float | None = None,
+        use_cache: bool = True,
+        profile: bool = False,
+    ) -> QueryResult:
+        """
+        Execute a query and return the first page of results.
+        With `profile`, the query runs under DuckDB's JSON profiler and is read
+        to the end so the profile is complete; only its first page is returned.
+        With `params`, the query's `?`/`$1` (list) or `$name` (dict) placeholders
+        are bound to them through a prepared statement cached on the cursor.
+        Results larger than one page come back truncated, with a cursor to fetch
+        the remaining rows through `fetch_page`.
         """
         logger.info(f"📊 Executing SQL query: {query}")
-        
-        if self.conn is None:
-            # open short lived readonly connection for local DuckDB, run query, close connection, return result
-            conn = duckdb.connect(
+        running = running or RunningQuery()
+        result_format = result_format or self.result_format
+        if result_format not in FORMATTERS:
+            raise ValueError(
+                f"Unknown result format `{result_format}`, expected one of: {', '.join(FORMATTERS)}"
+            )
+
+        cache_key = None
+        if self.result_cache is not None and use_cache and not profile:
+            normalized = normalize_sql(query)
+            cache_key = (
+                self.db_type,
                 self.db_path,
-                config={"custom_user_agent": f"mcp-server-medicair/{SERVER_VERSION}"},
-                read_only=self._read_only,
+                self._database_version(),
+                result_format,
+                normalized,
+                json.dumps(params, default=str) if params is not None else None,
             )
-            q = conn.execute(query)
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                logger.info("⚡ Query result served from cache")
+                self.metrics.inc("queries", status="cached")
+                return cached
+
+        self.cursors.sweep()
+        # Filters are recorded as the client wrote them, not as rewritten to a summary
+        original_query = query
+        rewritten = None
+        if self.summaries is not None and params is None:
+            rewritten = self.summaries.rewrite(query)
+        if rewritten is not None:
+            logger.info(f"📐 Answering from a summary table: {rewritten}")
+            query = rewritten
+            conn = self.summaries.cursor()
+            release = lambda healthy=True: conn.close()
         else:
-            q = self.conn.execute(query)
+            conn = self.mirror.cursor(query) if self.mirror is not None else None
+            if conn is not None:
+                logger.info("🪞 Answering from the local mirror")
+                release = lambda healthy=True: conn.close()
+            else:
+                conn = self.pool.checkout()
+                release = lambda healthy=True: self.pool.checkin(conn, healthy)
+        keep_open = False
+        healthy = True
+        try:
+            read_only_statement = self._is_read_only_statement(conn, query)
+            if not read_only_statement:
+                self._check_session_state(conn, query)
+                # Writes (and SET/ATTACH/...) may change what other queries return,
+                # and DDL the schema catalog
+                self._write_generation += 1
+            if cache_key is not None:
+                cacheable = read_only_statement and not is_volatile(normalized)
 
-        # Get column names and types
-        column_names = [d[0] for d in q.description]
-        column_types = [str(d[1]) for d in q.description]
-        
-        # Fetch all rows
-        rows = q.fetchall()
-        
-        logger.info(f"✅ Query executed successfully: {len(rows)} rows returned")
+            started = time.monotonic()
+            with (
+                self._interruptible(conn, running, timeout),
+                profiling.capture(conn) if profile else nullcontext({}) as captured,
+            ):
+                with running.timed("execute"):
+                    if params is not None:
+                        q = self.prepared.execute(conn, query, params)
+                    else:
+                        q = conn.execute(query)
+                if not read_only_statement:
+                    # Again, in case a concurrent reader cached the state from before the write
+                    self._write_generation += 1
+                running.phase = "fetching"
+
+                # Get column names and types
+                column_names = [d[0] for d in q.description]
+                column_types = [str(d[1]) for d in q.description]
+
+                # Fetch the first page only, the rest stays in DuckDB until asked for
+                formatted_output, rows, leftover, has_more = self._fetch_page(
+                    q, column_names, column_types, [], result_format, running
+                )
+                total_rows = len(rows) + len(leftover)
+                if profile and has_more:
+                    # DuckDB writes the profile once the result is read to the end
+                    with running.timed("fetch"):
+                        while batch := q.fetchmany(DEFAULT_EXPORT_BATCH_ROWS):
+                            total_rows += len(batch)
+            running.rows_fetched = len(rows)
+
+            token = None
+            if has_more and not profile:
+                token = self.cursors.open(
+                    session_id,
+                    conn,
+                    column_names,
+                    column_types,
+                    buffer=leftover,
+                    rows_served=len(rows),
+                    release=release,
+                    result_format=result_format,
+                )
+                keep_open = token is not None
+        except Exception:
+            self.metrics.inc("queries", status="error")
+            # A failed statement can leave the cursor in an aborted transaction
+            healthy = CursorPool.is_healthy(conn)
+            raise
+        finally:
+            if not keep_open:
+                release(healthy)
+        self.metrics.inc("queries", status="ok")
+        self._observe(running, len(rows), len(formatted_output))
+
+        logger.info(
+            f"✅ Query executed successfully: {len(rows)} rows returned"
+            + (" (truncated)" if has_more else "")
+        )
+        if self.advisor is not None and read_only_statement:
+            try:
+                self.advisor.record(original_query, params, time.monotonic() - started)
+            except Exception as e:
+                logger.debug(f"Could not record the query's filters: {e}")
         logger.debug(f"Query result columns: {column_names}")
         logger.debug(f"Query result sample (first 3 rows): {rows[:3] if len(rows) > 0 else 'No rows'}")
-        
-        # Format as string using tabulate
-        formatted_headers = [name + "\n" + col_type for name, col_type in zip(column_names, column_types)]
-        formatted_output = tabulate(rows, headers=formatted_headers, tablefmt="pretty")
 
-        # Create structured data for widget in ChatGPT format
-        # ChatGPT expects: {columns: [...], rows: [[...], [...]], rowCount: int}
-        structured_data = {
-            "columns": column_names,
-            "rows": [list(row) for row in rows],  # Keep rows as array of arrays (tuples converted to lists)
-            "rowCount": len(rows),
-        }
-        
-        logger.debug(f"📦 Structured data created: columns={len(column_names)}, rows={len(structured_data['rows'])}, rowCount={structured_data['rowCount']}")
-        logger.debug(f"📦 Structured data preview: columns={column_names[:5]}..., rows count={len(structured_data['rows'])}")
+        query_profile = None
+        if captured.get("plan") is not None:
+            query_profile = self.profiles.add(
+                original_query, captured["plan"], True, captured["latency"], total_rows
+            )
+            logger.info(f"⏱️ Query profiled: {query_profile.uri}")
 
-        if self.conn is None:
-            conn.close()
+        result = QueryResult(
+            formatted=formatted_output,
+            column_names=column_names,
+            column_types=column_types,
+            rows=rows,
+            truncated=has_more,
+            cursor=token,
+            profile=query_profile,
+        )
+
+        if cache_key is not None and cacheable and not has_more:
+            # Rough footprint: the rendered table plus about as much again for the rows
+            self.result_cache.put(cache_key, result, size=2 * len(formatted_output))
+
+        return result
+
+    def _fetch_next(
+        self,
+        token: str,
+        running: RunningQuery | None = None,
+        timeout: float | None = None,
+    ) -> QueryResult:
+        running = running or RunningQuery()
+        cursor = self.cursors.take(token)
+        running.phase = "fetching"
+        try:
+            with self._interruptible(cursor.conn, running, timeout):
+                formatted_output, rows, cursor.buffer, has_more = self._fetch_page(
+                    cursor.conn,
+                    cursor.column_names,
+                    cursor.column_types,
+                    cursor.buffer,
+                    cursor.result_format,
+                    running,
+                )
+        except Exception:
+            cursor.release()
+            raise
+
+        cursor.rows_served += len(rows)
+        running.rows_fetched = len(rows)
+        self._observe(running, len(rows), len(formatted_output))
+        if has_more:
+            self.cursors.put_back(cursor)
+        else:
+            cursor.release()
+        logger.info(
+            f"✅ Fetched {len(rows)} more rows ({cursor.rows_served} served so far)"
+            + ("" if has_more else ", result exhausted")
+        )
+
+        return QueryResult(
+            formatted=formatted_output,
+            column_names=cursor.column_names,
+            column_types=cursor.column_types,
+            rows=rows,
+            truncated=has_more,
+            cursor=token if has_more else None,
+        )
+
+    def _observe(self, running: RunningQuery, row_count: int, size: int):
+        """Account a served page of results in the metrics"""
+        for phase, seconds in running.timings.items():
+            self.metrics.observe("query_phase_seconds", seconds, phase=phase)
+        self.metrics.inc("rows_returned", row_count)
+        self.metrics.inc("bytes_returned", size)
+
+    def ping(self, timeout: float | None = None):
+        """Run a trivial query on a pooled cursor, raising if the database doesn't answer"""
+        with self.pool.cursor(timeout) as conn:
+            conn.execute("SELECT 1").fetchone()
 
-        return formatted_output, structured_data
+    @property
+    def spool(self) -> ResultSpool:
+        if self._spool is None:
+            with self._spool_lock:
+                if self._spool is None:
+                    self._spool = ResultSpool(self._spool_dir, self._spool_max_bytes)
+        return self._spool
+
+    def check_query(self, query: str):
+        """Prepare `query` without running it, raising ValueError if it doesn't bind"""
+        try:
+            with self._connection() as conn:
+                conn.execute(f"PREPARE medicair_check AS {query}")
+                conn.execute("DEALLOCATE medicair_check")
+        except Exception as e:
+            raise ValueError(f"❌ Error preparing query: {e}")
+
+    def _explain(
+        self,
+        query: str,
+        analyze: bool = True,
+        running: RunningQuery | None = None,
+        timeout: float | None = None,
+    ) -> Profile:
+        logger.info(f"🔬 Explaining SQL query: {query}")
+        running = running or RunningQuery()
+        with self._read_connection(query) as conn, self._interruptible(conn, running, timeout):
+            # EXPLAIN runs every statement but the last one
+            if len(conn.extract_statements(query)) != 1:
+                raise ValueError("Only a single statement can be explained")
+            if analyze and not self._is_read_only_statement(conn, query):
+                raise ValueError(
+                    "Only SELECT queries can be run with EXPLAIN ANALYZE, set analyze to false to see the plan"
+                )
+            plan, latency, rows = profiling.explain(conn, query, analyze)
+        return self.profiles.add(query, plan, analyze, latency, rows)
+
+    def _advise(
+        self,
+        min_queries: int | None = None,
+        replay: bool = True,
+        apply: bool = False,
+        running: RunningQuery | None = None,
+        timeout: float | None = None,
+    ) -> list[Recommendation]:
+        if self.advisor is None:
+            raise ValueError("The index advisor is disabled, start the server with --advisor")
+        if apply and self._read_only:
+            raise ValueError("Indexes and sort orders can't be applied in read-only mode")
+        running = running or RunningQuery()
+        with self._connection() as conn, self._interruptible(conn, running, timeout):
+            # Only changes that paid off in their replay are applied
+            report = self.advisor.advise(conn, min_queries, replay or apply)
+            if apply:
+                for proposal in report:
+                    if not proposal.beneficial:
+                        continue
+                    self._write_generation += 1
+                    try:
+                        self.advisor.apply(conn, proposal)
+                    except duckdb.InterruptException:
+                        raise
+                    except duckdb.Error as e:
+                        proposal.error = str(e)
+                    finally:
+                        self._write_generation += 1
+        return report
+
+    def spooled_results(self) -> list[SpooledResult]:
+        """Exported results, without creating the spool if nothing was exported yet"""
+        return self._spool.list() if self._spool is not None else []
+
+    def _export(
+        self,
+        query: str,
+        export_format: str,
+        running: RunningQuery | None = None,
+        timeout: float | None = None,
+    ) -> SpooledResult:
+        """
+        Run a query and stream its result to a file in the spool directory.
+        Record batches go straight from DuckDB to the file writer, the result
+        is never materialized as Python objects or held in memory as a whole.
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError(
+                "Exporting results requires pyarrow, install `mcp-server-medicair[export]`"
+            )
+
+        logger.info(f"📦 Exporting SQL query to {export_format}: {query}")
+        running = running or RunningQuery()
+        result_id, path = self.spool.new_path(export_format)
+        row_count = 0
+        with self._read_connection(query) as conn, self._interruptible(conn, running, timeout):
+            if not self._is_read_only_statement(conn, query):
+                raise ValueError("Only SELECT queries can be exported")
+            q = conn.execute(query)
+            running.phase = "exporting"
+            schema = [{"name": d[0], "type": str(d[1])} for d in q.description]
+            reader = q.fetch_record_batch(DEFAULT_EXPORT_BATCH_ROWS)
+            try:
+                if export_format == "parquet":
+                    writer = pq.ParquetWriter(path, reader.schema)
+                else:
+                    writer = pa.ipc.new_file(path, reader.schema)
+                with writer:
+                    for batch in reader:
+                        writer.write_batch(batch)
+                        row_count += batch.num_rows
+                        running.rows_fetched = row_count
+            except BaseException:
+                if os.path.exists(path):
+                    os.remove(path)
+                raise
+
+        result = self.spool.add(result_id, path, export_format, query, schema, row_count)
+        logger.info(f"✅ Exported {row_count} rows to {result.uri} ({result.size} bytes)")
+        return result
+
+    def _list_tables(self, database: str | None = None, schema: str | None = None) -> QueryResult:
+        tables = self.catalog.tables(database, schema)
+        column_names = ["database", "schema", "name", "type", "estimated_rows", "columns"]
+        column_types = ["VARCHAR", "VARCHAR", "VARCHAR", "VARCHAR", "BIGINT", "BIGINT"]
+        rows = [
+            (t.database, t.schema, t.name, t.kind, t.estimated_rows, len(t.columns))
+            for t in tables
+        ]
+        return QueryResult(
+            formatted=self._format(column_names, column_types, rows),
+            column_names=column_names,
+            column_types=column_types,
+            rows=rows,
+        )
+
+    def _describe_table(
+        self,
+        name: str,
+        statistics: bool = True,
+        running: RunningQuery | None = None,
+        timeout: float | None = None,
+    ) -> tuple[TableInfo, QueryResult]:
+        table = self.catalog.find(name)
+        column_names = ["column", "type", "nullable", "comment"]
+        column_types = ["VARCHAR", "VARCHAR", "BOOLEAN", "VARCHAR"]
+        rows = [(c["name"], c["type"], c["nullable"], c["comment"]) for c in table.columns]
+
+        if statistics:
+            running = running or RunningQuery()
+            with self._connection() as conn, self._interruptible(conn, running, timeout):
+                column_statistics = self.catalog.statistics(table, conn)
+            column_names += ["min", "max", "approx_unique", "null_percentage"]
+            column_types += ["VARCHAR", "VARCHAR", "BIGINT", "DOUBLE"]
+            empty = {"min": None, "max": None, "approxUnique": None, "nullPercentage": None}
+            rows = [
+                row
+                + tuple(
+                    column_statistics.get(row[0], empty)[key]
+                    for key in ("min", "max", "approxUnique", "nullPercentage")
+                )
+                for row in rows
+            ]
+
+        return table, QueryResult(
+            formatted=self._format(column_names, column_types, rows),
+            column_names=column_names,
+            column_types=column_types,
+            rows=rows,
+        )
 
     def query(self, query: str) -> str:
         """
         Execute a query and return formatted string (backward compatibility).
         """
         try:
-            formatted_output, _ = self._execute(query)
-            return formatted_output
+            return self._execute(query, timeout=self._timeout()).formatted
         except Exception as e:
             raise ValueError(f"❌ Error executing query: {e}")
     
@@ -233,6 +1449,131 @@ class DatabaseClient:
         Returns: (formatted_string, structured_data_dict)
         """
         try:
-            return self._execute(query)
+            result = self._execute(query, timeout=self._timeout())
+            return result.formatted, result.structured()
+        except Exception as e:
+            raise ValueError(f"❌ Error executing query: {e}")
+
+    def query_result(
+        self,
+        query: str,
+        session_id: Hashable = None,
+        result_format: str | None = None,
+        params: list | dict | None = None,
+        running: RunningQuery | None = None,
+        timeout: float | None = None,
+        use_cache: bool = True,
+        profile: bool = False,
+    ) -> QueryResult:
+        """
+        Execute a query and return the first page of results.
+        Structured data is only built if the caller asks the result for it.
+        `result_format` overrides the server's default formatter for this call,
+        `params` are bound to the query's placeholders,
+        `running`, when given, tracks the query's progress and can interrupt it,
+        `timeout` can only lower the server's query timeout, `use_cache`
+        set to False bypasses the result cache, and `profile` captures the
+        query's operator timings into `result.profile`.
+        """
+        try:
+            return self._execute(
+                query,
+                session_id,
+                result_format,
+                params,
+                running,
+                self._timeout(timeout),
+                use_cache=use_cache,
+                profile=profile,
+            )
         except Exception as e:
             raise ValueError(f"❌ Error executing query: {e}")
+
+    def export(
+        self,
+        query: str,
+        export_format: str = "parquet",
+        running: RunningQuery | None = None,
+        timeout: float | None = None,
+    ) -> SpooledResult:
+        """
+        Execute a query and write the whole result to an Arrow IPC or Parquet file.
+        """
+        try:
+            return self._export(query, export_format, running, self._timeout(timeout))
+        except Exception as e:
+            raise ValueError(f"❌ Error exporting query: {e}")
+
+    def explain(
+        self,
+        query: str,
+        analyze: bool = True,
+        running: RunningQuery | None = None,
+        timeout: float | None = None,
+    ) -> Profile:
+        """
+        Plan of a query with DuckDB's estimates, or with `analyze` the operator
+        timings and cardinalities of actually running it (rows are not returned).
+        """
+        try:
+            return self._explain(query, analyze, running, self._timeout(timeout))
+        except Exception as e:
+            raise ValueError(f"❌ Error explaining query: {e}")
+
+    def advise(
+        self,
+        min_queries: int | None = None,
+        replay: bool = True,
+        apply: bool = False,
+        running: RunningQuery | None = None,
+        timeout: float | None = None,
+    ) -> list[Recommendation]:
+        """
+        Propose indexes and sort orders for the columns queries filter on most,
+        each with the latency of its recorded queries replayed before and after
+        on a copy of the table. With `apply`, the proposals that paid off in
+        their replay are run on the database.
+        """
+        try:
+            return self._advise(min_queries, replay, apply, running, self._timeout(timeout))
+        except Exception as e:
+            raise ValueError(f"❌ Error advising indexes: {e}")
+
+    def list_tables(self, database: str | None = None, schema: str | None = None) -> QueryResult:
+        """
+        List the tables and views of the schema catalog, without running a query.
+        """
+        try:
+            return self._list_tables(database, schema)
+        except Exception as e:
+            raise ValueError(f"❌ Error listing tables: {e}")
+
+    def describe_table(
+        self,
+        name: str,
+        statistics: bool = True,
+        running: RunningQuery | None = None,
+        timeout: float | None = None,
+    ) -> tuple[TableInfo, QueryResult]:
+        """
+        Describe the columns of a table from the schema catalog, with approximate
+        column statistics computed on a sample the first time they are asked for.
+        """
+        try:
+            return self._describe_table(name, statistics, running, self._timeout(timeout))
+        except Exception as e:
+            raise ValueError(f"❌ Error describing table: {e}")
+
+    def fetch_page(
+        self,
+        cursor: str,
+        running: RunningQuery | None = None,
+        timeout: float | None = None,
+    ) -> QueryResult:
+        """
+        Fetch the next page of a truncated result.
+        """
+        try:
+            return self._fetch_next(cursor, running, self._timeout(timeout))
+        except Exception as e:
+            raise ValueError(f"❌ Error fetching results: {e}")
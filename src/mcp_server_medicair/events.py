@@ -0,0 +1,166 @@
+import contextvars
+import itertools
+import sqlite3
+import threading
+import logging
+from collections import deque
+
+import anyio.to_thread
+from mcp.server.streamable_http import EventCallback, EventId, EventMessage, EventStore, StreamId
+from mcp.types import JSONRPCMessage
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+logger = logging.getLogger("mcp_server_medicair")
+
+# Session an event belongs to. The session manager passes one event store to
+# every session, and stream ids are JSON-RPC request ids, which repeat across
+# sessions. Events are stored both by request handlers and by the session's
+# message router, a task spawned while handling the session's first request,
+# which inherits that request's context: so every request gets a holder of its
+# session id, filled from the response headers when the request creates it.
+_session: contextvars.ContextVar[list[str | None]] = contextvars.ContextVar("medicair_event_session")
+
+
+def _scope() -> str:
+    return _session.get([None])[0] or ""
+
+
+async def handle_scoped(app: ASGIApp, scope: Scope, receive: Receive, send: Send):
+    """Run the session manager's ASGI `app` with the request's session id known to the event store"""
+    holder = [dict(scope["headers"]).get(b"mcp-session-id", b"").decode() or None]
+    _session.set(holder)
+
+    async def send_with_session(message):
+        if holder[0] is None and message["type"] == "http.response.start":
+            holder[0] = dict(message.get("headers", [])).get(b"mcp-session-id", b"").decode() or None
+        await send(message)
+
+    await app(scope, receive, send_with_session)
+
+
+class MemoryEventStore(EventStore):
+    """
+    The last `max_events` messages sent on the streams of stateful sessions,
+    so that a client whose SSE stream dropped can resume it with
+    `Last-Event-ID` instead of losing the results in flight.
+    """
+
+    def __init__(self, max_events: int):
+        self.max_events = max_events
+        self._ids = itertools.count(1)
+        # event id -> (scope, stream id, message), oldest first
+        self._events: dict[int, tuple[str, StreamId, JSONRPCMessage | None]] = {}
+        # (scope, stream id) -> its event ids, oldest first
+        self._streams: dict[tuple[str, StreamId], deque[int]] = {}
+
+    async def store_event(self, stream_id: StreamId, message: JSONRPCMessage | None) -> EventId:
+        event_id = next(self._ids)
+        key = (_scope(), stream_id)
+        self._events[event_id] = (key[0], stream_id, message)
+        self._streams.setdefault(key, deque()).append(event_id)
+        while len(self._events) > self.max_events:
+            oldest = next(iter(self._events))
+            scope, oldest_stream, _ = self._events.pop(oldest)
+            stream = self._streams[(scope, oldest_stream)]
+            stream.popleft()
+            if not stream:
+                del self._streams[(scope, oldest_stream)]
+        return str(event_id)
+
+    async def replay_events_after(self, last_event_id: EventId, send_callback: EventCallback) -> StreamId | None:
+        try:
+            last = int(last_event_id)
+        except ValueError:
+            return None
+        if last not in self._events:
+            logger.info(f"Cannot resume after event {last_event_id}: unknown or evicted")
+            return None
+        scope, stream_id, _ = self._events[last]
+        for event_id in list(self._streams.get((scope, stream_id), ())):
+            if event_id <= last:
+                continue
+            message = self._events[event_id][2]
+            # Priming events carry no message
+            if message is not None:
+                await send_callback(EventMessage(message, str(event_id)))
+        return stream_id
+
+    def stats(self) -> dict:
+        return {"events": len(self._events), "max_events": self.max_events, "streams": len(self._streams)}
+
+
+class SQLiteEventStore(EventStore):
+    """
+    Like MemoryEventStore, but the messages are kept in a SQLite file, so long
+    result streams don't hold memory while they wait to be resumed.
+    """
+
+    def __init__(self, path: str, max_events: int):
+        self.path = path
+        self.max_events = max_events
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=OFF")
+            # Events of a previous run can't be resumed, their sessions are gone
+            self._conn.execute("DROP TABLE IF EXISTS events")
+            self._conn.execute(
+                "CREATE TABLE events (id INTEGER PRIMARY KEY AUTOINCREMENT, scope TEXT, stream_id TEXT, message TEXT)"
+            )
+        logger.info(f"📼 Keeping resumable stream events in {path}")
+
+    def _store(self, scope: str, stream_id: StreamId, message: str | None) -> int:
+        with self._lock, self._conn:
+            event_id = self._conn.execute(
+                "INSERT INTO events (scope, stream_id, message) VALUES (?, ?, ?)", (scope, stream_id, message)
+            ).lastrowid
+            if event_id % 100 == 0:
+                # Trimming in batches keeps inserts cheap
+                self._conn.execute("DELETE FROM events WHERE id <= ?", (event_id - self.max_events,))
+        return event_id
+
+    def _after(self, last: int) -> tuple[StreamId | None, list[tuple[int, str | None]]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT scope, stream_id FROM events WHERE id = ? AND id > ?",
+                (last, self._max_id() - self.max_events),
+            ).fetchone()
+            if row is None:
+                return None, []
+            events = self._conn.execute(
+                "SELECT id, message FROM events WHERE scope = ? AND stream_id = ? AND id > ? ORDER BY id",
+                (row[0], row[1], last),
+            ).fetchall()
+        return row[1], events
+
+    def _max_id(self) -> int:
+        return self._conn.execute("SELECT coalesce(max(id), 0) FROM events").fetchone()[0]
+
+    async def store_event(self, stream_id: StreamId, message: JSONRPCMessage | None) -> EventId:
+        serialized = None if message is None else message.model_dump_json(by_alias=True, exclude_none=True)
+        event_id = await anyio.to_thread.run_sync(self._store, _scope(), stream_id, serialized)
+        return str(event_id)
+
+    async def replay_events_after(self, last_event_id: EventId, send_callback: EventCallback) -> StreamId | None:
+        try:
+            last = int(last_event_id)
+        except ValueError:
+            return None
+        stream_id, events = await anyio.to_thread.run_sync(self._after, last)
+        if stream_id is None:
+            logger.info(f"Cannot resume after event {last_event_id}: unknown or evicted")
+            return None
+        for event_id, message in events:
+            if message is not None:
+                await send_callback(EventMessage(JSONRPCMessage.model_validate_json(message), str(event_id)))
+        return stream_id
+
+    def stats(self) -> dict:
+        with self._lock:
+            events = self._conn.execute("SELECT count(*) FROM events").fetchone()[0]
+        return {"events": min(events, self.max_events), "max_events": self.max_events}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
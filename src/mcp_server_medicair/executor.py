@@ -0,0 +1,74 @@
+import logging
+from typing import Any, Callable, TypeVar
+
+import anyio
+import anyio.to_thread
+
+logger = logging.getLogger("mcp_server_medicair")
+
+T = TypeVar("T")
+
+
+class QueryExecutor:
+    """
+    Runs blocking database work on a bounded pool of worker threads so the
+    event loop stays free to serve other sessions and health probes.
+    At most `max_workers` calls run at once and at most `max_queue` more wait
+    for a free worker; anything beyond that is rejected immediately.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        if max_workers < 1:
+            raise ValueError("The query worker pool needs at least one worker")
+        if max_queue < 0:
+            raise ValueError("The query queue size cannot be negative")
+
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._limiter = anyio.CapacityLimiter(max_workers)
+        self._pending = 0
+
+        logger.info(
+            f"Query executor initialized with {max_workers} workers and a queue of {max_queue}"
+        )
+
+    @property
+    def in_flight(self) -> int:
+        """Number of calls currently running or waiting for a worker"""
+        return self._pending
+
+    async def run(
+        self,
+        func: Callable[..., T],
+        *args: Any,
+        on_cancel: Callable[[], None] | None = None,
+    ) -> T:
+        """
+        Run `func(*args)` on a worker thread and return its result.
+        Raises ValueError when both the workers and the queue are full.
+        A worker thread cannot be killed: without `on_cancel` a cancelled caller
+        waits for `func` to return, with it the caller returns right away and
+        `on_cancel` is called to make `func` stop early.
+        """
+        if self._pending >= self.max_workers + self.max_queue:
+            logger.warning(
+                f"⚠️ Query queue full ({self._pending} in flight), rejecting call"
+            )
+            raise ValueError(
+                "Server busy: too many queries in flight, please retry shortly"
+            )
+
+        self._pending += 1
+        try:
+            return await anyio.to_thread.run_sync(
+                func,
+                *args,
+                limiter=self._limiter,
+                abandon_on_cancel=on_cancel is not None,
+            )
+        except anyio.get_cancelled_exc_class():
+            if on_cancel is not None:
+                on_cancel()
+            raise
+        finally:
+            self._pending -= 1
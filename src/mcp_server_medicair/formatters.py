@@ -0,0 +1,211 @@
+import csv
+import io
+import re
+import logging
+from typing import Callable
+
+try:
+    # tabulate measures wide (e.g. CJK) characters with wcwidth when it is installed
+    import wcwidth
+except ImportError:  # pragma: no cover - optional dependency
+    wcwidth = None
+
+logger = logging.getLogger("mcp_server_medicair")
+
+# Characters the fast renderer does not lay out itself (control characters,
+# ANSI escapes and line separators other than "\n"); tables containing them
+# are rendered by tabulate to keep the output identical
+_SPECIAL_CHARS = re.compile("[\x00-\x09\x0b-\x1f\x7f-\x9f\u2028\u2029]")
+
+TRUNCATION_MARK = "…"
+
+
+def _cell_strings(column: tuple, max_width: int | None) -> list[str]:
+    """Convert one column of values to the strings tabulate would print"""
+    if any(isinstance(v, bytes) for v in column) and all(
+        v is None or isinstance(v, (bytes, bool)) for v in column
+    ):
+        # tabulate decodes ASCII bytes (and falls back to the bytes repr) only
+        # when bytes are the most generic type in the column
+        def to_str(v):
+            try:
+                return str(v, "ascii")
+            except (TypeError, UnicodeDecodeError):
+                return str(v)
+    else:
+        to_str = str
+    strings = ["" if v is None else to_str(v) for v in column]
+    if max_width is not None:
+        strings = [_truncate(s, max_width) for s in strings]
+    return strings
+
+
+def _truncate(s: str, max_width: int) -> str:
+    if len(s) <= max_width:
+        return s
+    return s[: max(max_width - 1, 0)] + TRUNCATION_MARK
+
+
+def _line_width() -> Callable[[str], int]:
+    return wcwidth.wcswidth if wcwidth is not None else len
+
+
+def _center(s: str, width: int, s_width: int) -> str:
+    left = (width - s_width) // 2
+    return " " * left + s + " " * (width - s_width - left)
+
+
+def _tabulate(rows: list[tuple], headers: list[str]) -> str:
+    # Imported on first use, only tables the fast renderer can't lay out need it
+    from tabulate import tabulate
+
+    return tabulate(rows, headers=headers, tablefmt="pretty")
+
+
+def render_pretty(
+    column_names: list[str],
+    column_types: list[str],
+    rows: list[tuple],
+    max_col_width: int | None = None,
+) -> str:
+    """
+    Render rows as a centered ASCII table with the column type under each name.
+    Produces the same bytes as `tabulate(..., tablefmt="pretty")` with those
+    two-line headers, but works a column at a time instead of re-scanning every
+    cell to detect types and widths.
+    """
+    headers = [name + "\n" + col_type for name, col_type in zip(column_names, column_types)]
+    if not headers:
+        return _tabulate(rows, headers)
+
+    columns = list(zip(*rows)) if rows else [() for _ in headers]
+    # tabulate strips surrounding whitespace from data cells (not from headers)
+    str_columns = [[s.strip() for s in _cell_strings(c, max_col_width)] for c in columns]
+
+    plain = "\n".join(headers) + "\n" + "\n".join("\n".join(c) for c in str_columns)
+    if _SPECIAL_CHARS.search(plain):
+        logger.debug("Falling back to tabulate for cells with control characters")
+        if max_col_width is not None:
+            rows = list(zip(*str_columns))
+        return _tabulate(rows, headers)
+
+    width_fn = len if plain.isascii() else _line_width()
+
+    header_lines = [h.split("\n") for h in headers]
+    widths = []
+    # Per column: list of cells, each cell a list of (line, line_width)
+    cell_columns = []
+    for h_lines, strings in zip(header_lines, str_columns):
+        cells = [[(line, width_fn(line)) for line in s.splitlines()] for s in strings]
+        data_width = max((w for cell in cells for _, w in cell), default=0)
+        widths.append(max(data_width, *(width_fn(line) for line in h_lines)))
+        cell_columns.append(cells)
+
+    border = "+" + "+".join("-" * (w + 2) for w in widths) + "+"
+
+    def row_lines(cells: list[list[tuple[str, int]]]) -> list[str]:
+        # Cells are top aligned, shorter cells are padded with blank lines.
+        # A row whose cells are all empty produces no line, as in tabulate.
+        height = max(len(cell) for cell in cells)
+        out = []
+        for i in range(height):
+            parts = []
+            for cell, width in zip(cells, widths):
+                if i < len(cell):
+                    line, line_width = cell[i]
+                    parts.append(_center(line, width, line_width))
+                else:
+                    parts.append(" " * width)
+            out.append("| " + " | ".join(parts) + " |")
+        return out
+
+    lines = [border]
+    lines.extend(row_lines([[(l, width_fn(l)) for l in h] for h in header_lines]))
+    lines.append(border)
+    for cells in zip(*cell_columns):
+        lines.extend(row_lines(cells))
+    lines.append(border)
+    return "\n".join(lines)
+
+
+def _flat(s: str, replacement: str = " ") -> str:
+    """Collapse line breaks (and tabs) so a value stays on one line"""
+    if "\n" in s or "\r" in s or "\t" in s:
+        return s.replace("\r\n", replacement).replace("\n", replacement).replace("\r", replacement).replace("\t", " ")
+    return s
+
+
+def render_csv(
+    column_names: list[str],
+    column_types: list[str],
+    rows: list[tuple],
+    max_col_width: int | None = None,
+) -> str:
+    """Render rows as compact CSV with a header line of column names"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(column_names)
+    if rows:
+        columns = [_cell_strings(c, max_col_width) for c in zip(*rows)]
+        writer.writerows(zip(*columns))
+    return buffer.getvalue().rstrip("\n")
+
+
+def render_tsv(
+    column_names: list[str],
+    column_types: list[str],
+    rows: list[tuple],
+    max_col_width: int | None = None,
+) -> str:
+    """Render rows as tab separated values with a header line of column names"""
+    lines = ["\t".join(_flat(name) for name in column_names)]
+    if rows:
+        columns = [[_flat(s) for s in _cell_strings(c, max_col_width)] for c in zip(*rows)]
+        lines.extend("\t".join(cells) for cells in zip(*columns))
+    return "\n".join(lines)
+
+
+def render_markdown(
+    column_names: list[str],
+    column_types: list[str],
+    rows: list[tuple],
+    max_col_width: int | None = None,
+) -> str:
+    """Render rows as a GitHub flavoured Markdown table"""
+
+    def escape(s: str) -> str:
+        return _flat(s, "<br>").replace("|", "\\|")
+
+    lines = [
+        "| " + " | ".join(escape(name) for name in column_names) + " |",
+        "|" + "|".join("---" for _ in column_names) + "|",
+    ]
+    if rows:
+        columns = [[escape(s) for s in _cell_strings(c, max_col_width)] for c in zip(*rows)]
+        lines.extend("| " + " | ".join(cells) + " |" for cells in zip(*columns))
+    return "\n".join(lines)
+
+
+FORMATTERS: dict[str, Callable[..., str]] = {
+    "pretty": render_pretty,
+    "csv": render_csv,
+    "tsv": render_tsv,
+    "markdown": render_markdown,
+}
+
+
+def render(
+    result_format: str,
+    column_names: list[str],
+    column_types: list[str],
+    rows: list[tuple],
+    max_col_width: int | None = None,
+) -> str:
+    """Render a page of results with the named formatter"""
+    try:
+        formatter = FORMATTERS[result_format]
+    except KeyError:
+        raise ValueError(
+            f"Unknown result format `{result_format}`, expected one of: {', '.join(FORMATTERS)}"
+        )
+    return formatter(column_names, column_types, rows, max_col_width)
@@ -0,0 +1,76 @@
+import bisect
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Sorted (label, value) pairs, so a metric's series can be dictionary keys
+Labels = tuple[tuple[str, str], ...]
+
+
+@dataclass
+class Histogram:
+    """Observations counted per bucket, the last bucket being +Inf"""
+
+    buckets: tuple[float, ...] = LATENCY_BUCKETS
+    counts: list[int] = field(default_factory=list)
+    sum: float = 0.0
+    count: int = 0
+
+    def __post_init__(self):
+        if not self.counts:
+            self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list[tuple[float, int]]:
+        """(upper bound, observations up to it) per bucket, as Prometheus reports them"""
+        total = 0
+        out = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            out.append((bound, total))
+        return out
+
+
+class Metrics:
+    """
+    Thread-safe named counters (e.g. timed out or cancelled queries) and
+    latency histograms, optionally split by labels such as the query phase
+    """
+
+    def __init__(self):
+        self._counters: defaultdict[tuple[str, Labels], int] = defaultdict(int)
+        self._histograms: dict[tuple[str, Labels], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: int = 1, **labels: str):
+        with self._lock:
+            self._counters[name, tuple(sorted(labels.items()))] += value
+
+    def observe(self, name: str, value: float, **labels: str):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def get(self, name: str, **labels: str) -> int:
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def snapshot(self) -> tuple[dict[tuple[str, Labels], int], dict[tuple[str, Labels], Histogram]]:
+        """Copies of every counter and histogram series"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {
+                key: Histogram(h.buckets, list(h.counts), h.sum, h.count)
+                for key, h in self._histograms.items()
+            }
+        return counters, histograms
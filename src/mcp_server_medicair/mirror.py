@@ -0,0 +1,375 @@
+import atexit
+import glob
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import logging
+from dataclasses import dataclass
+from typing import Callable, ContextManager, Hashable
+
+import duckdb
+
+from .cache import quote_identifier
+
+logger = logging.getLogger("mcp_server_medicair")
+
+# Name the mirror file being built is attached under on the remote connection
+_BUILD_ALIAS = "medicair_mirror_build"
+# Description of the current mirror file, to reuse it after a restart
+_STATE_FILE = "mirror.json"
+
+
+@dataclass
+class _MirrorFile:
+    path: str
+    conn: duckdb.DuckDBPyConnection
+    # (schema, table) pairs, lowercased, that queries may read from the mirror
+    tables: set[tuple[str, str]]
+    # Local write generation and remote signature the mirror was copied at
+    version: Hashable
+    signature: Hashable
+    built_at: float
+
+
+def _walk(node):
+    yield node
+    if isinstance(node, dict):
+        for value in node.values():
+            yield from _walk(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk(value)
+
+
+class DatabaseMirror:
+    """
+    Local DuckDB copy of a remote (MotherDuck or S3) database, read by SELECT
+    queries instead of going over the network.
+    The copy is built in the background, and rebuilt after writes through this
+    server, when the remote signature changes (S3: size and modification time of
+    the database file) or, if the remote has no signature (MotherDuck), every
+    `refresh_interval` seconds. A new copy is written to a new file and swapped
+    in once complete, so readers never see a half-built mirror. Queries that
+    touch tables outside the mirror, and all queries while it is stale, run on
+    the remote database.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        connection: Callable[[], ContextManager[duckdb.DuckDBPyConnection]],
+        version: Callable[[], Hashable],
+        directory: str | None = None,
+        tables: list[str] | None = None,
+        refresh_interval: float | None = None,
+        signature: Callable[[duckdb.DuckDBPyConnection], Hashable] | None = None,
+        check_interval: float = 5.0,
+    ):
+        self.source = source
+        self._connection = connection
+        self._version = version
+        self._signature = signature
+        self.refresh_interval = refresh_interval
+        self.check_interval = check_interval
+        self._wanted_tables = [self._split_name(t) for t in tables] if tables else None
+        self._owns_directory = directory is None
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix="medicair-mirror-")
+            atexit.register(self.close)
+        else:
+            os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+        self._current: _MirrorFile | None = None
+        # When the remote was last compared with the mirror, or a build failed
+        self._checked_at: float | None = None
+        self._failed_version: Hashable = None
+        self.error: str | None = None
+        self._build_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._load_state()
+        logger.info(f"🪞 Mirror directory: {directory}")
+
+    @staticmethod
+    def _split_name(name: str) -> tuple[str, str]:
+        parts = [p.strip().strip('"') for p in name.split(".")]
+        if len(parts) == 1:
+            return "main", parts[0].lower()
+        if len(parts) == 2:
+            return parts[0].lower(), parts[1].lower()
+        raise ValueError(f"Mirrored tables must be given as `table` or `schema.table`, got `{name}`")
+
+    # Persisted state
+
+    def _load_state(self):
+        """Reuse the mirror a previous run left in the directory, if it copies the same source"""
+        try:
+            with open(os.path.join(self.directory, _STATE_FILE)) as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            state = None
+        keep = None
+        if state and state.get("source") == self.source and os.path.exists(state.get("path", "")):
+            try:
+                conn = duckdb.connect(state["path"], read_only=True)
+                age = max(time.time() - state["built_at"], 0.0)
+                self._current = _MirrorFile(
+                    path=state["path"],
+                    conn=conn,
+                    tables={tuple(t) for t in state["tables"]},
+                    version=self._version(),
+                    signature=tuple(state["signature"]) if state["signature"] else None,
+                    built_at=time.monotonic() - age,
+                )
+                keep = state["path"]
+                logger.info(f"🪞 Reusing the local mirror built {age:.0f} s ago: {keep}")
+            except Exception as e:
+                logger.warning(f"⚠️ Ignoring the previous mirror: {e}")
+        # Leftovers of interrupted builds or of other sources
+        for path in glob.glob(os.path.join(self.directory, "mirror-*.duckdb*")):
+            if keep is None or not path.startswith(keep):
+                self._remove(path)
+
+    def _save_state(self, mirror: _MirrorFile):
+        state = {
+            "source": self.source,
+            "path": mirror.path,
+            "tables": sorted(mirror.tables),
+            "signature": list(mirror.signature) if mirror.signature else None,
+            "built_at": time.time(),
+        }
+        path = os.path.join(self.directory, _STATE_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(path + ".tmp", path)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            # Still open on platforms that lock open files, removed on the next start
+            pass
+
+    # Building
+
+    def _remote_signature(self, conn: duckdb.DuckDBPyConnection) -> Hashable:
+        if self._signature is None:
+            return None
+        signature = self._signature(conn)
+        return tuple(str(v) for v in signature) if signature is not None else None
+
+    def _copy(self, conn: duckdb.DuckDBPyConnection, path: str) -> set[tuple[str, str]]:
+        """Copy the remote tables (and views, for a full mirror) into a new database file"""
+        remote = conn.execute("SELECT current_database()").fetchone()[0]
+        tables = conn.execute(
+            """
+            SELECT schema_name, table_name FROM duckdb_tables()
+            WHERE database_name = ? AND NOT internal
+            ORDER BY schema_name, table_name
+            """,
+            [remote],
+        ).fetchall()
+        if self._wanted_tables is not None:
+            available = {(s.lower(), t.lower()): (s, t) for s, t in tables}
+            missing = [".".join(t) for t in self._wanted_tables if t not in available]
+            if missing:
+                logger.warning(f"⚠️ Tables to mirror not found in the remote database: {', '.join(missing)}")
+            tables = [available[t] for t in self._wanted_tables if t in available]
+
+        path_literal = "'" + path.replace("'", "''") + "'"
+        build = quote_identifier(_BUILD_ALIAS)
+        conn.execute(f"ATTACH {path_literal} AS {build}")
+        try:
+            copied = set()
+            for schema, table in tables:
+                started = time.monotonic()
+                source = f"{quote_identifier(remote)}.{quote_identifier(schema)}.{quote_identifier(table)}"
+                conn.execute(f"CREATE SCHEMA IF NOT EXISTS {build}.{quote_identifier(schema)}")
+                conn.execute(
+                    f"CREATE TABLE {build}.{quote_identifier(schema)}.{quote_identifier(table)} AS FROM {source}"
+                )
+                copied.add((schema.lower(), table.lower()))
+                logger.debug(f"🪞 Mirrored {schema}.{table} in {time.monotonic() - started:.2f} s")
+
+            if self._wanted_tables is None:
+                views = conn.execute(
+                    """
+                    SELECT schema_name, view_name, sql FROM duckdb_views()
+                    WHERE database_name = ? AND NOT internal
+                    """,
+                    [remote],
+                ).fetchall()
+                for schema, view, sql in views:
+                    # View definitions name tables without the database, so they
+                    # resolve to the mirrored tables
+                    try:
+                        conn.execute(f"USE {build}.{quote_identifier(schema)}")
+                        conn.execute(sql)
+                        copied.add((schema.lower(), view.lower()))
+                    except duckdb.Error as e:
+                        logger.warning(f"⚠️ View {schema}.{view} not mirrored: {e}")
+        finally:
+            conn.execute(f"USE {quote_identifier(remote)}")
+            conn.execute(f"DETACH {build}")
+        return copied
+
+    def _build(self, version: Hashable):
+        path = os.path.join(self.directory, f"mirror-{time.time_ns()}.duckdb")
+        started = time.monotonic()
+        try:
+            with self._connection() as conn:
+                signature = self._remote_signature(conn)
+                tables = self._copy(conn, path)
+            new_conn = duckdb.connect(path, read_only=True)
+        except Exception:
+            self._remove(path)
+            self._remove(path + ".wal")
+            raise
+
+        mirror = _MirrorFile(
+            path=path,
+            conn=new_conn,
+            tables=tables,
+            version=version,
+            signature=signature,
+            built_at=time.monotonic(),
+        )
+        with self._lock:
+            previous, self._current = self._current, mirror
+            self.error = None
+        self._save_state(mirror)
+        if previous is not None:
+            # Not closed: that would also close the cursors of paginated results still reading it
+            self._remove(previous.path)
+        logger.info(
+            f"🪞 Local mirror built: {len(tables)} tables in {time.monotonic() - started:.2f} s"
+        )
+
+    def refresh(self, force: bool = False):
+        """Rebuild the mirror if it is missing, behind local writes or behind the remote"""
+        with self._build_lock:
+            version = self._version()
+            now = time.monotonic()
+            with self._lock:
+                current = self._current
+            if not force:
+                if current is None or current.version != version:
+                    # Retried once the database changes or the interval elapses
+                    if self._failed_version == version and (
+                        not self.refresh_interval or now - self._checked_at < self.refresh_interval
+                    ):
+                        return
+                else:
+                    # A mirror reused from a previous run is checked once on startup
+                    due = self._checked_at is None or (
+                        self.refresh_interval and now - self._checked_at >= self.refresh_interval
+                    )
+                    if not due:
+                        return
+                    self._checked_at = now
+                    if self._signature is not None:
+                        with self._connection() as conn:
+                            if self._remote_signature(conn) == current.signature:
+                                return
+                        logger.info("🪞 Remote database changed, refreshing the local mirror")
+            try:
+                self._build(version)
+                self._failed_version = None
+            except Exception as e:
+                self._failed_version = version
+                self.error = str(e)
+                logger.warning(f"⚠️ Could not build the local mirror: {e}")
+            finally:
+                self._checked_at = time.monotonic()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"⚠️ Mirror refresh failed: {e}")
+            self._stop.wait(self.check_interval)
+
+    def start(self):
+        """Build the mirror and keep it fresh on a background thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="medicair-mirror", daemon=True)
+            self._thread.start()
+
+    # Answering queries
+
+    def cursor(self, query: str) -> duckdb.DuckDBPyConnection | None:
+        """
+        A cursor on the mirror to run `query` on, or None if it must run remotely:
+        the mirror is missing or stale, or the query is not a plain SELECT on mirrored tables.
+        """
+        with self._lock:
+            mirror = self._current
+        if mirror is None or mirror.version != self._version():
+            return None
+        cursor = mirror.conn.cursor()
+        try:
+            if self._reads_only(cursor, query, mirror.tables):
+                return cursor
+        except duckdb.Error as e:
+            logger.debug(f"Could not check the query against the mirror: {e}")
+        cursor.close()
+        return None
+
+    @staticmethod
+    def _reads_only(cursor: duckdb.DuckDBPyConnection, query: str, tables: set[tuple[str, str]]) -> bool:
+        serialized = json.loads(cursor.execute("SELECT json_serialize_sql(?)", [query]).fetchone()[0])
+        # Parse errors and anything but SELECT statements (which are all json_serialize_sql handles)
+        if serialized.get("error") or not serialized["statements"]:
+            return False
+        nodes = [n for n in _walk(serialized["statements"]) if isinstance(n, dict)]
+        cte_names = {
+            entry["key"].lower()
+            for n in nodes
+            if isinstance(n.get("cte_map"), dict)
+            for entry in n["cte_map"].get("map", [])
+        }
+        for n in nodes:
+            if n.get("type") == "TABLE_FUNCTION":
+                # read_parquet('s3://...') and friends need the remote's secrets and extensions
+                return False
+            if n.get("type") != "BASE_TABLE":
+                continue
+            if n["catalog_name"]:
+                return False
+            table = n["table_name"].lower()
+            schema = n["schema_name"].lower()
+            if not schema and table in cte_names:
+                continue
+            if (schema or "main", table) not in tables:
+                return False
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            mirror = self._current
+        return {
+            "ready": mirror is not None,
+            "fresh": mirror is not None and mirror.version == self._version(),
+            "tables": len(mirror.tables) if mirror else 0,
+            "bytes": os.path.getsize(mirror.path) if mirror and os.path.exists(mirror.path) else 0,
+            "age": time.monotonic() - mirror.built_at if mirror else None,
+            "error": self.error,
+        }
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        with self._lock:
+            mirror, self._current = self._current, None
+        if mirror is not None:
+            mirror.conn.close()
+        if self._owns_directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,210 @@
+import sys
+import time
+import logging
+from collections import defaultdict
+from typing import TYPE_CHECKING
+
+import anyio
+import anyio.to_thread
+
+from .executor import QueryExecutor
+from .metrics import Histogram, Metrics
+
+if TYPE_CHECKING:
+    from .database import DatabaseClient
+    from .startup import Startup
+    from .sessions import SessionRegistry
+    from .workers import Families, WorkerMetrics
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger("mcp_server_medicair")
+
+PREFIX = "medicair_"
+
+# Help text of every exported metric, by name without prefix or `_total` suffix
+_HELP = {
+    "tool_calls": "Tool calls handled, by tool",
+    "tool_errors": "Tool calls that failed, by tool",
+    "tool_call_seconds": "Latency of tool calls, queueing included, by tool",
+    "queries": "Queries run, by outcome: ok, error, or cached (served from the result cache)",
+    "query_phase_seconds": "Time per served page spent executing the query, fetching rows and formatting them",
+    "rows_returned": "Rows returned to clients",
+    "bytes_returned": "Bytes of formatted results returned to clients",
+    "queries_timed_out": "Queries interrupted by their timeout",
+    "queries_cancelled": "Queries interrupted because the client cancelled them",
+    "prepared_hits": "Parameterized queries run on an already prepared statement",
+    "prepared_misses": "Parameterized queries that had to be prepared",
+    "prepared_evictions": "Prepared statements deallocated to make room for others",
+    "result_cache_hits": "Lookups answered by the result cache",
+    "result_cache_misses": "Lookups not in the result cache",
+    "result_cache_hit_ratio": "Share of result cache lookups that were hits",
+    "result_cache_bytes": "Approximate bytes held by the result cache",
+    "queries_in_flight": "Calls running on a query worker or waiting for one",
+    "query_workers": "Size of the query worker pool",
+    "pool_cursors": "Pooled DuckDB cursors, by state: in_use or idle",
+    "pool_max_cursors": "Maximum number of pooled DuckDB cursors",
+    "open_result_cursors": "Truncated results kept open for query_next_page",
+    "process_max_rss_bytes": "Peak resident set size of the server process",
+    "process_uptime_seconds": "Seconds since the server started",
+    "startup_ready": "Whether the databases are connected: 1 once ready, 0 while starting or after a failed startup",
+    "startup_phase_seconds": "Duration of each startup phase: imports, database connections and template checks",
+    "sessions": "Sessions with a tool call in the last --session-idle-timeout seconds (stdio and stateful stream)",
+    "event_store_events": "Messages kept for clients to resume dropped SSE streams",
+    "workers": "Worker processes whose metrics are aggregated here (--workers)",
+}
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        f'{name}="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Monitor:
+    """
+    Server-wide metrics in the Prometheus text format, and a health probe of
+    every served database. Tool calls are counted here, queries by each
+    database client's own metrics.
+    """
+
+    def __init__(self):
+        self.metrics = Metrics()
+        self.clients: dict[str, "DatabaseClient"] = {}
+        self.executors: dict[str, QueryExecutor] = {}
+        self.started_at = time.monotonic()
+        # Set by the server, whose databases are connected in the background
+        self.startup: "Startup | None" = None
+        # Set by the server and, with resumable `stream` sessions, the transport
+        self.sessions: "SessionRegistry | None" = None
+        self.event_store = None
+        # Set in the processes of `--workers`, whose metrics are merged
+        self.workers: "WorkerMetrics | None" = None
+
+    def register(self, name: str, client: "DatabaseClient", executor: QueryExecutor):
+        # Executor first, `render` looks it up for every registered client
+        self.executors[name] = executor
+        self.clients[name] = client
+
+    def families(self) -> "Families":
+        """Every metric of this process, by name"""
+        # name -> (type, [(labels, value or Histogram)])
+        families: defaultdict[str, tuple[str, list]] = defaultdict(lambda: ("", []))
+
+        def add(name: str, kind: str, labels: dict, value):
+            family = families[name]
+            if not family[0]:
+                families[name] = family = (kind, family[1])
+            family[1].append((labels, value))
+
+        def add_metrics(metrics: Metrics, extra: dict):
+            counters, histograms = metrics.snapshot()
+            for (name, labels), value in counters.items():
+                add(name, "counter", {**extra, **dict(labels)}, value)
+            for (name, labels), histogram in histograms.items():
+                add(name, "histogram", {**extra, **dict(labels)}, histogram)
+
+        add_metrics(self.metrics, {})
+        # Registered from the startup thread
+        for name, client in list(self.clients.items()):
+            database = {"database": name}
+            add_metrics(client.metrics, database)
+            if client.result_cache is not None:
+                stats = client.result_cache.stats()
+                add("result_cache_hits", "counter", database, stats["hits"])
+                add("result_cache_misses", "counter", database, stats["misses"])
+                add("result_cache_hit_ratio", "gauge", database, stats["hit_ratio"])
+                add("result_cache_bytes", "gauge", database, stats["bytes"])
+            pool = client.pool.stats()
+            add("pool_cursors", "gauge", {**database, "state": "in_use"}, pool["in_use"])
+            add("pool_cursors", "gauge", {**database, "state": "idle"}, pool["idle"])
+            add("pool_max_cursors", "gauge", database, pool["max_size"])
+            add("open_result_cursors", "gauge", database, client.cursors.stats()["open"])
+            executor = self.executors[name]
+            add("queries_in_flight", "gauge", database, executor.in_flight)
+            add("query_workers", "gauge", database, executor.max_workers)
+
+        if resource is not None:
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # Kilobytes on Linux, bytes on macOS
+            add("process_max_rss_bytes", "gauge", {}, max_rss if sys.platform == "darwin" else max_rss * 1024)
+        add("process_uptime_seconds", "gauge", {}, round(time.monotonic() - self.started_at, 3))
+        if self.sessions is not None:
+            add("sessions", "gauge", {}, len(self.sessions))
+        if self.event_store is not None:
+            add("event_store_events", "gauge", {}, self.event_store.stats()["events"])
+        if self.startup is not None:
+            add("startup_ready", "gauge", {}, int(self.startup.ready))
+            for phase in self.startup.as_dict()["phases"]:
+                add("startup_phase_seconds", "gauge", {"phase": phase["name"]}, round(phase["ms"] / 1000, 6))
+        return dict(families)
+
+    def render(self) -> str:
+        """Every metric, of all the processes with `--workers`, in the Prometheus text exposition format"""
+        families = self.families()
+        if self.workers is not None:
+            families = self.workers.merge(families)
+        lines = []
+        for name, (kind, samples) in families.items():
+            metric = PREFIX + name + ("_total" if kind == "counter" else "")
+            lines.append(f"# HELP {metric} {_HELP.get(name, name.replace('_', ' '))}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for labels, value in samples:
+                if isinstance(value, Histogram):
+                    for bound, count in value.cumulative():
+                        bucket_labels = _format_labels({**labels, "le": _format_value(bound)})
+                        lines.append(f"{metric}_bucket{bucket_labels} {count}")
+                    lines.append(f"{metric}_sum{_format_labels(labels)} {_format_value(value.sum)}")
+                    lines.append(f"{metric}_count{_format_labels(labels)} {value.count}")
+                else:
+                    lines.append(f"{metric}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    async def health(self, timeout: float) -> tuple[bool, dict[str, str]]:
+        """
+        Run a trivial query on every served database, each bounded by `timeout`
+        seconds (waiting for a free cursor included). Returns whether all
+        answered, and "ok" or the error of each database.
+        """
+        if self.startup is not None and not self.startup.ready:
+            reason = "starting" if self.startup.error is None else f"startup failed: {self.startup.error}"
+            return False, {"startup": reason}
+        status = {}
+
+        async def probe(name: str, client: "DatabaseClient"):
+            try:
+                with anyio.fail_after(timeout):
+                    # Not on the query executor: a full queue must not fail the probe
+                    await anyio.to_thread.run_sync(client.ping, timeout, abandon_on_cancel=True)
+                status[name] = "ok"
+            except TimeoutError:
+                status[name] = f"no answer within {timeout:g} s"
+            except Exception as e:
+                status[name] = str(e)
+
+        async with anyio.create_task_group() as tg:
+            for name, client in list(self.clients.items()):
+                tg.start_soon(probe, name, client)
+        healthy = all(s == "ok" for s in status.values())
+        if not healthy:
+            logger.warning(f"⚠️ Health check failed: {status}")
+        return healthy, status
+
+    def tool_call(self, tool: str, seconds: float, failed: bool):
+        self.metrics.inc("tool_calls", tool=tool)
+        if failed:
+            self.metrics.inc("tool_errors", tool=tool)
+        self.metrics.observe("tool_call_seconds", seconds, tool=tool)
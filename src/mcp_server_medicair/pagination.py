@@ -0,0 +1,139 @@
+import secrets
+import threading
+import time
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Hashable
+
+import duckdb
+
+logger = logging.getLogger("mcp_server_medicair")
+
+
+@dataclass
+class ResultCursor:
+    """A partially consumed query result held open on the server between pages"""
+
+    token: str
+    session_id: Hashable
+    conn: duckdb.DuckDBPyConnection
+    column_names: list[str]
+    column_types: list[str]
+    release: Callable[[], None]
+    expires_at: float
+    # Rows already fetched from DuckDB but not yet returned to the client
+    buffer: list[tuple] = field(default_factory=list)
+    rows_served: int = 0
+    # Formatter the first page was rendered with, used for the following pages
+    result_format: str | None = None
+
+
+class CursorStore:
+    """
+    Registry of open result cursors, addressed by opaque tokens.
+    Cursors expire after `ttl` seconds without a fetch, each session may hold
+    at most `max_per_session` (its oldest cursor is closed to make room), and
+    at most `max_open` are open server-wide since each one pins a database cursor.
+    """
+
+    def __init__(self, ttl: float, max_per_session: int, max_open: int):
+        self.ttl = ttl
+        self.max_per_session = max_per_session
+        self.max_open = max_open
+        self._cursors: dict[str, ResultCursor] = {}
+        self._lock = threading.Lock()
+
+    def _close_locked(self, token: str):
+        cursor = self._cursors.pop(token, None)
+        if cursor is not None:
+            cursor.release()
+
+    def _sweep_locked(self, now: float):
+        for token in [t for t, c in self._cursors.items() if c.expires_at <= now]:
+            logger.debug(f"Result cursor {token[:8]}… expired")
+            self._close_locked(token)
+
+    def open(
+        self,
+        session_id: Hashable,
+        conn: duckdb.DuckDBPyConnection,
+        column_names: list[str],
+        column_types: list[str],
+        buffer: list[tuple],
+        rows_served: int,
+        release: Callable[[], None],
+        result_format: str | None = None,
+    ) -> str | None:
+        """Register an open result and return its token, or None if no cursor can be opened"""
+        if self.max_per_session < 1:
+            return None
+        with self._lock:
+            now = time.monotonic()
+            self._sweep_locked(now)
+
+            owned = [c for c in self._cursors.values() if c.session_id == session_id]
+            while owned and len(owned) >= self.max_per_session:
+                oldest = min(owned, key=lambda c: c.expires_at)
+                logger.info("Session cursor limit reached, closing its oldest result cursor")
+                self._close_locked(oldest.token)
+                owned.remove(oldest)
+
+            if len(self._cursors) >= self.max_open:
+                logger.warning(
+                    f"⚠️ All {self.max_open} result cursors are open, returning the result without a cursor"
+                )
+                return None
+
+            token = secrets.token_urlsafe(16)
+            self._cursors[token] = ResultCursor(
+                token=token,
+                session_id=session_id,
+                conn=conn,
+                column_names=column_names,
+                column_types=column_types,
+                release=release,
+                expires_at=now + self.ttl,
+                buffer=buffer,
+                rows_served=rows_served,
+                result_format=result_format,
+            )
+            return token
+
+    def take(self, token: str) -> ResultCursor:
+        """Remove a cursor from the store for fetching; hand it back with `put_back` if rows remain"""
+        with self._lock:
+            self._sweep_locked(time.monotonic())
+            cursor = self._cursors.pop(token, None)
+        if cursor is None:
+            raise ValueError("Unknown or expired cursor, please run the query again")
+        return cursor
+
+    def put_back(self, cursor: ResultCursor):
+        with self._lock:
+            cursor.expires_at = time.monotonic() + self.ttl
+            self._cursors[cursor.token] = cursor
+
+    def close_session(self, session_id: Hashable) -> int:
+        """Close the cursors of a session that ended, returning how many were open"""
+        with self._lock:
+            tokens = [t for t, c in self._cursors.items() if c.session_id == session_id]
+            for token in tokens:
+                self._close_locked(token)
+        return len(tokens)
+
+    def by_session(self) -> dict[Hashable, int]:
+        """Open cursors of each session holding any"""
+        with self._lock:
+            counts: dict[Hashable, int] = {}
+            for cursor in self._cursors.values():
+                counts[cursor.session_id] = counts.get(cursor.session_id, 0) + 1
+            return counts
+
+    def sweep(self):
+        """Close expired cursors"""
+        with self._lock:
+            self._sweep_locked(time.monotonic())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"open": len(self._cursors), "max_open": self.max_open}
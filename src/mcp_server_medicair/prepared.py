@@ -0,0 +1,152 @@
+import datetime
+import decimal
+import itertools
+import math
+import re
+import threading
+import weakref
+import logging
+from collections import OrderedDict
+from typing import Any
+
+import duckdb
+
+from .metrics import Metrics
+
+logger = logging.getLogger("mcp_server_medicair")
+
+_PARAMETER_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def render_literal(value: Any) -> str:
+    """
+    Render a query parameter as a DuckDB SQL literal, with the type DuckDB
+    gives the same value bound natively (integers beyond BIGINT stay exact as
+    HUGEINT). `EXECUTE` can't take `?` parameters itself, so the values of a
+    prepared statement are passed as literals.
+    Strings are always single quoted with quotes doubled, which DuckDB does not
+    let escape the literal, so parameter values can't inject SQL.
+    """
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        if math.isnan(value) or math.isinf(value):
+            return f"'{value}'::DOUBLE"
+        # A bare 1.5 would be a DECIMAL literal
+        return f"{value!r}::DOUBLE"
+    if isinstance(value, decimal.Decimal):
+        # DECIMAL has no NaN or infinity, DuckDB binds them as FLOAT
+        return f"'{value}'::FLOAT" if not value.is_finite() else str(value)
+    if isinstance(value, str):
+        if "\x00" in value:
+            raise ValueError("Query parameters cannot contain NUL characters")
+        return "'" + value.replace("'", "''") + "'"
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            return f"TIMESTAMPTZ '{value.isoformat(sep=' ')}'"
+        return f"TIMESTAMP '{value.isoformat(sep=' ')}'"
+    if isinstance(value, datetime.date):
+        return f"DATE '{value.isoformat()}'"
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(render_literal(v) for v in value) + "]"
+    if isinstance(value, dict):
+        if not value:
+            # `{}` is not a valid STRUCT literal
+            return "MAP {}"
+        return "{" + ", ".join(
+            f"{render_literal(str(k))}: {render_literal(v)}" for k, v in value.items()
+        ) + "}"
+    raise ValueError(f"Unsupported query parameter type: {type(value).__name__}")
+
+
+class PreparedStatements:
+    """
+    Statements prepared on each pooled cursor, keyed by SQL text.
+    Prepared statements belong to the DuckDB connection that prepared them, so
+    every cursor keeps its own LRU of at most `max_per_cursor` statements; the
+    least recently used one is deallocated to make room. A parameterized query
+    is parsed and planned once per cursor and then only executed with new values.
+    """
+
+    def __init__(self, max_per_cursor: int, metrics: Metrics | None = None):
+        self.max_per_cursor = max_per_cursor
+        self.metrics = metrics or Metrics()
+        # Entries go away with their cursor when the pool closes it
+        self._statements: weakref.WeakKeyDictionary[
+            duckdb.DuckDBPyConnection, OrderedDict[str, str]
+        ] = weakref.WeakKeyDictionary()
+        self._names = itertools.count()
+        self._lock = threading.Lock()
+
+    def _prepare(self, conn: duckdb.DuckDBPyConnection, query: str) -> str:
+        """Name of the statement prepared for `query` on `conn`, preparing it if needed"""
+        with self._lock:
+            statements = self._statements.setdefault(conn, OrderedDict())
+            name = statements.get(query)
+            if name is not None:
+                statements.move_to_end(query)
+        if name is not None:
+            self.metrics.inc("prepared_hits")
+            return name
+
+        self.metrics.inc("prepared_misses")
+        with self._lock:
+            name = f"medicair_stmt_{next(self._names)}"
+        conn.execute(f"PREPARE {name} AS {query}")
+        # Only the thread holding `conn` touches its statements, the lock guards the mapping
+        with self._lock:
+            statements[query] = name
+            evicted = []
+            while len(statements) > self.max_per_cursor:
+                evicted.append(statements.popitem(last=False)[1])
+        for old in evicted:
+            conn.execute(f"DEALLOCATE {old}")
+            self.metrics.inc("prepared_evictions")
+        return name
+
+    def execute(
+        self, conn: duckdb.DuckDBPyConnection, query: str, params: list | dict
+    ) -> duckdb.DuckDBPyConnection:
+        """
+        Execute `query` on `conn` with the given parameter values: a list for
+        `?` or `$1` placeholders, a dict for `$name` placeholders
+        """
+        if self.max_per_cursor < 1:
+            return conn.execute(query, params)
+        if isinstance(params, dict):
+            for name in params:
+                if not _PARAMETER_NAME.match(name):
+                    raise ValueError(f"Invalid query parameter name: {name!r}")
+            arguments = ", ".join(f"{name} := {render_literal(v)}" for name, v in params.items())
+        else:
+            arguments = ", ".join(render_literal(p) for p in params)
+        name = self._prepare(conn, query.strip().rstrip(";"))
+        try:
+            return conn.execute(f"EXECUTE {name}({arguments})")
+        except duckdb.Error:
+            # Don't keep a statement that failed, it may no longer bind
+            self.forget(conn, query.strip().rstrip(";"))
+            raise
+
+    def forget(self, conn: duckdb.DuckDBPyConnection, query: str):
+        with self._lock:
+            name = self._statements.get(conn, {}).pop(query, None)
+        if name is not None:
+            try:
+                conn.execute(f"DEALLOCATE {name}")
+            except duckdb.Error:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            prepared = sum(len(s) for s in self._statements.values())
+        return {
+            "prepared": prepared,
+            "hits": self.metrics.get("prepared_hits"),
+            "misses": self.metrics.get("prepared_misses"),
+            "evictions": self.metrics.get("prepared_evictions"),
+        }
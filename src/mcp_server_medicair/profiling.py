@@ -0,0 +1,260 @@
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
+import logging
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator
+
+import duckdb
+
+from .configs import DEFAULT_EXPORT_BATCH_ROWS
+
+logger = logging.getLogger("mcp_server_medicair")
+
+# Operators that consume their whole input before producing output: the
+# pipeline feeding them ends there
+_SINKS = {
+    "HASH_GROUP_BY",
+    "PERFECT_HASH_GROUP_BY",
+    "UNGROUPED_AGGREGATE",
+    "ORDER_BY",
+    "TOP_N",
+    "WINDOW",
+    "LIMIT",
+    "CREATE_TABLE_AS",
+    "INSERT",
+}
+# Joins build a hash table (or buffer) from their right child, then stream their left one through it
+_JOINS = {
+    "HASH_JOIN",
+    "NESTED_LOOP_JOIN",
+    "PIECEWISE_MERGE_JOIN",
+    "BLOCKWISE_NL_JOIN",
+    "CROSS_PRODUCT",
+    "IE_JOIN",
+    "ASOF_JOIN",
+    "LEFT_DELIM_JOIN",
+    "RIGHT_DELIM_JOIN",
+}
+
+# Profile ids are unique across every database the server serves
+_ids = itertools.count(1)
+
+
+def _name(node: dict) -> str:
+    # Profiles name operators `operator_type`, plain EXPLAIN plans `name`
+    return (node.get("operator_type") or node.get("name") or "").strip()
+
+
+def _operators(node: dict, depth: int = 0) -> Iterator[dict]:
+    yield {
+        "operator": _name(node),
+        "depth": depth,
+        "timing": node.get("operator_timing"),
+        "cardinality": node.get("operator_cardinality"),
+        "rowsScanned": node.get("operator_rows_scanned"),
+        "estimatedCardinality": (node.get("extra_info") or {}).get("Estimated Cardinality"),
+        "extraInfo": node.get("extra_info") or {},
+    }
+    for child in node.get("children", []):
+        yield from _operators(child, depth + 1)
+
+
+def _pipelines(node: dict, finished: list[list[dict]]) -> list[dict]:
+    """
+    Operators of the pipeline still open at `node`, from its source up to `node`.
+    Pipelines that end below `node` are appended to `finished`.
+    """
+    children = node.get("children", [])
+    name = _name(node)
+    if not children:
+        return [node]
+    if name in _JOINS and len(children) == 2:
+        finished.append(_pipelines(children[1], finished) + [node])
+        return _pipelines(children[0], finished) + [node]
+    if name in _SINKS:
+        finished.append(_pipelines(children[0], finished) + [node])
+        for child in children[1:]:
+            finished.append(_pipelines(child, finished))
+        # The sink is the source of the next pipeline
+        return [node]
+    for child in children[1:]:
+        # e.g. UNION: every other child is a pipeline of its own
+        finished.append(_pipelines(child, finished) + [node])
+    return _pipelines(children[0], finished) + [node]
+
+
+@dataclass
+class Profile:
+    """A query plan with DuckDB's per operator timings (`analyzed`) or only its estimates"""
+
+    profile_id: str
+    query: str
+    analyzed: bool
+    # Unix time the query was profiled at
+    created_at: float
+    # Seconds, None for plans that were not run
+    latency: float | None
+    rows: int | None
+    # Root operators of the plan, as DuckDB's JSON profiler reports them
+    plan: list[dict]
+
+    @property
+    def uri(self) -> str:
+        return f"medicair://profiles/{self.profile_id}"
+
+    def operators(self) -> list[dict]:
+        return [op for root in self.plan for op in _operators(root)]
+
+    def pipelines(self) -> list[dict]:
+        """
+        Approximate pipeline breakdown: chains of operators from a source (scan,
+        or a sink whose result is read again) up to the next sink, in execution order
+        """
+        finished = []
+        for root in self.plan:
+            finished.append(_pipelines(root, finished))
+        pipelines = []
+        for pipeline in finished:
+            timing = None
+            if self.analyzed:
+                # A join's time is counted in its probe pipeline, a sink's in the pipeline it ends
+                counted = [
+                    op
+                    for i, op in enumerate(pipeline)
+                    if not (i == 0 and len(pipeline) > 1 and op.get("children"))
+                    and not (i == len(pipeline) - 1 and i > 0 and _name(op) in _JOINS)
+                ]
+                timing = sum(op.get("operator_timing") or 0.0 for op in counted)
+            pipelines.append({"operators": [_name(op) for op in pipeline], "timing": timing})
+        return pipelines
+
+    def summary(self) -> dict:
+        """Everything but the plan itself, for listings"""
+        return {
+            "id": self.profile_id,
+            "uri": self.uri,
+            "query": self.query,
+            "analyzed": self.analyzed,
+            "createdAt": self.created_at,
+            "latency": self.latency,
+            "rows": self.rows,
+        }
+
+    def as_dict(self) -> dict:
+        return {
+            **self.summary(),
+            "operators": self.operators(),
+            "pipelines": self.pipelines(),
+            "plan": self.plan,
+        }
+
+
+class ProfileLog:
+    """The last `size` profiles, oldest evicted first"""
+
+    def __init__(self, size: int):
+        self._profiles: deque[Profile] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(
+        self,
+        query: str,
+        plan: list[dict],
+        analyzed: bool,
+        latency: float | None = None,
+        rows: int | None = None,
+    ) -> Profile:
+        profile = Profile(
+            profile_id=str(next(_ids)),
+            query=query,
+            analyzed=analyzed,
+            created_at=time.time(),
+            latency=latency,
+            rows=rows,
+            plan=plan,
+        )
+        with self._lock:
+            self._profiles.append(profile)
+        return profile
+
+    def get(self, profile_id: str) -> Profile | None:
+        with self._lock:
+            return next((p for p in self._profiles if p.profile_id == profile_id), None)
+
+    def list(self) -> list[Profile]:
+        """Profiles, most recent first"""
+        with self._lock:
+            return list(reversed(self._profiles))
+
+
+def explain(conn: duckdb.DuckDBPyConnection, query: str, analyze: bool) -> tuple[list[dict], float | None, int | None]:
+    """
+    Plan of `query`: with `analyze`, run it (its rows are discarded inside DuckDB)
+    and return the per operator timings. Returns (plan, latency, rows).
+    """
+    if not analyze:
+        row = conn.execute(f"EXPLAIN (FORMAT JSON) {query}").fetchone()
+        return json.loads(row[1]), None, None
+    started = time.perf_counter()
+    # Read to the end: an EXPLAIN ANALYZE result left open keeps DuckDB from
+    # writing the next profile captured on the cursor
+    row = conn.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {query}").fetchall()[0]
+    latency = time.perf_counter() - started
+    root = json.loads(row[1])
+    # Skip the EXPLAIN_ANALYZE operator, whose root carries no totals
+    plan = [
+        grandchild
+        for child in root.get("children", [])
+        for grandchild in (child.get("children", []) if _name(child) == "EXPLAIN_ANALYZE" else [child])
+    ]
+    if not plan:
+        # DuckDB answers `{"result": "error"}` instead of the plan in some states
+        logger.warning(f"⚠️ EXPLAIN ANALYZE returned no plan ({root.get('result')}), profiling the query instead")
+        return _run_profiled(conn, query)
+    return plan, latency, plan[0].get("operator_cardinality")
+
+
+def _run_profiled(conn: duckdb.DuckDBPyConnection, query: str) -> tuple[list[dict], float | None, int]:
+    """Run `query` under DuckDB's JSON profiler, discarding its rows. Returns (plan, latency, rows)."""
+    rows = 0
+    with capture(conn) as profile:
+        result = conn.execute(query)
+        while batch := result.fetchmany(DEFAULT_EXPORT_BATCH_ROWS):
+            rows += len(batch)
+    return profile["plan"], profile["latency"], rows
+
+
+@contextmanager
+def capture(conn: duckdb.DuckDBPyConnection) -> Iterator[dict]:
+    """
+    Profile the next query run on `conn` with DuckDB's JSON profiler. The
+    yielded dict gets the profile's `plan` and `latency` once the block exits; DuckDB only writes the profile after the query's result was read to the end.
+    Raises ValueError if DuckDB wrote no profile.
+    """
+    fd, path = tempfile.mkstemp(prefix="medicair-profile-", suffix=".json")
+    os.close(fd)
+    profile = {}
+    conn.execute("SET enable_profiling = 'json'")
+    conn.execute("SET profiling_output = '" + path.replace("'", "''") + "'")
+    try:
+        yield profile
+        with open(path) as f:
+            text = f.read()
+        root = json.loads(text) if text else {}
+        if not root.get("children"):
+            reason = root.get("result") or "the profile file is empty"
+            raise ValueError(f"DuckDB did not profile the query ({reason}), read its result to the end")
+        profile.update(plan=root["children"], latency=root.get("latency"))
+    finally:
+        try:
+            conn.execute("RESET enable_profiling")
+            conn.execute("RESET profiling_output")
+        except duckdb.Error as e:
+            logger.debug(f"Could not reset profiling: {e}")
+        os.remove(path)
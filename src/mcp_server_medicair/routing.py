@@ -0,0 +1,73 @@
+import json
+import re
+from dataclasses import dataclass, fields
+
+# Name of the database given with `--db-path`, used when a tool call names none
+DEFAULT_DATABASE = "default"
+
+_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+@dataclass
+class DatabaseConfig:
+    """
+    A named database served next to the `--db-path` one.
+    Served by its own pooled client with its own executor, unless `attach` is
+    set: then it is attached into the default database's DuckDB instance under
+    `name`, so queries there can join it with the default database's tables.
+    Settings left to None are inherited from the server options.
+    """
+
+    name: str
+    db_path: str
+    read_only: bool | None = None
+    saas_mode: bool | None = None
+    motherduck_token: str | None = None
+    query_workers: int | None = None
+    query_queue_size: int | None = None
+    attach: bool = False
+
+    def __post_init__(self):
+        if not _NAME.match(self.name):
+            raise ValueError(
+                f"Invalid database name `{self.name}`: use letters, digits and underscores"
+            )
+        if self.name == DEFAULT_DATABASE:
+            raise ValueError(f"`{DEFAULT_DATABASE}` is reserved for the --db-path database")
+
+
+def parse_database_option(value: str, attach: bool = False) -> DatabaseConfig:
+    """Parse a `NAME=PATH` command line value. Databases attached this way are read-only."""
+    name, sep, db_path = value.partition("=")
+    if not sep or not db_path:
+        raise ValueError(f"Expected NAME=PATH, got `{value}`")
+    return DatabaseConfig(
+        name=name.strip(),
+        db_path=db_path.strip(),
+        read_only=True if attach else None,
+        attach=attach,
+    )
+
+
+def load_databases(path: str) -> list[DatabaseConfig]:
+    """Read database definitions from a JSON list of {name, db_path, read_only, ...}"""
+    with open(path) as f:
+        entries = json.load(f)
+    if not isinstance(entries, list):
+        raise ValueError(f"{path} must contain a JSON list of databases")
+    known = {f.name for f in fields(DatabaseConfig)}
+    databases = []
+    for entry in entries:
+        unknown = set(entry) - known
+        if unknown:
+            raise ValueError(f"Unknown database settings in {path}: {', '.join(sorted(unknown))}")
+        databases.append(DatabaseConfig(**entry))
+    return databases
+
+
+def check_unique(databases: list[DatabaseConfig]):
+    seen = set()
+    for database in databases:
+        if database.name in seen:
+            raise ValueError(f"Database `{database.name}` is defined more than once")
+        seen.add(database.name)
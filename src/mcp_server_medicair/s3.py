@@ -0,0 +1,214 @@
+import io
+import os
+import threading
+import time
+import logging
+from contextlib import redirect_stderr, redirect_stdout
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterable
+from urllib.parse import urlparse
+
+from .cache import quote_identifier
+from .configs import (
+    DEFAULT_S3_CACHE_MAX_BYTES,
+    DEFAULT_S3_HTTP_TIMEOUT,
+    DEFAULT_S3_HTTP_RETRIES,
+)
+
+if TYPE_CHECKING:
+    import duckdb
+
+logger = logging.getLogger("mcp_server_medicair")
+
+
+@dataclass
+class S3Options:
+    """Performance settings of the connection to a DuckDB database on S3"""
+
+    # Persistent on-disk cache of remote file blocks (cache_httpfs), off if None
+    cache_dir: str | None = None
+    cache_max_bytes: int = DEFAULT_S3_CACHE_MAX_BYTES
+    http_keep_alive: bool = True
+    # Seconds
+    http_timeout: float = DEFAULT_S3_HTTP_TIMEOUT
+    http_retries: int = DEFAULT_S3_HTTP_RETRIES
+    # DuckDB threads, which is also how many byte ranges are fetched in parallel
+    threads: int | None = None
+    # Read every table once on startup to fill the block cache
+    prefetch: bool = False
+
+
+def _sql_string(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _load_extension(conn: "duckdb.DuckDBPyConnection", name: str, repository: str | None = None):
+    """Install (quietly, it may already be installed) and load a DuckDB extension"""
+    null_file = io.StringIO()
+    with redirect_stdout(null_file), redirect_stderr(null_file):
+        try:
+            conn.execute(f"INSTALL {name}" + (f" FROM {repository}" if repository else ""))
+        except Exception:
+            pass  # Extension might already be installed, or we are offline
+        conn.execute(f"LOAD {name}")
+
+
+def create_secret(conn: "duckdb.DuckDBPyConnection"):
+    """
+    Configure S3 credentials from the standard AWS environment variables.
+    `AWS_ENDPOINT_URL` points the connection at an S3 compatible service
+    (MinIO, moto, ...) with path style URLs.
+    """
+    aws_access_key = os.environ.get("AWS_ACCESS_KEY_ID")
+    aws_secret_key = os.environ.get("AWS_SECRET_ACCESS_KEY")
+    aws_region = os.environ.get("AWS_DEFAULT_REGION", "us-east-1")
+    endpoint_url = os.environ.get("AWS_ENDPOINT_URL")
+    if not (aws_access_key and aws_secret_key):
+        return
+
+    options = [
+        "TYPE S3",
+        f"KEY_ID {_sql_string(aws_access_key)}",
+        f"SECRET {_sql_string(aws_secret_key)}",
+        f"REGION {_sql_string(aws_region)}",
+    ]
+    if endpoint_url:
+        endpoint = urlparse(endpoint_url)
+        options += [
+            f"ENDPOINT {_sql_string(endpoint.netloc or endpoint.path)}",
+            "URL_STYLE 'path'",
+            f"USE_SSL {'false' if endpoint.scheme == 'http' else 'true'}",
+        ]
+    # Use CREATE SECRET for better credential management
+    conn.execute(f"CREATE SECRET IF NOT EXISTS s3_secret ({', '.join(options)})")
+
+
+def configure(conn: "duckdb.DuckDBPyConnection", options: S3Options) -> bool:
+    """
+    Load httpfs and apply the performance settings, before the database is attached.
+    Returns whether the persistent block cache is enabled.
+    """
+    import duckdb
+
+    _load_extension(conn, "httpfs")
+
+    settings = {
+        "http_keep_alive": options.http_keep_alive,
+        "http_timeout": int(options.http_timeout),
+        "http_retries": options.http_retries,
+        # Keep HEAD responses, in-memory file blocks and Parquet footers between queries
+        "enable_http_metadata_cache": True,
+        "enable_external_file_cache": True,
+        "parquet_metadata_cache": True,
+    }
+    if options.threads:
+        settings["threads"] = options.threads
+    for name, value in settings.items():
+        literal = str(value).lower() if isinstance(value, bool) else str(value)
+        try:
+            conn.execute(f"SET GLOBAL {name} = {literal}")
+        except duckdb.Error as e:
+            logger.warning(f"⚠️ Could not set {name}: {e}")
+
+    if options.cache_dir is None:
+        return False
+    try:
+        os.makedirs(options.cache_dir, exist_ok=True)
+        _load_extension(conn, "cache_httpfs", repository="community")
+        conn.execute("SET GLOBAL cache_httpfs_type = 'on_disk'")
+        conn.execute(f"SET GLOBAL cache_httpfs_cache_directory = {_sql_string(options.cache_dir)}")
+    except Exception as e:
+        logger.warning(f"⚠️ S3 block cache disabled, could not load the cache_httpfs extension: {e}")
+        return False
+    logger.info(f"💾 S3 block cache: {options.cache_dir}")
+    return True
+
+
+class CacheDirectoryLRU:
+    """
+    Keeps a cache directory under `max_bytes` by deleting the least recently
+    used files (by access or modification time, whichever is later) until it
+    is back under 90% of the budget. Checked every `check_interval` seconds.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, check_interval: float = 60.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.check_interval = check_interval
+        self.evicted_files = 0
+        self.evicted_bytes = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _files(self) -> list[tuple[float, int, str]]:
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((max(stat.st_atime, stat.st_mtime), stat.st_size, path))
+        return files
+
+    def sweep(self) -> int:
+        """Evict files until the directory fits its budget, returns the bytes freed"""
+        files = self._files()
+        total = sum(size for _, size, _ in files)
+        if total <= self.max_bytes:
+            return 0
+        target = int(self.max_bytes * 0.9)
+        freed = 0
+        for _, size, path in sorted(files):
+            if total - freed <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            freed += size
+            self.evicted_files += 1
+        self.evicted_bytes += freed
+        logger.info(f"🧹 S3 block cache over budget, evicted {freed} bytes")
+        return freed
+
+    def _run(self):
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.warning(f"⚠️ S3 block cache eviction failed: {e}")
+
+    def start(self):
+        self.sweep()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="medicair-s3-cache", daemon=True)
+            self._thread.start()
+
+    def stats(self) -> dict:
+        return {
+            "bytes": sum(size for _, size, _ in self._files()),
+            "max_bytes": self.max_bytes,
+            "evicted_files": self.evicted_files,
+            "evicted_bytes": self.evicted_bytes,
+        }
+
+    def close(self):
+        self._stop.set()
+
+
+def prefetch(conn: "duckdb.DuckDBPyConnection", tables: Iterable[tuple[str, str, str]]):
+    """Read every column of the given (database, schema, table) tables so their blocks get cached"""
+    import duckdb
+
+    for database, schema, table in tables:
+        name = ".".join(quote_identifier(p) for p in (database, schema, table))
+        started = time.monotonic()
+        try:
+            # Aggregating every column reads all of them without moving rows to Python
+            conn.execute(f"SELECT min(COLUMNS(*)) FROM {name}").fetchall()
+        except duckdb.Error as e:
+            logger.debug(f"Could not prefetch {name}: {e}")
+            continue
+        logger.info(f"🔥 Prefetched {schema}.{table} in {time.monotonic() - started:.2f} s")
@@ -1,14 +1,83 @@
+import dataclasses
+import functools
+import importlib
+import json
 import logging
+import os
+import time
+from typing import TYPE_CHECKING
+import anyio
 import mcp.types as types
 from mcp.server import NotificationOptions, Server
+from mcp.server.lowlevel.helper_types import ReadResourceContents
 from mcp.server.models import InitializationOptions
-from .configs import SERVER_VERSION
-from .database import DatabaseClient
+from .configs import (
+    SERVER_VERSION,
+    DEFAULT_QUERY_WORKERS,
+    DEFAULT_QUERY_QUEUE_SIZE,
+    DEFAULT_POOL_IDLE_TIMEOUT,
+    DEFAULT_READ_ONLY_IDLE_TIMEOUT,
+    DEFAULT_RESULT_CACHE_SIZE,
+    DEFAULT_RESULT_CACHE_TTL,
+    DEFAULT_MAX_ROWS,
+    DEFAULT_MAX_RESULT_BYTES,
+    DEFAULT_CURSOR_TTL,
+    DEFAULT_MAX_CURSORS_PER_SESSION,
+    DEFAULT_RESULT_FORMAT,
+    DEFAULT_SPOOL_MAX_BYTES,
+    DEFAULT_PROGRESS_INTERVAL,
+    DEFAULT_QUERY_TIMEOUT,
+    DEFAULT_SCHEMA_CATALOG_TTL,
+    DEFAULT_SUMMARY_REFRESH_INTERVAL,
+    DEFAULT_MIRROR_REFRESH_INTERVAL,
+    DEFAULT_PREPARED_CACHE_SIZE,
+    DEFAULT_ADVISOR_MIN_QUERIES,
+    DEFAULT_ADVISOR_REPLAY_ROWS,
+    DEFAULT_PROFILE_HISTORY,
+    DEFAULT_SESSION_IDLE_TIMEOUT,
+)
+from .s3 import S3Options
+from .routing import DEFAULT_DATABASE, DatabaseConfig
+from .executor import QueryExecutor
+from .monitoring import Monitor
+from .startup import Startup
+from .sessions import SessionRegistry
+from .capture import CaptureLog, result_size
+from .catalog import CachedResult
+from .formatters import FORMATTERS
+from .spool import EXPORT_FORMATS, SpooledResult
+from .summaries import DEFAULT_SUMMARIES, load_definitions
+from .templates import DEFAULT_TEMPLATES, QueryTemplate, load_templates
 from .prompt import PROMPT_TEMPLATE, MOTHERDUCK_PROMPT
 
+if TYPE_CHECKING:
+    # Imported in the background with duckdb, see `connect` below
+    from .database import DatabaseClient, QueryResult, RunningQuery
+    from .advisor import Recommendation
+    from .profiling import Profile
+
 
 logger = logging.getLogger("mcp_server_medicair")
 
+SCHEMA_URI = "medicair://schema"
+ADVISOR_URI = "medicair://advisor"
+PROFILES_URI = "medicair://profiles"
+METRICS_URI = "medicair://metrics"
+STARTUP_URI = "medicair://startup"
+CONTEXT_URI = "medicair://context"
+SESSIONS_URI = "medicair://sessions"
+
+# Names query templates can't take
+BUILTIN_TOOLS = (
+    "query",
+    "query_next_page",
+    "list_tables",
+    "describe_table",
+    "export_query",
+    "explain",
+    "advise_indexes",
+)
+
 
 def build_application(
     db_path: str,
@@ -16,80 +85,430 @@ def build_application(
     home_dir: str | None = None,
     saas_mode: bool = False,
     read_only: bool = False,
+    query_workers: int = DEFAULT_QUERY_WORKERS,
+    query_queue_size: int = DEFAULT_QUERY_QUEUE_SIZE,
+    pool_size: int | None = None,
+    pool_idle_timeout: float = DEFAULT_POOL_IDLE_TIMEOUT,
+    read_only_idle_timeout: float = DEFAULT_READ_ONLY_IDLE_TIMEOUT,
+    result_cache_size: int = DEFAULT_RESULT_CACHE_SIZE,
+    result_cache_ttl: float = DEFAULT_RESULT_CACHE_TTL,
+    max_rows: int = DEFAULT_MAX_ROWS,
+    max_result_bytes: int = DEFAULT_MAX_RESULT_BYTES,
+    cursor_ttl: float = DEFAULT_CURSOR_TTL,
+    max_cursors_per_session: int = DEFAULT_MAX_CURSORS_PER_SESSION,
+    structured_content: bool = False,
+    result_format: str = DEFAULT_RESULT_FORMAT,
+    max_col_width: int | None = None,
+    spool_dir: str | None = None,
+    spool_max_bytes: int = DEFAULT_SPOOL_MAX_BYTES,
+    progress_interval: float = DEFAULT_PROGRESS_INTERVAL,
+    query_timeout: float = DEFAULT_QUERY_TIMEOUT,
+    schema_catalog_ttl: float = DEFAULT_SCHEMA_CATALOG_TTL,
+    summaries_file: str | None = None,
+    enable_summaries: bool = True,
+    summary_refresh_interval: float = DEFAULT_SUMMARY_REFRESH_INTERVAL,
+    mirror: bool = False,
+    mirror_dir: str | None = None,
+    mirror_tables: list[str] | None = None,
+    mirror_refresh_interval: float = DEFAULT_MIRROR_REFRESH_INTERVAL,
+    s3_options: S3Options | None = None,
+    databases: list[DatabaseConfig] | None = None,
+    prepared_cache_size: int = DEFAULT_PREPARED_CACHE_SIZE,
+    templates_file: str | None = None,
+    enable_templates: bool = True,
+    advisor: bool = False,
+    advisor_min_queries: int = DEFAULT_ADVISOR_MIN_QUERIES,
+    advisor_replay_rows: int = DEFAULT_ADVISOR_REPLAY_ROWS,
+    profile_history: int = DEFAULT_PROFILE_HISTORY,
+    monitor: Monitor | None = None,
+    capture_file: str | None = None,
+    startup: Startup | None = None,
+    compact_descriptions: bool = False,
+    session_idle_timeout: float | None = DEFAULT_SESSION_IDLE_TIMEOUT,
 ):
     logger.info("Starting Medicair MCP Server")
+    # Metrics of the HTTP transports' /metrics, also exposed as a resource
+    monitor = monitor or Monitor()
+    # Databases are connected in the background, see `connect` below
+    startup = startup or Startup()
+    monitor.startup = startup
+    # Opt-in log of every tool call, for replaying production traffic
+    capture = CaptureLog(capture_file) if capture_file else None
     server = Server("mcp-server-medicair")
-    db_client = DatabaseClient(
-        db_path=db_path,
-        motherduck_token=motherduck_token,
-        home_dir=home_dir,
-        saas_mode=saas_mode,
-        read_only=read_only,
-    )
+    summaries = None
+    if enable_summaries:
+        summaries = load_definitions(summaries_file) if summaries_file else DEFAULT_SUMMARIES
+    databases = databases or []
+    attached = [d for d in databases if d.attach]
+
+    def make_client(
+        name: str,
+        db_path: str,
+        motherduck_token: str | None,
+        saas_mode: bool,
+        read_only: bool,
+        query_workers: int,
+        attach: list[DatabaseConfig] | None = None,
+    ) -> "DatabaseClient":
+        from .database import DatabaseClient
+
+        def directory(path: str | None) -> str | None:
+            # Every database keeps its own exports and mirror next to the default one's
+            if path is None or name == DEFAULT_DATABASE:
+                return path
+            return os.path.join(path, name)
+
+        return DatabaseClient(
+            db_path=db_path,
+            motherduck_token=motherduck_token,
+            home_dir=home_dir,
+            saas_mode=saas_mode,
+            read_only=read_only,
+            # No point keeping more cursors than there are workers to use them
+            pool_size=pool_size or query_workers,
+            pool_idle_timeout=pool_idle_timeout,
+            read_only_idle_timeout=read_only_idle_timeout,
+            result_cache_size=result_cache_size,
+            result_cache_ttl=result_cache_ttl,
+            max_rows=max_rows,
+            max_result_bytes=max_result_bytes,
+            cursor_ttl=cursor_ttl,
+            max_cursors_per_session=max_cursors_per_session,
+            result_format=result_format,
+            max_col_width=max_col_width,
+            spool_dir=directory(spool_dir),
+            spool_max_bytes=spool_max_bytes,
+            query_timeout=query_timeout,
+            schema_catalog_ttl=schema_catalog_ttl,
+            summaries=summaries,
+            summary_refresh_interval=summary_refresh_interval,
+            mirror=mirror,
+            mirror_dir=directory(mirror_dir),
+            mirror_tables=mirror_tables,
+            mirror_refresh_interval=mirror_refresh_interval,
+            s3_options=s3_options,
+            attach=attach,
+            prepared_cache_size=prepared_cache_size,
+            advisor=advisor,
+            advisor_min_queries=advisor_min_queries,
+            advisor_replay_rows=advisor_replay_rows,
+            profile_history=profile_history,
+        )
+
+    executor = QueryExecutor(max_workers=query_workers, max_queue=query_queue_size)
+    # Databases a tool call can be routed to with its `database` argument. The
+    # clients are filled in by `connect`, the names are known from the start.
+    clients: dict[str, "DatabaseClient"] = {}
+    executors = {DEFAULT_DATABASE: executor}
+    client_options = {
+        DEFAULT_DATABASE: (db_path, motherduck_token, saas_mode, read_only, query_workers, attached)
+    }
+    for database in databases:
+        if database.attach:
+            continue
+        logger.info(f"Serving database `{database.name}`: {database.db_path.split('?')[0]}")
+        workers = database.query_workers or query_workers
+        client_options[database.name] = (
+            database.db_path,
+            database.motherduck_token or motherduck_token,
+            saas_mode if database.saas_mode is None else database.saas_mode,
+            read_only if database.read_only is None else database.read_only,
+            workers,
+            None,
+        )
+        executors[database.name] = QueryExecutor(
+            max_workers=workers, max_queue=database.query_queue_size or query_queue_size
+        )
+
+    def route(arguments: dict) -> tuple[str, "DatabaseClient", QueryExecutor]:
+        name = arguments.get("database") or DEFAULT_DATABASE
+        if name not in executors:
+            raise ValueError(f"Unknown database `{name}`, expected one of: {', '.join(executors)}")
+        return name, clients[name], executors[name]
+
+    def close_session(session_id):
+        closed = sum(client.cursors.close_session(session_id) for client in list(clients.values()))
+        if closed:
+            logger.info(f"Closed {closed} result cursors of an ended session")
+
+    sessions = SessionRegistry(session_idle_timeout, close_session)
+    monitor.sessions = sessions
+
+    def session_key():
+        """
+        The MCP session id of stateful HTTP sessions, which outlives the HTTP
+        connections of the session, else the id of the session object (the
+        only session of stdio, one per request in stateless `stream` mode)
+        """
+        ctx = server.request_context
+        if ctx.request is not None:
+            session_id = ctx.request.headers.get("mcp-session-id")
+            if session_id:
+                return session_id
+        return id(ctx.session)
+
+    def routed(name: str, result: "QueryResult") -> "QueryResult":
+        # Cursors of other databases carry the database name, so the next page finds its client
+        if result.cursor and name != DEFAULT_DATABASE:
+            return dataclasses.replace(result, cursor=f"{name}/{result.cursor}")
+        return result
+
+    database_property = {}
+    if len(executors) > 1 or attached:
+        description = f"Database to run on, `{DEFAULT_DATABASE}` if omitted."
+        if attached:
+            description += (
+                f" The `{DEFAULT_DATABASE}` database can also join tables of "
+                + ", ".join(f"`{d.name}`" for d in attached)
+                + " in SQL, e.g. `SELECT ... FROM tabella JOIN "
+                + f"{attached[0].name}.tabella ...`."
+            )
+        database_property = {
+            "database": {"type": "string", "enum": list(executors), "description": description}
+        }
+
+    # Query templates exposed as tools of their own. Until `connect` has
+    # dropped the ones that don't prepare against their database, all are listed.
+    templates: dict[str, QueryTemplate] = {}
+    if enable_templates:
+        for template in load_templates(templates_file) if templates_file else DEFAULT_TEMPLATES:
+            if template.name in BUILTIN_TOOLS or template.name in templates:
+                raise ValueError(f"Query template name `{template.name}` is already taken")
+            templates[template.name] = template
+
+    def connect():
+        """
+        Import the database layer (and duckdb with it), open every database and
+        check the query templates. Runs in the background while the server
+        already answers the handshake, `list_tools` and the like.
+        """
+        with startup.phase("import database"):
+            importlib.import_module(".database", __package__)
+        for name, options in client_options.items():
+            with startup.phase(f"connect {name}") as steps:
+                client = make_client(name, *options)
+                steps.update(client.setup_timings)
+            clients[name] = client
+            monitor.register(name, client, executors[name])
+        if templates:
+            with startup.phase("check templates"):
+                for template in list(templates.values()):
+                    try:
+                        _, client, _ = route({"database": template.database})
+                        client.check_query(template.query)
+                    except ValueError as e:
+                        logger.warning(f"⚠️ Ignoring query template `{template.name}`: {e}")
+                        del templates[template.name]
+            if templates:
+                logger.info(f"🧩 Query templates: {', '.join(templates)}")
 
     logger.info("Registering handlers")
 
+    startup.start(connect)
+
+    def spooled_resource(result: SpooledResult) -> types.Resource:
+        return types.Resource(
+            uri=result.uri,
+            name=result.result_id,
+            description=f"{result.row_count} righe esportate dalla query: {result.query}",
+            mimeType=result.mime_type,
+            size=result.size,
+        )
+
     @server.list_resources()
     async def handle_list_resources() -> list[types.Resource]:
         """
-        List available resources. Currently no resources are exposed.
+        List available resources: the schema catalog, the query profiles, the
+        index advisor's report and the query results exported with `export_query`.
         """
         logger.info("Listing resources")
-        return []
+        resources = [
+            types.Resource(
+                uri=SCHEMA_URI,
+                name="schema",
+                description="Tabelle, viste e colonne del database (catalogo in cache)",
+                mimeType="application/json",
+            ),
+            types.Resource(
+                uri=METRICS_URI,
+                name="metrics",
+                description="Metriche del server in formato Prometheus: latenze, righe, cache, pool e errori",
+                mimeType="text/plain",
+            ),
+            types.Resource(
+                uri=STARTUP_URI,
+                name="startup",
+                description="Tempi di avvio del server: import, connessione ai database e controllo dei template",
+                mimeType="application/json",
+            ),
+            types.Resource(
+                uri=CONTEXT_URI,
+                name="context",
+                description="Contesto MedicAir: tabelle, colonne, collegamenti e quale tabella usare per ogni domanda",
+                mimeType="text/markdown",
+            ),
+            types.Resource(
+                uri=SESSIONS_URI,
+                name="sessions",
+                description="Sessioni aperte con chiamate, errori, tempo, byte restituiti e cursori aperti di ognuna",
+                mimeType="application/json",
+            ),
+            types.Resource(
+                uri=PROFILES_URI,
+                name="profiles",
+                description="Ultimi profili delle query (explain e query con profile), dal più recente",
+                mimeType="application/json",
+            ),
+        ]
+        if advisor:
+            resources.append(
+                types.Resource(
+                    uri=ADVISOR_URI,
+                    name="advisor",
+                    description="Colonne filtrate dalle query eseguite e ultime proposte di indici e ordinamenti",
+                    mimeType="application/json",
+                )
+            )
+        return resources + [
+            spooled_resource(result)
+            for client in list(clients.values())
+            for result in client.spooled_results()
+        ]
 
-    @server.list_prompts()
-    async def handle_list_prompts() -> list[types.Prompt]:
-        """
-        List available prompts.
-        Each prompt can have optional arguments to customize its behavior.
-        """
-        logger.info("Listing prompts")
-        # TODO: Check where and how this is used, and how to optimize this.
-        # Check postgres and sqlite servers.
+    @server.list_resource_templates()
+    async def handle_list_resource_templates() -> list[types.ResourceTemplate]:
+        logger.info("Listing resource templates")
         return [
-            types.Prompt(
-                name="duckdb-motherduck-initial-prompt",
-                description="A prompt to initialize a connection to duckdb or motherduck and start working with it",
+            types.ResourceTemplate(
+                uriTemplate=SCHEMA_URI + "/{table}",
+                name="table",
+                description="Colonne e tipi di una tabella, es. medicair://schema/inbound_garage",
+                mimeType="application/json",
+            ),
+            types.ResourceTemplate(
+                uriTemplate=PROFILES_URI + "/{id}",
+                name="profile",
+                description="Piano di una query con tempi e righe per operatore e pipeline, es. medicair://profiles/1",
+                mimeType="application/json",
             ),
-            types.Prompt(
-                name="medicair-starting-prompt",
-                description="A medic air starting prompt for DuckDB/MotherDuck interactions",
-            )
         ]
 
-    @server.get_prompt()
-    async def handle_get_prompt(
-        name: str, arguments: dict[str, str] | None
-    ) -> types.GetPromptResult:
+    @server.read_resource()
+    async def handle_read_resource(uri) -> list[ReadResourceContents]:
         """
-        Generate a prompt by combining arguments with server state.
-        The prompt includes all current notes and can be customized via arguments.
+        Read the schema catalog (as JSON), or an exported query result as a
+        binary Arrow IPC or Parquet file.
         """
-        logger.info(f"Getting prompt: {name}::{arguments}")
-        # TODO: Check where and how this is used, and how to optimize this.
-        # Check postgres and sqlite servers.
-        if name == "duckdb-motherduck-initial-prompt":
-            return types.GetPromptResult(
-                description="Initial prompt for interacting with DuckDB/MotherDuck",
-                messages=[
-                    types.PromptMessage(
-                        role="user",
-                        content=types.TextContent(type="text", text=PROMPT_TEMPLATE),
-                    )
-                ],
+        logger.info(f"Reading resource: {uri}")
+        uri = str(uri)
+        if uri == METRICS_URI:
+            return [ReadResourceContents(content=monitor.render(), mime_type="text/plain")]
+        if uri == STARTUP_URI:
+            return [ReadResourceContents(content=json.dumps(startup.as_dict()), mime_type="application/json")]
+        if uri == CONTEXT_URI:
+            return [ReadResourceContents(content=MOTHERDUCK_PROMPT, mime_type="text/markdown")]
+        if uri == SESSIONS_URI:
+            return [ReadResourceContents(content=json.dumps(sessions_report()), mime_type="application/json")]
+        await startup.wait()
+        db_client = clients[DEFAULT_DATABASE]
+        if uri == SCHEMA_URI:
+            catalog = await executor.run(db_client.catalog.as_dict)
+            return [ReadResourceContents(content=json.dumps(catalog, default=str), mime_type="application/json")]
+        if uri == PROFILES_URI:
+            profiles = sorted(
+                (
+                    {"database": name, **profile.summary()}
+                    for name, client in clients.items()
+                    for profile in client.profiles.list()
+                ),
+                key=lambda p: p["createdAt"],
+                reverse=True,
             )
-        elif name == "medicair-starting-prompt":
-            return types.GetPromptResult(
-                description="A medic air starting prompt for DuckDB/MotherDuck interactions",
+            return [ReadResourceContents(content=json.dumps(profiles, default=str), mime_type="application/json")]
+        if uri.startswith(PROFILES_URI + "/"):
+            profile_id = uri[len(PROFILES_URI) + 1 :]
+            for name, client in clients.items():
+                profile = client.profiles.get(profile_id)
+                if profile is not None:
+                    content = json.dumps({"database": name, **profile.as_dict()}, default=str)
+                    return [ReadResourceContents(content=content, mime_type="application/json")]
+            raise ValueError(f"Unknown or evicted profile: {uri}")
+        if uri == ADVISOR_URI and advisor:
+            report = {
+                name: client.advisor.as_dict()
+                for name, client in clients.items()
+                if client.advisor is not None
+            }
+            return [ReadResourceContents(content=json.dumps(report, default=str), mime_type="application/json")]
+        if uri.startswith(SCHEMA_URI + "/"):
+            table = await executor.run(db_client.catalog.find, uri[len(SCHEMA_URI) + 1 :])
+            return [
+                ReadResourceContents(
+                    content=json.dumps(table.as_dict(), default=str), mime_type="application/json"
+                )
+            ]
+
+        result = next(
+            (r for client in clients.values() for r in client.spooled_results() if r.uri == uri),
+            None,
+        )
+        if result is None:
+            raise ValueError(f"Unknown or evicted result: {uri}")
+        try:
+            data = await anyio.Path(result.path).read_bytes()
+        except FileNotFoundError:
+            raise ValueError(f"Unknown or evicted result: {uri}")
+        return [ReadResourceContents(content=data, mime_type=result.mime_type)]
+
+    # The prompts are static: their results are built and dumped once, and
+    # the requests are answered from those instead of through the decorators
+    prompts = {
+        "duckdb-motherduck-initial-prompt": (
+            "A prompt to initialize a connection to duckdb or motherduck and start working with it",
+            "Initial prompt for interacting with DuckDB/MotherDuck",
+            PROMPT_TEMPLATE,
+        ),
+        "medicair-starting-prompt": (
+            "A medic air starting prompt for DuckDB/MotherDuck interactions",
+            "A medic air starting prompt for DuckDB/MotherDuck interactions",
+            MOTHERDUCK_PROMPT,
+        ),
+    }
+    prompt_list = CachedResult.of(
+        types.ListPromptsResult(
+            prompts=[
+                types.Prompt(name=name, description=description)
+                for name, (description, _, _) in prompts.items()
+            ]
+        )
+    )
+    prompt_results = {
+        name: CachedResult.of(
+            types.GetPromptResult(
+                description=description,
                 messages=[
-                    types.PromptMessage(
-                        role="user",
-                        content=types.TextContent(type="text", text=MOTHERDUCK_PROMPT),
-                    )
+                    types.PromptMessage(role="user", content=types.TextContent(type="text", text=text))
                 ],
             )
-        else:
+        )
+        for name, (_, description, text) in prompts.items()
+    }
+
+    async def handle_list_prompts(request: types.ListPromptsRequest) -> CachedResult:
+        """List available prompts."""
+        logger.info("Listing prompts")
+        return prompt_list
+
+    async def handle_get_prompt(request: types.GetPromptRequest) -> CachedResult:
+        """Return a prompt. None of them takes arguments."""
+        name = request.params.name
+        logger.info(f"Getting prompt: {name}::{request.params.arguments}")
+        if name not in prompt_results:
             raise ValueError(f"Unknown prompt: {name}")
+        return prompt_results[name]
+
+    server.request_handlers[types.ListPromptsRequest] = handle_list_prompts
+    server.request_handlers[types.GetPromptRequest] = handle_get_prompt
 
     @server.list_tools()
     async def handle_list_tools() -> list[types.Tool]:
@@ -101,7 +520,7 @@ def build_application(
         return [
             types.Tool(
                 name="query",
-                description=MOTHERDUCK_PROMPT + "\n\nUse this tool to execute SQL queries on the MedicAir database.",
+                description=query_description,
                 inputSchema={
                     "type": "object",
                     "properties": {
@@ -109,22 +528,442 @@ def build_application(
                             "type": "string",
                             "description": "SQL query to execute that is a dialect of DuckDB SQL",
                         },
+                        "params": {
+                            "type": "array",
+                            "description": (
+                                "Values for the `?` or `$1`, `$2`, ... placeholders of the query, in order. "
+                                "Use them instead of writing values into the SQL, e.g. "
+                                "`SELECT * FROM inbound_garage WHERE Matricola = ?` with params [\"AB123\"]. "
+                                "Repeated lookups then skip parsing and planning."
+                            ),
+                        },
+                        "format": {
+                            "type": "string",
+                            "enum": list(FORMATTERS),
+                            "description": f"How to render the results, `{result_format}` if omitted. csv and tsv are the most compact.",
+                        },
+                        "timeout": {
+                            "type": "number",
+                            "exclusiveMinimum": 0,
+                            "description": "Seconds after which the query is interrupted. Can only lower the server's timeout.",
+                        },
+                        "profile": {
+                            "type": "boolean",
+                            "description": (
+                                "Also return the operator timings of the query. The whole result is read to "
+                                "complete the profile but only the first page is returned. False if omitted"
+                            ),
+                        },
+                        **database_property,
                     },
                     "required": ["query"],
                 },
             ),
+            types.Tool(
+                name="query_next_page",
+                description="Fetch the next page of a query result that was truncated. Pass the `cursor` returned with the previous page.",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "cursor": {
+                            "type": "string",
+                            "description": "Cursor returned with the previous page of results",
+                        },
+                    },
+                    "required": ["cursor"],
+                },
+            ),
+            types.Tool(
+                name="list_tables",
+                description=(
+                    "List the tables and views of the database with their estimated row counts. "
+                    "Answered from the server's schema cache, prefer it to querying information_schema."
+                ),
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "database": {
+                            "type": "string",
+                            "description": (
+                                "Only list tables of this database: one the server serves "
+                                f"({', '.join(executors)}) or an attached DuckDB catalog"
+                            ),
+                        },
+                        "schema": {
+                            "type": "string",
+                            "description": "Only list tables of this schema, e.g. main",
+                        },
+                    },
+                },
+            ),
+            types.Tool(
+                name="describe_table",
+                description=(
+                    "Describe the columns of a table or view: types, nullability, comments and approximate "
+                    "statistics (min, max, distinct values, nulls) computed on a sample. "
+                    "Answered from the server's schema cache, prefer it to DESCRIBE queries."
+                ),
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "table": {
+                            "type": "string",
+                            "description": "Table name, optionally qualified as schema.table or database.schema.table",
+                        },
+                        "statistics": {
+                            "type": "boolean",
+                            "description": "Include approximate column statistics, true if omitted",
+                        },
+                        **database_property,
+                    },
+                    "required": ["table"],
+                },
+            ),
+            types.Tool(
+                name="export_query",
+                description=(
+                    "Run a SELECT query and export the whole result to an Arrow IPC or Parquet file instead of text. "
+                    "Returns a resource URI to read the file from, with the schema and row count. "
+                    "Use it for dashboards or when the full table is needed."
+                ),
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "query": {
+                            "type": "string",
+                            "description": "SELECT query to export, in the DuckDB SQL dialect",
+                        },
+                        "format": {
+                            "type": "string",
+                            "enum": list(EXPORT_FORMATS),
+                            "description": "File format of the export, `parquet` if omitted",
+                        },
+                        "timeout": {
+                            "type": "number",
+                            "exclusiveMinimum": 0,
+                            "description": "Seconds after which the query is interrupted. Can only lower the server's timeout.",
+                        },
+                        **database_property,
+                    },
+                    "required": ["query"],
+                },
+            ),
+            types.Tool(
+                name="explain",
+                description=(
+                    "Show how DuckDB runs a query: the operators of its plan with, when analyzed, "
+                    "their timings and row counts, and the pipelines they form. Use it to find out why a query is slow. "
+                    "Analyzing runs the query but returns no rows."
+                ),
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "query": {
+                            "type": "string",
+                            "description": "Single SQL statement to explain, in the DuckDB SQL dialect",
+                        },
+                        "analyze": {
+                            "type": "boolean",
+                            "description": "Run the query and report actual timings and row counts (SELECT only), true if omitted. False only shows the plan and its estimates",
+                        },
+                        "timeout": {
+                            "type": "number",
+                            "exclusiveMinimum": 0,
+                            "description": "Seconds after which the query is interrupted. Can only lower the server's timeout.",
+                        },
+                        **database_property,
+                    },
+                    "required": ["query"],
+                },
+            ),
+        ] + advisor_tools + [
+            types.Tool(
+                name=template.name,
+                description=template.description,
+                inputSchema=template.input_schema(),
+            )
+            # Templates are dropped from the startup thread
+            for template in list(templates.values())
         ]
 
+    query_description = MOTHERDUCK_PROMPT + "\n\nUse this tool to execute SQL queries on the MedicAir database."
+    if compact_descriptions:
+        query_description = (
+            "Execute SQL queries (DuckDB dialect) on the MedicAir database of articles, stock, repairs "
+            f"and warehouse movements. Read the `{CONTEXT_URI}` resource once before the first query: "
+            "it describes the tables, their columns and joins, and which table answers which question."
+        )
+
+    # The decorated handler also refreshes the tool definitions that calls
+    # are validated against, so it only runs when the catalog changes
+    build_tool_list = server.request_handlers[types.ListToolsRequest]
+    # Template names -> tool list built and dumped for them. Only the startup
+    # changes the catalog, when it drops templates that don't prepare.
+    tool_list: dict[tuple[str, ...], CachedResult] = {}
+
+    async def handle_list_tools_request(request: types.ListToolsRequest | None) -> CachedResult:
+        startup.mark("first list_tools")
+        key = tuple(templates)
+        cached = tool_list.get(key)
+        if cached is None:
+            result = await build_tool_list(request)
+            tool_list.clear()
+            cached = tool_list[key] = CachedResult.of(result.root)
+        return cached
+
+    server.request_handlers[types.ListToolsRequest] = handle_list_tools_request
+
+    advisor_tools = []
+    if advisor:
+        advisor_tools.append(
+            types.Tool(
+                name="advise_indexes",
+                description=(
+                    "Report which columns the executed queries filter on most, and propose an index "
+                    "(lookups by value) or a sorted copy of the table (range filters) for each. "
+                    "Every proposal comes with the latency of the recorded queries replayed on a copy "
+                    "of the table before and after the change."
+                ),
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "min_queries": {
+                            "type": "integer",
+                            "minimum": 1,
+                            "description": f"Only propose changes for columns filtered by at least this many queries, {advisor_min_queries} if omitted",
+                        },
+                        "replay": {
+                            "type": "boolean",
+                            "description": "Replay the recorded queries to estimate each change, true if omitted",
+                        },
+                        "apply": {
+                            "type": "boolean",
+                            "description": "Create the proposed indexes and sort orders whose replay was faster. False if omitted",
+                        },
+                        "timeout": {
+                            "type": "number",
+                            "exclusiveMinimum": 0,
+                            "description": "Seconds after which the replays are interrupted. Can only lower the server's timeout.",
+                        },
+                        **database_property,
+                    },
+                },
+            )
+        )
+
+    def profile_text(profile: "Profile") -> str:
+        if profile.analyzed:
+            lines = [
+                f"Profilo {profile.profile_id}: {1000 * (profile.latency or 0):.1f} ms, {profile.rows} righe. "
+                f"Dettaglio completo in {profile.uri}",
+                "",
+                "Operatori più costosi:",
+            ]
+            operators = sorted(profile.operators(), key=lambda op: op["timing"] or 0, reverse=True)
+            for op in operators[:5]:
+                line = f"- {op['operator']}: {1000 * (op['timing'] or 0):.1f} ms, {op['cardinality']} righe"
+                if op["estimatedCardinality"] is not None:
+                    line += f" (stimate {op['estimatedCardinality']})"
+                if op["rowsScanned"]:
+                    line += f", {op['rowsScanned']} righe lette"
+                lines.append(line)
+        else:
+            lines = [f"Piano {profile.profile_id} (non eseguito). Dettaglio completo in {profile.uri}", "", "Operatori:"]
+            for op in profile.operators():
+                line = "  " * op["depth"] + f"- {op['operator']}"
+                if op["estimatedCardinality"] is not None:
+                    line += f" (stimate {op['estimatedCardinality']} righe)"
+                lines.append(line)
+        lines += ["", "Pipeline:"]
+        for i, pipeline in enumerate(profile.pipelines(), 1):
+            line = f"{i}. {' → '.join(pipeline['operators'])}"
+            if pipeline["timing"] is not None:
+                line += f": {1000 * pipeline['timing']:.1f} ms"
+            lines.append(line)
+        return "\n".join(lines)
+
+    proposal_kinds = {"index": "indice", "sort": "riordino"}
+
+    def advisor_text(report: list["Recommendation"]) -> str:
+        if not report:
+            return (
+                "Nessuna proposta: nessuna colonna è stata filtrata abbastanza spesso dalle query eseguite. "
+                f"Il dettaglio dei filtri registrati è nella risorsa {ADVISOR_URI}."
+            )
+        lines = ["Proposte di indici e ordinamenti, dalla colonna più costosa:", ""]
+        for proposal in report:
+            line = (
+                f"- {proposal_kinds[proposal.kind]} su {proposal.table}.{proposal.column} "
+                f"({proposal.queries} query, {proposal.total_time:.2f} s in totale): {proposal.statement}"
+            )
+            if proposal.before_ms is not None and proposal.after_ms is not None:
+                line += (
+                    f"\n  stima su {proposal.replayed_rows} righe: {proposal.before_ms:.2f} ms prima, "
+                    f"{proposal.after_ms:.2f} ms dopo"
+                    + ("" if proposal.beneficial else ", nessun beneficio")
+                )
+            if proposal.applied:
+                line += "\n  applicata"
+            if proposal.error:
+                line += f"\n  errore: {proposal.error}"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def result_text(result: "QueryResult") -> str:
+        row_count = result.row_count
+        if result.cursor:
+            return (
+                f"Risultati della query: {row_count} righe mostrate, il risultato continua. "
+                f"Per la pagina successiva usa il tool `query_next_page` con cursor=\"{result.cursor}\".\n\n"
+                f"{result.formatted}"
+            )
+        if result.truncated:
+            return (
+                f"Risultati della query: {row_count} righe mostrate, il risultato è stato troncato. "
+                f"Aggiungi filtri o un LIMIT per vedere il resto.\n\n{result.formatted}"
+            )
+        return f"Risultati della query: {row_count} righe trovate.\n\n{result.formatted}"
+
+    progress_phases = {
+        "executing": "Esecuzione della query",
+        "fetching": "Lettura dei risultati",
+        "exporting": "Esportazione dei risultati",
+    }
+
+    async def report_progress(ctx, progress_token, running: "RunningQuery"):
+        """
+        Notify the client every `progress_interval` seconds with the elapsed
+        time and rows fetched so far, so that long queries keep the request
+        alive until the result is ready.
+        """
+        while True:
+            await anyio.sleep(progress_interval)
+            try:
+                await ctx.session.send_progress_notification(
+                    progress_token,
+                    # Must increase with every notification, rows may not
+                    round(running.elapsed, 1),
+                    message=(
+                        f"{progress_phases[running.phase]}: "
+                        f"{running.rows_fetched} righe lette in {running.elapsed:.1f} s"
+                    ),
+                    related_request_id=ctx.request_id,
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ Could not send progress notification: {e}")
+                return
+
+    async def run_query(func, *args, timeout: float | None = None, executor: QueryExecutor = executor):
+        """
+        Run a database call on the executor. If the request is cancelled (MCP
+        cancellation or client disconnect) the DuckDB query is interrupted
+        rather than left running, and progress is reported when the client
+        asked for it by sending a progress token.
+        """
+        from .database import RunningQuery
+
+        ctx = server.request_context
+        progress_token = ctx.meta.progressToken if ctx.meta else None
+        running = RunningQuery()
+
+        error = None
+        async with anyio.create_task_group() as tg:
+            if progress_token is not None and progress_interval:
+                tg.start_soon(report_progress, ctx, progress_token, running)
+            try:
+                result = await executor.run(
+                    func,
+                    *args,
+                    running,
+                    timeout,
+                    on_cancel=lambda: running.interrupt("cancelled"),
+                )
+            except Exception as e:
+                # Raised outside the task group, which would wrap it in an ExceptionGroup
+                error = e
+            finally:
+                tg.cancel_scope.cancel()
+        if error is not None:
+            raise error
+        return result
+
+    def tool_result(result: "QueryResult"):
+        content = [types.TextContent(type="text", text=result_text(result))]
+        if result.profile is not None:
+            content.append(types.TextContent(type="text", text=profile_text(result.profile)))
+        if structured_content:
+            # Only now pay for the structured copy of the rows
+            return content, result.structured()
+        return content
+
+    def sessions_report() -> list[dict]:
+        cursors: dict = {}
+        for client in list(clients.values()):
+            for session_id, count in client.cursors.by_session().items():
+                cursors[session_id] = cursors.get(session_id, 0) + count
+        now = time.monotonic()
+        return [
+            {
+                # Enough to tell sessions apart, the full id lets anyone use the session
+                "session": session_label(usage.session_id)[:8],
+                "createdAt": usage.created_at,
+                "idleSeconds": round(now - usage.last_seen, 3),
+                "calls": usage.calls,
+                "errors": usage.errors,
+                "seconds": round(usage.seconds, 3),
+                "bytes": usage.bytes,
+                "openCursors": cursors.get(usage.session_id, 0),
+            }
+            for usage in sessions.sessions()
+        ]
+
+    def session_label(session_id) -> str:
+        return session_id if isinstance(session_id, str) else format(session_id, "x")
+
     @server.call_tool()
-    async def handle_tool_call(
-        name: str, arguments: dict | None
-    ):
+    async def handle_tool_call(name: str, arguments: dict | None):
         """
-        Handle tool execution requests.
+        Handle tool execution requests, accounting their latency and errors in the metrics.
         Returns text content with query results.
         """
+        started_at = time.time()
+        started = time.monotonic()
+        session_id = session_key()
+        result = error = None
+        try:
+            result = await call_tool(name, arguments)
+            return result
+        except BaseException as e:
+            error = str(e) or type(e).__name__
+            raise
+        finally:
+            seconds = time.monotonic() - started
+            # Unknown tool names would each make a new series
+            tool = name if name in BUILTIN_TOOLS or name in templates else "unknown"
+            monitor.tool_call(tool, seconds, error is not None)
+            size = result_size(result) if result is not None else None
+            # Stateless requests each have a session of their own, not worth accounting
+            if isinstance(session_id, str) or server.request_context.request is None:
+                sessions.record(session_id, seconds, size, error is not None)
+            if capture is not None:
+                capture.record(
+                    name,
+                    arguments,
+                    session_label(session_id),
+                    started_at,
+                    seconds,
+                    size,
+                    error,
+                )
+
+    async def call_tool(
+        name: str, arguments: dict | None
+    ):
         logger.info(f"Calling tool: {name}::{arguments}")
         try:
+            # The first calls wait for the database connections opened in the background
+            await startup.wait()
+
             if name == "query":
                 if arguments is None:
                     return [
@@ -132,18 +971,161 @@ def build_application(
                     ]
                 
                 query_sql = arguments["query"]
-                formatted_output, structured_data = db_client.query_with_data(query_sql)
-                
-                row_count = len(structured_data.get("rows", []))
+                database, client, client_executor = route(arguments)
+                # Open result cursors are accounted to the calling session
+                session_id = session_key()
+                # Run on a worker thread so a slow scan doesn't block other sessions
+                result = await run_query(
+                    functools.partial(client.query_result, profile=arguments.get("profile", False)),
+                    query_sql,
+                    session_id,
+                    arguments.get("format"),
+                    arguments.get("params"),
+                    timeout=arguments.get("timeout"),
+                    executor=client_executor,
+                )
+                result = routed(database, result)
                 
-                logger.info(f"Query executed: {row_count} rows found")
+                logger.info(f"Query executed: {result.row_count} rows found")
                 
-                return [
+                return tool_result(result)
+
+            if name == "query_next_page":
+                if arguments is None or "cursor" not in arguments:
+                    return [
+                        types.TextContent(type="text", text="Error: No cursor provided")
+                    ]
+
+                database, _, cursor = arguments["cursor"].rpartition("/")
+                database, client, client_executor = route({"database": database})
+                result = await run_query(client.fetch_page, cursor, executor=client_executor)
+                return tool_result(routed(database, result))
+
+            if name == "list_tables":
+                arguments = arguments or {}
+                if arguments.get("database") in executors:
+                    # A database the server serves rather than a DuckDB catalog to filter on
+                    _, client, client_executor = route(arguments)
+                    result = await client_executor.run(client.list_tables, None, arguments.get("schema"))
+                else:
+                    result = await executor.run(
+                        clients[DEFAULT_DATABASE].list_tables, arguments.get("database"), arguments.get("schema")
+                    )
+                text = f"Tabelle e viste: {result.row_count}.\n\n{result.formatted}"
+                content = [types.TextContent(type="text", text=text)]
+                if structured_content:
+                    return content, result.structured()
+                return content
+
+            if name == "describe_table":
+                if arguments is None or "table" not in arguments:
+                    return [
+                        types.TextContent(type="text", text="Error: No table provided")
+                    ]
+
+                _, client, client_executor = route(arguments)
+                table, result = await run_query(
+                    client.describe_table,
+                    arguments["table"],
+                    arguments.get("statistics", True),
+                    executor=client_executor,
+                )
+                summary = f"Tabella {table.qualified_name} ({table.kind}"
+                if table.estimated_rows is not None:
+                    summary += f", circa {table.estimated_rows} righe"
+                summary += ")"
+                if table.comment:
+                    summary += f": {table.comment}"
+                content = [types.TextContent(type="text", text=f"{summary}\n\n{result.formatted}")]
+                if structured_content:
+                    return content, result.structured()
+                return content
+
+            if name == "export_query":
+                if arguments is None or "query" not in arguments:
+                    return [
+                        types.TextContent(type="text", text="Error: No query provided")
+                    ]
+
+                _, client, client_executor = route(arguments)
+                exported = await run_query(
+                    client.export,
+                    arguments["query"],
+                    arguments.get("format", "parquet"),
+                    timeout=arguments.get("timeout"),
+                    executor=client_executor,
+                )
+                await server.request_context.session.send_resource_list_changed()
+
+                metadata = exported.metadata()
+                content = [
                     types.TextContent(
                         type="text",
-                        text=f"Risultati della query: {row_count} righe trovate.\n\n{formatted_output}"
-                    )
+                        text=(
+                            f"Risultati esportati: {exported.row_count} righe in {exported.uri}.\n\n"
+                            f"{json.dumps(metadata, indent=2)}"
+                        ),
+                    ),
+                    types.ResourceLink(
+                        type="resource_link",
+                        uri=exported.uri,
+                        name=exported.result_id,
+                        mimeType=exported.mime_type,
+                        size=exported.size,
+                    ),
                 ]
+                if structured_content:
+                    return content, metadata
+                return content
+
+            if name == "explain":
+                if arguments is None or "query" not in arguments:
+                    return [
+                        types.TextContent(type="text", text="Error: No query provided")
+                    ]
+
+                _, client, client_executor = route(arguments)
+                profile = await run_query(
+                    client.explain,
+                    arguments["query"],
+                    arguments.get("analyze", True),
+                    timeout=arguments.get("timeout"),
+                    executor=client_executor,
+                )
+                content = [types.TextContent(type="text", text=profile_text(profile))]
+                if structured_content:
+                    return content, profile.as_dict()
+                return content
+
+            if name == "advise_indexes":
+                arguments = arguments or {}
+                _, client, client_executor = route(arguments)
+                report = await run_query(
+                    client.advise,
+                    arguments.get("min_queries"),
+                    arguments.get("replay", True),
+                    arguments.get("apply", False),
+                    timeout=arguments.get("timeout"),
+                    executor=client_executor,
+                )
+                content = [types.TextContent(type="text", text=advisor_text(report))]
+                if structured_content:
+                    return content, {"recommendations": [r.as_dict() for r in report]}
+                return content
+
+            if name in templates:
+                template = templates[name]
+                values = template.bind(arguments)
+                database, client, client_executor = route({"database": template.database})
+                result = await run_query(
+                    functools.partial(client.query_result, use_cache=template.cache),
+                    template.query,
+                    session_key(),
+                    None,
+                    values,
+                    executor=client_executor,
+                )
+                return tool_result(routed(database, result))
 
             return [
                 types.TextContent(type="text", text=f"Unsupported tool: {name}")
@@ -157,7 +1139,7 @@ def build_application(
         server_name="medicair",
         server_version=SERVER_VERSION,
         capabilities=server.get_capabilities(
-            notification_options=NotificationOptions(),
+            notification_options=NotificationOptions(resources_changed=True),
             experimental_capabilities={},
         ),
     )
@@ -0,0 +1,75 @@
+import threading
+import time
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Hashable
+
+logger = logging.getLogger("mcp_server_medicair")
+
+
+@dataclass
+class SessionUsage:
+    """What one MCP session has used so far"""
+
+    session_id: Hashable
+    created_at: float = field(default_factory=time.time)
+    last_seen: float = field(default_factory=time.monotonic)
+    calls: int = 0
+    errors: int = 0
+    # Time spent in its tool calls, queueing included
+    seconds: float = 0.0
+    # Bytes of text and structured content returned to it
+    bytes: int = 0
+
+
+class SessionRegistry:
+    """
+    Per-session accounting of the long-lived sessions (stdio, and `stream`
+    with `--stateful`): tool calls, errors, time and bytes. A session idle for
+    `idle_timeout` seconds is forgotten and `on_close` is called with its id,
+    to release what it still holds such as open result cursors.
+    """
+
+    def __init__(self, idle_timeout: float | None, on_close: Callable[[Hashable], None]):
+        self.idle_timeout = idle_timeout
+        self.on_close = on_close
+        self._sessions: dict[Hashable, SessionUsage] = {}
+        self._lock = threading.Lock()
+
+    def record(self, session_id: Hashable, seconds: float, size: int | None, failed: bool):
+        with self._lock:
+            usage = self._sessions.get(session_id)
+            if usage is None:
+                usage = self._sessions[session_id] = SessionUsage(session_id)
+            usage.last_seen = time.monotonic()
+            usage.calls += 1
+            usage.errors += failed
+            usage.seconds += seconds
+            usage.bytes += size or 0
+        self.sweep()
+
+    def sweep(self):
+        """Forget the sessions idle for longer than `idle_timeout`"""
+        if self.idle_timeout is None:
+            return
+        deadline = time.monotonic() - self.idle_timeout
+        with self._lock:
+            idle = [s for s, usage in self._sessions.items() if usage.last_seen < deadline]
+            for session_id in idle:
+                del self._sessions[session_id]
+        for session_id in idle:
+            logger.info(f"💤 Session {str(session_id)[:8]}… idle, releasing its resources")
+            try:
+                self.on_close(session_id)
+            except Exception as e:
+                logger.warning(f"⚠️ Could not release the resources of an idle session: {e}")
+
+    def sessions(self) -> list[SessionUsage]:
+        self.sweep()
+        with self._lock:
+            return list(self._sessions.values())
+
+    def __len__(self) -> int:
+        self.sweep()
+        with self._lock:
+            return len(self._sessions)
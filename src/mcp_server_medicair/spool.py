@@ -0,0 +1,153 @@
+import atexit
+import os
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+
+logger = logging.getLogger("mcp_server_medicair")
+
+SPOOL_URI_PREFIX = "medicair://results/"
+
+# File extension and MIME type of each export format
+EXPORT_FORMATS = {
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+    "arrow": (".arrow", "application/vnd.apache.arrow.file"),
+}
+
+
+@dataclass
+class SpooledResult:
+    """A query result exported to a file in the spool directory"""
+
+    result_id: str
+    path: str
+    export_format: str
+    query: str
+    schema: list[dict]
+    row_count: int
+    size: int
+    created_at: float
+
+    @property
+    def uri(self) -> str:
+        return f"{SPOOL_URI_PREFIX}{self.result_id}"
+
+    @property
+    def mime_type(self) -> str:
+        return EXPORT_FORMATS[self.export_format][1]
+
+    def metadata(self) -> dict:
+        return {
+            "uri": self.uri,
+            "format": self.export_format,
+            "mimeType": self.mime_type,
+            "schema": self.schema,
+            "rowCount": self.row_count,
+            "bytes": self.size,
+        }
+
+
+class ResultSpool:
+    """
+    Server-managed directory of exported query results.
+    The oldest exports are deleted once the directory grows past `max_bytes`.
+    Without an explicit directory a temporary one is created and removed on close.
+    """
+
+    def __init__(self, directory: str | None, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._owns_directory = directory is None
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix="medicair-spool-")
+            atexit.register(self.close)
+        else:
+            os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        # result_id -> SpooledResult, oldest first
+        self._results: OrderedDict[str, SpooledResult] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        logger.info(f"Result spool directory: {directory}")
+
+    def new_path(self, export_format: str) -> tuple[str, str]:
+        """Reserve a result id and the file path to write it to"""
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(
+                f"Unknown export format `{export_format}`, expected one of: {', '.join(EXPORT_FORMATS)}"
+            )
+        result_id = secrets.token_urlsafe(12) + EXPORT_FORMATS[export_format][0]
+        return result_id, os.path.join(self.directory, result_id)
+
+    def add(
+        self,
+        result_id: str,
+        path: str,
+        export_format: str,
+        query: str,
+        schema: list[dict],
+        row_count: int,
+    ) -> SpooledResult:
+        """Register a written file and evict older exports to stay within the byte budget"""
+        size = os.path.getsize(path)
+        if size > self.max_bytes:
+            os.remove(path)
+            raise ValueError(
+                f"Exported result is {size} bytes, larger than the whole spool ({self.max_bytes} bytes)"
+            )
+        result = SpooledResult(
+            result_id=result_id,
+            path=path,
+            export_format=export_format,
+            query=query,
+            schema=schema,
+            row_count=row_count,
+            size=size,
+            created_at=time.time(),
+        )
+        with self._lock:
+            while self._results and self._bytes + size > self.max_bytes:
+                _, oldest = self._results.popitem(last=False)
+                self._remove_file(oldest)
+            self._results[result_id] = result
+            self._bytes += size
+        return result
+
+    def _remove_file(self, result: SpooledResult):
+        logger.info(f"🧹 Evicting spooled result {result.result_id} ({result.size} bytes)")
+        self._bytes -= result.size
+        try:
+            os.remove(result.path)
+        except FileNotFoundError:
+            pass
+
+    def get(self, uri: str) -> SpooledResult:
+        result_id = uri[len(SPOOL_URI_PREFIX) :] if uri.startswith(SPOOL_URI_PREFIX) else None
+        with self._lock:
+            result = self._results.get(result_id) if result_id else None
+        if result is None:
+            raise ValueError(f"Unknown or evicted result: {uri}")
+        return result
+
+    def list(self) -> list[SpooledResult]:
+        with self._lock:
+            return list(self._results.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._results),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def close(self):
+        with self._lock:
+            self._results.clear()
+            self._bytes = 0
+        if self._owns_directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
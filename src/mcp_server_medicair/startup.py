@@ -0,0 +1,113 @@
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+import anyio
+import anyio.to_thread
+
+logger = logging.getLogger("mcp_server_medicair")
+
+
+class Startup:
+    """
+    Timeline of the server startup, relative to the first import of the
+    package: how long each phase took, when it began, and when milestones
+    such as the first `list_tools` were reached. The database connections are
+    set up by `start` in a background thread, so the MCP handshake doesn't
+    wait for them; calls that need a database `wait` for it instead.
+    """
+
+    def __init__(self, started_at: float | None = None):
+        # time.perf_counter() when the process started loading the server
+        self.started_at = time.perf_counter() if started_at is None else started_at
+        # (name, seconds since started_at, seconds, steps within the phase)
+        self.phases: list[tuple[str, float, float, dict[str, float]]] = []
+        # Milestone -> seconds since started_at, first occurrence only
+        self.events: dict[str, float] = {}
+        self.error: Exception | None = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    def add(self, name: str, started: float, seconds: float, steps: dict[str, float] | None = None):
+        with self._lock:
+            self.phases.append((name, started - self.started_at, seconds, dict(steps or {})))
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[dict[str, float]]:
+        """Time the block as a phase. The block can break it down in the yielded dict of step seconds"""
+        started = time.perf_counter()
+        steps: dict[str, float] = {}
+        try:
+            yield steps
+        finally:
+            self.add(name, started, time.perf_counter() - started, steps)
+
+    def mark(self, event: str):
+        with self._lock:
+            self.events.setdefault(event, time.perf_counter() - self.started_at)
+
+    def start(self, setup: Callable[[], None]):
+        """Run `setup` in a background thread, then log the startup report"""
+
+        def run():
+            try:
+                setup()
+            except Exception as e:
+                self.error = e
+                logger.error(f"❌ Startup failed: {e}")
+            finally:
+                self.mark("ready" if self.error is None else "failed")
+                self._done.set()
+                logger.info(f"⏱️ {self.report()}")
+
+        threading.Thread(target=run, name="medicair-startup", daemon=True).start()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def ready(self) -> bool:
+        return self.done and self.error is None
+
+    async def wait(self):
+        """Wait for the background setup to finish, raising ValueError if it failed"""
+        if not self._done.is_set():
+            await anyio.to_thread.run_sync(self._done.wait, abandon_on_cancel=True)
+        if self.error is not None:
+            raise ValueError(f"Database connection failed: {self.error}")
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            phases = list(self.phases)
+            events = dict(self.events)
+        return {
+            "status": "ready" if self.ready else "failed" if self.done else "starting",
+            "error": None if self.error is None else str(self.error),
+            "phases": [
+                {
+                    "name": name,
+                    "startMs": round(offset * 1000, 3),
+                    "ms": round(seconds * 1000, 3),
+                    **({"steps": {k: round(v * 1000, 3) for k, v in steps.items()}} if steps else {}),
+                }
+                for name, offset, seconds, steps in phases
+            ],
+            "events": {name: round(offset * 1000, 3) for name, offset in events.items()},
+        }
+
+    def report(self) -> str:
+        """One line summary of where the startup time went"""
+        with self._lock:
+            phases = list(self.phases)
+            events = dict(self.events)
+        parts = []
+        for name, _, seconds, steps in phases:
+            part = f"{name} {seconds * 1000:.0f} ms"
+            if steps:
+                part += " (" + ", ".join(f"{k} {v * 1000:.0f} ms" for k, v in steps.items()) + ")"
+            parts.append(part)
+        milestones = ", ".join(f"{name} at {offset * 1000:.0f} ms" for name, offset in events.items())
+        return "Startup: " + "; ".join(parts) + (f". {milestones}" if milestones else "")
@@ -0,0 +1,469 @@
+import copy
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import logging
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, ContextManager, Hashable
+
+from .cache import quote_identifier
+
+if TYPE_CHECKING:
+    import duckdb
+
+logger = logging.getLogger("mcp_server_medicair")
+
+
+@dataclass
+class SummaryDefinition:
+    """
+    A materialized summary: the aggregate `query` is precomputed into a table
+    named `name`, and queries with the same aggregate (optionally filtered on
+    its group keys, sorted or limited) are answered from that table.
+    """
+
+    name: str
+    query: str
+    description: str = ""
+    # Seconds after which the summary is rebuilt even if the database version
+    # did not change (remote databases); the server default if not set
+    refresh_interval: float | None = None
+
+
+# Summaries for the recurring questions of the QUICK REFERENCE in prompt.py.
+# Definitions whose tables or columns don't exist in the database are skipped.
+DEFAULT_SUMMARIES = [
+    SummaryDefinition(
+        name="riepilogo_uscite_mensili",
+        description="Trend uscite: quantità scaricata per articolo, anno e mese",
+        query="""
+            SELECT "Codice articolo", "Anno", "Mese", sum("Quantità") AS uscite
+            FROM uscite_tot
+            GROUP BY "Codice articolo", "Anno", "Mese"
+        """,
+    ),
+    SummaryDefinition(
+        name="riepilogo_giacenze",
+        description="Stock: giacenza totale per articolo e deposito",
+        query="""
+            SELECT "Codice articolo", "Deposito", sum("Giacenza") AS giacenza
+            FROM giacenze
+            GROUP BY "Codice articolo", "Deposito"
+        """,
+    ),
+    SummaryDefinition(
+        name="riepilogo_macchine_da_lavorare",
+        description="Macchine da lavorare in laboratorio per macrogestione",
+        query="""
+            SELECT "MACROGESTIONE", sum("MACCHINE DA LAVORARE") AS macchine_da_lavorare
+            FROM laboratorio
+            GROUP BY "MACROGESTIONE"
+        """,
+    ),
+    SummaryDefinition(
+        name="riepilogo_tempi_riparazione",
+        description="Tempo di riparazione per matricola: prima e ultima lavorazione",
+        query="""
+            SELECT "Matricola", min("Data inizio") AS inizio, max("Data fine") AS fine, count(*) AS lavorazioni
+            FROM inbound_garage
+            GROUP BY "Matricola"
+        """,
+    ),
+]
+
+
+def load_definitions(path: str) -> list[SummaryDefinition]:
+    """Read summary definitions from a JSON list of {name, query, description, refresh_interval}"""
+    with open(path) as f:
+        entries = json.load(f)
+    if not isinstance(entries, list):
+        raise ValueError(f"{path} must contain a JSON list of summary definitions")
+    return [SummaryDefinition(**entry) for entry in entries]
+
+
+# Node fields that must be identical for a query to be answered by a summary
+_MATCHED_FIELDS = (
+    "from_table",
+    "group_expressions",
+    "group_sets",
+    "having",
+    "aggregate_handling",
+    "qualify",
+    "sample",
+    "cte_map",
+)
+# Identifiers are case insensitive in DuckDB, output aliases are not
+_IDENTIFIER_FIELDS = ("column_names", "table_name", "schema_name", "catalog_name")
+
+
+def _canonical(node):
+    """Copy of an AST node without source positions and with lowercased identifiers"""
+    if isinstance(node, dict):
+        out = {}
+        for key, value in node.items():
+            if key == "query_location":
+                continue
+            if key in _IDENTIFIER_FIELDS:
+                value = [v.lower() for v in value] if isinstance(value, list) else value.lower()
+            out[key] = _canonical(value)
+        return out
+    if isinstance(node, list):
+        return [_canonical(v) for v in node]
+    return node
+
+
+def _canonical_select(node: dict) -> dict:
+    """
+    Canonical form of a SELECT node, with positional GROUP BY items (`GROUP BY 1, 2`)
+    replaced by the select list expressions they refer to
+    """
+    canonical = _canonical(node)
+    select_list = canonical["select_list"]
+    group_expressions = []
+    for expression in canonical.get("group_expressions") or []:
+        value = expression.get("value", {}) if expression.get("class") == "CONSTANT" else {}
+        position = value.get("value")
+        if value.get("type", {}).get("id") == "INTEGER" and 1 <= position <= len(select_list):
+            expression = {**select_list[position - 1], "alias": ""}
+        group_expressions.append(expression)
+    canonical["group_expressions"] = group_expressions
+    return canonical
+
+
+def _without_aliases(select_list: list[dict]) -> list[dict]:
+    return [{**item, "alias": ""} for item in select_list]
+
+
+def _walk(node):
+    yield node
+    if isinstance(node, dict):
+        for value in node.values():
+            yield from _walk(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk(value)
+
+
+def _source_tables(from_table: dict) -> set[str]:
+    return {
+        n["table_name"].lower()
+        for n in _walk(from_table)
+        if isinstance(n, dict) and n.get("type") == "BASE_TABLE"
+    }
+
+
+@dataclass
+class _Summary:
+    definition: SummaryDefinition
+    node: dict
+    canonical: dict
+    # Output columns that are plain group keys: filters on them can be applied to the summary
+    group_keys: set[str]
+    output_names: set[str]
+    sources: set[str]
+    built_version: Hashable = None
+    built_at: float = 0.0
+    row_count: int = 0
+    # Column names of the built summary table
+    columns: list[str] = field(default_factory=list)
+    # Names of the summary's result columns without their aliases, which for
+    # plain column references is the column's name in the catalog
+    unaliased: list[str] = field(default_factory=list)
+    failed_version: Hashable = None
+    error: str | None = None
+    ready: bool = False
+
+
+class SummaryStore:
+    """
+    Materialized summary tables, kept in a private in-memory DuckDB database.
+    Summaries are built from the main database through Parquet files (which
+    works for read-only, MotherDuck and S3 databases alike) and rebuilt in the
+    background when the database version changes or their refresh interval
+    elapses. Until a summary is rebuilt, matching queries run on the source tables.
+    """
+
+    def __init__(
+        self,
+        definitions: list[SummaryDefinition],
+        connection: Callable[[], ContextManager["duckdb.DuckDBPyConnection"]],
+        version: Callable[[], Hashable],
+        refresh_interval: float | None = None,
+        check_interval: float = 5.0,
+    ):
+        import duckdb
+
+        self._connection = connection
+        self._version = version
+        self.refresh_interval = refresh_interval
+        self.check_interval = check_interval
+        self._db = duckdb.connect(":memory:")
+        self._directory = tempfile.mkdtemp(prefix="medicair-summaries-")
+        self._summaries: dict[str, _Summary] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        parser = self._db.cursor()
+        self._template = self._parse(parser, 'SELECT "column" AS "alias" FROM "__summary__"')
+        for definition in definitions:
+            try:
+                node = self._parse(parser, definition.query)
+                if node is None or node["type"] != "SELECT_NODE" or node["modifiers"]:
+                    raise ValueError("must be a single SELECT without ORDER BY or LIMIT")
+            except Exception as e:
+                logger.warning(f"⚠️ Ignoring summary `{definition.name}`: {e}")
+                continue
+            canonical = _canonical_select(node)
+            output_names = set()
+            group_keys = set()
+            for item, canonical_item in zip(node["select_list"], canonical["select_list"]):
+                if item["alias"]:
+                    output_names.add(item["alias"].lower())
+                elif item["class"] == "COLUMN_REF":
+                    name = item["column_names"][-1].lower()
+                    output_names.add(name)
+                    if canonical_item in canonical["group_expressions"]:
+                        group_keys.add(name)
+            self._summaries[definition.name] = _Summary(
+                definition=definition,
+                node=node,
+                canonical=canonical,
+                group_keys=group_keys,
+                output_names=output_names,
+                sources=_source_tables(node["from_table"]),
+            )
+        parser.close()
+
+    @staticmethod
+    def _parse(conn: "duckdb.DuckDBPyConnection", sql: str) -> dict | None:
+        """AST of a single statement query, None if it can't be parsed"""
+        serialized = json.loads(conn.execute("SELECT json_serialize_sql(?)", [sql]).fetchone()[0])
+        if serialized.get("error") or len(serialized["statements"]) != 1:
+            return None
+        return serialized["statements"][0]["node"]
+
+    # Building
+
+    def _is_stale(self, summary: _Summary, version: Hashable, now: float) -> bool:
+        if not summary.ready or summary.built_version != version:
+            return summary.failed_version != version
+        interval = summary.definition.refresh_interval or self.refresh_interval
+        return bool(interval) and now - summary.built_at > interval
+
+    def _build(self, summary: _Summary, version: Hashable):
+        name = summary.definition.name
+        path = os.path.join(self._directory, f"{name}.parquet")
+        path_literal = "'" + path.replace("'", "''") + "'"
+        started = time.monotonic()
+        without_aliases = {**summary.node, "select_list": _without_aliases(summary.node["select_list"])}
+        statement = {"error": False, "statements": [{"node": without_aliases, "named_param_map": []}]}
+        cursor = self._db.cursor()
+        try:
+            unaliased_query = cursor.execute("SELECT json_deserialize_sql(?)", [json.dumps(statement)]).fetchone()[0]
+        finally:
+            cursor.close()
+        with self._connection() as conn:
+            columns = conn.execute(f"DESCRIBE {summary.definition.query}").fetchall()
+            unaliased = [c[0] for c in conn.execute(f"DESCRIBE {unaliased_query}").fetchall()]
+            # Parquet has no 128-bit integers or bit strings: go through text to stay exact
+            exported = ", ".join(
+                f"{quote_identifier(c[0])}::VARCHAR AS {quote_identifier(c[0])}"
+                if "HUGEINT" in c[1] or c[1] == "BIT"
+                else quote_identifier(c[0])
+                for c in columns
+            )
+            conn.execute(
+                f"COPY (SELECT {exported} FROM ({summary.definition.query})) TO {path_literal} (FORMAT parquet)"
+            )
+
+        # Cast every column back to the type the source query produces
+        restored = ", ".join(f"{quote_identifier(c[0])}::{c[1]} AS {quote_identifier(c[0])}" for c in columns)
+        cursor = self._db.cursor()
+        try:
+            cursor.execute(
+                f"CREATE OR REPLACE TABLE {quote_identifier(name)} AS SELECT {restored} FROM read_parquet({path_literal})"
+            )
+            row_count = cursor.execute(f"SELECT count(*) FROM {quote_identifier(name)}").fetchone()[0]
+        finally:
+            cursor.close()
+            os.remove(path)
+
+        with self._lock:
+            summary.ready = True
+            summary.built_version = version
+            summary.built_at = time.monotonic()
+            summary.row_count = row_count
+            summary.columns = [c[0] for c in columns]
+            summary.unaliased = unaliased
+            summary.error = None
+        logger.info(
+            f"📐 Summary `{name}` built: {row_count} rows in {time.monotonic() - started:.2f} s"
+        )
+
+    def refresh(self, force: bool = False):
+        """Rebuild the summaries that are missing or stale"""
+        version = self._version()
+        now = time.monotonic()
+        for summary in list(self._summaries.values()):
+            if not force and not self._is_stale(summary, version, now):
+                continue
+            try:
+                self._build(summary, version)
+            except Exception as e:
+                with self._lock:
+                    # Retried once the database changes
+                    summary.failed_version = version
+                    summary.error = str(e)
+                logger.warning(f"⚠️ Could not build summary `{summary.definition.name}`: {e}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"⚠️ Summary refresh failed: {e}")
+            self._stop.wait(self.check_interval)
+
+    def start(self):
+        """Build the summaries and keep them fresh on a background thread"""
+        if self._summaries and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="medicair-summaries", daemon=True)
+            self._thread.start()
+
+    # Answering queries
+
+    def rewrite(self, query: str) -> str | None:
+        """
+        SQL answering `query` from a summary table, or None if no fresh summary matches.
+        A query matches a summary when it computes the same aggregate, possibly
+        with a WHERE clause on the summary's group keys, ORDER BY its output
+        columns and LIMIT/OFFSET.
+        """
+        import duckdb
+
+        lowered = query.lower()
+        candidates = [
+            s for s in self._summaries.values() if any(t in lowered for t in s.sources)
+        ]
+        if not candidates:
+            return None
+
+        version = self._version()
+        cursor = self._db.cursor()
+        try:
+            node = self._parse(cursor, query)
+            if node is None or node.get("type") != "SELECT_NODE":
+                return None
+            canonical = _canonical_select(node)
+            for summary in candidates:
+                with self._lock:
+                    fresh = summary.ready and summary.built_version == version
+                if not fresh or not self._matches(summary, canonical):
+                    continue
+                rewritten = copy.deepcopy(self._template)
+                rewritten["from_table"]["table_name"] = summary.definition.name
+                # Read the summary columns under the names the query's own columns would have
+                rewritten["select_list"] = [
+                    {
+                        **self._template["select_list"][0],
+                        "column_names": [column],
+                        "alias": self._output_name(cursor, summary, i, item),
+                    }
+                    for i, (column, item) in enumerate(zip(summary.columns, node["select_list"]))
+                ]
+                rewritten["where_clause"] = node["where_clause"]
+                rewritten["modifiers"] = node["modifiers"]
+                statement = {"error": False, "statements": [{"node": rewritten, "named_param_map": []}]}
+                return cursor.execute(
+                    "SELECT json_deserialize_sql(?)", [json.dumps(statement)]
+                ).fetchone()[0]
+        except (duckdb.Error, ValueError) as e:
+            logger.debug(f"Could not match query against summaries: {e}")
+        finally:
+            cursor.close()
+        return None
+
+    def _output_name(self, cursor: "duckdb.DuckDBPyConnection", summary: _Summary, i: int, item: dict) -> str:
+        """
+        Name DuckDB gives the result column of the query's `i`-th select item:
+        its alias, the catalog name of a plain column reference, or else the
+        SQL text of the expression as the query wrote it
+        """
+        if item["alias"]:
+            return item["alias"]
+        if item["class"] == "COLUMN_REF":
+            return summary.unaliased[i]
+        select = {**self._template, "select_list": [{**item, "alias": ""}]}
+        statement = {"error": False, "statements": [{"node": select, "named_param_map": []}]}
+        sql = cursor.execute("SELECT json_deserialize_sql(?)", [json.dumps(statement)]).fetchone()[0]
+        prefix, suffix = "SELECT ", " FROM __summary__"
+        if not (sql.startswith(prefix) and sql.endswith(suffix)):
+            raise ValueError(f"Unexpected SQL text of a summary output column: {sql}")
+        return sql[len(prefix) : -len(suffix)]
+
+    @staticmethod
+    def _matches(summary: _Summary, canonical: dict) -> bool:
+        pattern = summary.canonical
+        if any(canonical.get(f) != pattern.get(f) for f in _MATCHED_FIELDS):
+            return False
+        if _without_aliases(canonical["select_list"]) != _without_aliases(pattern["select_list"]):
+            return False
+
+        where = canonical.get("where_clause")
+        if where != pattern.get("where_clause"):
+            if pattern.get("where_clause") is not None:
+                return False
+            # Extra filters may only use the group keys, which the summary keeps
+            for n in _walk(where):
+                if not isinstance(n, dict):
+                    continue
+                if n.get("class") == "SUBQUERY":
+                    return False
+                if n.get("class") == "COLUMN_REF" and (
+                    len(n["column_names"]) != 1 or n["column_names"][0] not in summary.group_keys
+                ):
+                    return False
+
+        for modifier in canonical["modifiers"]:
+            if modifier["type"] == "LIMIT_MODIFIER":
+                continue
+            if modifier["type"] != "ORDER_MODIFIER":
+                return False
+            for order in modifier["orders"]:
+                expression = order["expression"]
+                if expression["class"] == "CONSTANT":
+                    continue
+                if expression["class"] != "COLUMN_REF" or len(expression["column_names"]) != 1:
+                    return False
+                if expression["column_names"][0] not in summary.output_names:
+                    return False
+        return True
+
+    def cursor(self) -> "duckdb.DuckDBPyConnection":
+        """A cursor on the summary database, to run rewritten queries on"""
+        return self._db.cursor()
+
+    def stats(self) -> list[dict]:
+        with self._lock:
+            return [
+                {
+                    "name": s.definition.name,
+                    "description": s.definition.description,
+                    "ready": s.ready,
+                    "rows": s.row_count,
+                    "age": time.monotonic() - s.built_at if s.ready else None,
+                    "error": s.error,
+                }
+                for s in self._summaries.values()
+            ]
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._db.close()
+        shutil.rmtree(self._directory, ignore_errors=True)
@@ -0,0 +1,171 @@
+import datetime
+import json
+import re
+import logging
+from dataclasses import dataclass, field
+from typing import Any
+
+logger = logging.getLogger("mcp_server_medicair")
+
+# Template parameter types: JSON Schema of the tool argument, and conversion of
+# the JSON value to the Python value rendered into the query
+_TYPES = {
+    "string": ({"type": "string"}, str),
+    "integer": ({"type": "integer"}, int),
+    "number": ({"type": "number"}, float),
+    "boolean": ({"type": "boolean"}, bool),
+    "date": ({"type": "string", "format": "date"}, datetime.date.fromisoformat),
+    "timestamp": ({"type": "string", "format": "date-time"}, datetime.datetime.fromisoformat),
+}
+
+_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+@dataclass
+class TemplateParameter:
+    """A `$name` placeholder of a query template"""
+
+    name: str
+    type: str = "string"
+    description: str = ""
+    required: bool = True
+    # Used when an optional parameter is omitted; NULL if not set
+    default: Any = None
+    # A list of values of `type`, e.g. for `IN (SELECT unnest($codici))`
+    array: bool = False
+
+    def __post_init__(self):
+        if not _NAME.match(self.name):
+            raise ValueError(f"Invalid template parameter name `{self.name}`")
+        if self.type not in _TYPES:
+            raise ValueError(
+                f"Unknown type `{self.type}` of parameter `{self.name}`, expected one of: {', '.join(_TYPES)}"
+            )
+
+    def json_schema(self) -> dict:
+        schema = dict(_TYPES[self.type][0])
+        if self.array:
+            schema = {"type": "array", "items": schema}
+        if self.description:
+            schema["description"] = self.description
+        if self.default is not None:
+            schema["default"] = self.default
+        return schema
+
+    def convert(self, value: Any) -> Any:
+        if value is None:
+            return None
+        convert = _TYPES[self.type][1]
+        try:
+            if self.array:
+                if not isinstance(value, list):
+                    raise TypeError("expected a list")
+                return [convert(v) for v in value]
+            return convert(value)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid value for parameter `{self.name}`: {e}")
+
+
+@dataclass
+class QueryTemplate:
+    """
+    A named lookup exposed as its own MCP tool. The query refers to its
+    parameters as `$name` and runs as a prepared statement cached per cursor.
+    """
+
+    name: str
+    description: str
+    query: str
+    parameters: list[TemplateParameter] = field(default_factory=list)
+    # Served database to run on, the default one if not set
+    database: str | None = None
+    # Whether results may be served from the result cache
+    cache: bool = True
+
+    def __post_init__(self):
+        if not _NAME.match(self.name):
+            raise ValueError(f"Invalid template name `{self.name}`")
+        self.parameters = [
+            p if isinstance(p, TemplateParameter) else TemplateParameter(**p) for p in self.parameters
+        ]
+
+    def input_schema(self) -> dict:
+        return {
+            "type": "object",
+            "properties": {p.name: p.json_schema() for p in self.parameters},
+            "required": [p.name for p in self.parameters if p.required],
+        }
+
+    def bind(self, arguments: dict | None) -> dict:
+        """Values of every parameter for one call, defaults filled in"""
+        arguments = arguments or {}
+        unknown = set(arguments) - {p.name for p in self.parameters}
+        if unknown:
+            raise ValueError(f"Unknown parameters for `{self.name}`: {', '.join(sorted(unknown))}")
+        values = {}
+        for parameter in self.parameters:
+            if parameter.name not in arguments and parameter.required:
+                raise ValueError(f"Missing parameter `{parameter.name}` for `{self.name}`")
+            values[parameter.name] = parameter.convert(arguments.get(parameter.name, parameter.default))
+        return values
+
+
+# Templates for the lookups that make up most MedicAir traffic (see the QUICK
+# REFERENCE in prompt.py). Templates that don't prepare against the database
+# (missing tables or columns) are not exposed.
+DEFAULT_TEMPLATES = [
+    QueryTemplate(
+        name="disponibilita_articolo",
+        description="Disponibilità in magazzino di un articolo: giacenze per deposito, nuove e usate, e ordini aperti.",
+        query="""
+            SELECT * FROM giacenze
+            WHERE "Codice articolo" = $codice_articolo
+        """,
+        parameters=[
+            TemplateParameter(
+                name="codice_articolo", description="Codice articolo, es. 'CPAP001'"
+            ),
+        ],
+    ),
+    QueryTemplate(
+        name="stato_matricola",
+        description="Dove si trova una matricola: fasi di lavorazione in inbound_garage, dalla più recente.",
+        query="""
+            SELECT * FROM inbound_garage
+            WHERE "Matricola" = $matricola
+            ORDER BY "Data inizio" DESC
+        """,
+        parameters=[
+            TemplateParameter(name="matricola", description="Matricola dell'apparecchiatura"),
+        ],
+        # Lavorazioni advance during the day
+        cache=False,
+    ),
+    QueryTemplate(
+        name="uscite_mensili_articolo",
+        description="Uscite di magazzino mensili di un articolo da uscite_tot, opzionalmente per un solo anno.",
+        query="""
+            SELECT "Anno", "Mese", sum("Quantità") AS uscite
+            FROM uscite_tot
+            WHERE "Codice articolo" = $codice_articolo
+              AND ($anno IS NULL OR "Anno" = $anno)
+            GROUP BY "Anno", "Mese"
+            ORDER BY "Anno", "Mese"
+        """,
+        parameters=[
+            TemplateParameter(name="codice_articolo", description="Codice articolo"),
+            TemplateParameter(
+                name="anno", type="integer", required=False, description="Anno, tutti se omesso"
+            ),
+        ],
+    ),
+]
+
+
+def load_templates(path: str) -> list[QueryTemplate]:
+    """Read query templates from a JSON list of {name, description, query, parameters, database, cache}"""
+    with open(path) as f:
+        entries = json.load(f)
+    if not isinstance(entries, list):
+        raise ValueError(f"{path} must contain a JSON list of query templates")
+    return [QueryTemplate(**entry) for entry in entries]
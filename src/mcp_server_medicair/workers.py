@@ -0,0 +1,184 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import logging
+from dataclasses import replace
+from typing import Callable
+
+from .configs import DEFAULT_WORKER_METRICS_INTERVAL, UVICORN_LOGGING_CONFIG
+from .metrics import Histogram
+from .routing import DatabaseConfig
+
+logger = logging.getLogger("mcp_server_medicair")
+
+# Environment variable handing the command line options to the `--workers` processes
+WORKER_OPTIONS_ENV = "MEDICAIR_WORKER_OPTIONS"
+
+# name -> (type, [(labels, value or Histogram)]), as collected by Monitor.families
+Families = dict[str, tuple[str, list[tuple[dict[str, str], "float | Histogram"]]]]
+
+
+def is_local_file(db_path: str) -> bool:
+    return not db_path.startswith(("md:", "s3://")) and db_path != ":memory:"
+
+
+def check_worker_options(
+    transport: str, stateful: bool, mirror: bool, db_path: str, read_only: bool, databases: list[DatabaseConfig]
+) -> tuple[bool, list[DatabaseConfig]]:
+    """
+    Validate the options of a `--workers` server and return `read_only` and
+    `databases` adjusted for it: every process opens the databases itself, so
+    local DuckDB files, which only one process can open for writing, are
+    opened read-only. MotherDuck and S3 databases get a connection per process.
+    """
+    if transport != "stream":
+        raise ValueError("--workers is only supported with the `stream` transport")
+    if stateful:
+        # Requests of a session can reach any process
+        raise ValueError("--workers requires stateless sessions, it can't be combined with --stateful")
+    if mirror:
+        raise ValueError("--workers can't be combined with --mirror, the processes would share the mirror directory")
+    if is_local_file(db_path):
+        read_only = True
+    databases = [
+        replace(database, read_only=True) if is_local_file(database.db_path) else database
+        for database in databases
+    ]
+    return read_only, databases
+
+
+def run_workers(options: dict, host: str, port: int, workers: int, shutdown_timeout: float | None):
+    """Serve the `stream` transport from `workers` processes, each building its own server from `options`"""
+    import uvicorn
+
+    metrics_dir = tempfile.mkdtemp(prefix="medicair-metrics-")
+    os.environ[WORKER_OPTIONS_ENV] = json.dumps({"options": options, "metrics_dir": metrics_dir})
+    logger.info(f"🧵 Starting {workers} worker processes, local database files are opened read-only")
+    try:
+        uvicorn.run(
+            "mcp_server_medicair:create_app",
+            factory=True,
+            host=host,
+            port=port,
+            workers=workers,
+            log_config=UVICORN_LOGGING_CONFIG,
+            timeout_graceful_shutdown=shutdown_timeout,
+        )
+    finally:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+def _dump_value(value) -> "float | dict":
+    if isinstance(value, Histogram):
+        return {"buckets": value.buckets, "counts": value.counts, "sum": value.sum, "count": value.count}
+    return value
+
+
+def _load_value(value) -> "float | Histogram":
+    if isinstance(value, dict):
+        return Histogram(tuple(value["buckets"]), value["counts"], value["sum"], value["count"])
+    return value
+
+
+def _add(total, value):
+    if total is None:
+        return value
+    if isinstance(value, Histogram):
+        counts = [a + b for a, b in zip(total.counts, value.counts)]
+        return Histogram(total.buckets, counts, total.sum + value.sum, total.count + value.count)
+    return total + value
+
+
+class WorkerMetrics:
+    """
+    Metrics of all the `--workers` processes. Each process writes a snapshot
+    of its own metrics to a shared directory every `interval` seconds, and
+    answers /metrics with the counters and histograms summed over every live
+    process, and the gauges of each process labelled with its `worker` pid.
+    """
+
+    def __init__(self, directory: str, interval: float = DEFAULT_WORKER_METRICS_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self.path = os.path.join(directory, f"{os.getpid()}.json")
+        self._stop = threading.Event()
+
+    def start(self, collect: Callable[[], Families]):
+        """Write the snapshot of `collect` until `stop`"""
+
+        def run():
+            while True:
+                try:
+                    self._write(collect())
+                except Exception as e:
+                    logger.warning(f"⚠️ Could not share the worker metrics: {e}")
+                if self._stop.wait(self.interval):
+                    return
+
+        threading.Thread(target=run, name="medicair-worker-metrics", daemon=True).start()
+
+    def stop(self):
+        """Stop sharing the metrics, so the other processes no longer count this one"""
+        self._stop.set()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _write(self, families: Families):
+        snapshot = {
+            name: [kind, [[labels, _dump_value(value)] for labels, value in samples]]
+            for name, (kind, samples) in families.items()
+        }
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(snapshot, f)
+        # Readers never see a partial snapshot
+        os.replace(temporary, self.path)
+
+    def _read_others(self) -> dict[int, Families]:
+        own = os.getpid()
+        # Snapshots a process stopped refreshing without removing them (killed)
+        stale = time.time() - 5 * self.interval
+        others = {}
+        for name in os.listdir(self.directory):
+            pid, _, extension = name.partition(".")
+            if extension != "json" or not pid.isdigit() or int(pid) == own:
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < stale:
+                    continue
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            others[int(pid)] = {
+                name: (kind, [(labels, _load_value(value)) for labels, value in samples])
+                for name, (kind, samples) in snapshot.items()
+            }
+        return others
+
+    def merge(self, own: Families) -> Families:
+        """The metrics of every live process, with `own`, the current ones of this process"""
+        processes = {os.getpid(): own, **self._read_others()}
+        # name -> (type, labels -> value)
+        merged: dict[str, tuple[str, dict[tuple, object]]] = {}
+        for pid, families in sorted(processes.items()):
+            for name, (kind, samples) in families.items():
+                series = merged.setdefault(name, (kind, {}))[1]
+                for labels, value in samples:
+                    if kind == "gauge":
+                        series[tuple({**labels, "worker": str(pid)}.items())] = value
+                    else:
+                        key = tuple(labels.items())
+                        series[key] = _add(series.get(key), value)
+        families = {
+            name: (kind, [(dict(key), value) for key, value in series.items()])
+            for name, (kind, series) in merged.items()
+        }
+        families["workers"] = ("gauge", [({}, len(processes))])
+        return families
@@ -0,0 +1,50 @@
+import duckdb
+import pytest
+
+from mcp_server_medicair.database import DatabaseClient
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def db_path(tmp_path) -> str:
+    """A small on-disk database: profiling and read-only mode behave differently than on `:memory:`"""
+    path = str(tmp_path / "medicair.duckdb")
+    with duckdb.connect(path) as conn:
+        conn.execute(
+            """
+            CREATE TABLE uscite (
+                "Articolo" VARCHAR,
+                "Magazzino" VARCHAR,
+                "Quantità" INTEGER,
+                "Data" DATE
+            )
+            """
+        )
+        conn.execute(
+            """
+            INSERT INTO uscite
+            SELECT 'ART' || (i % 20), 'MAG' || (i % 3), i % 7, DATE '2024-01-01' + (i % 365)::INTEGER
+            FROM range(5000) t(i)
+            """
+        )
+    return path
+
+
+@pytest.fixture
+def make_client(db_path):
+    """DatabaseClient on `db_path`, its pooled cursors closed after the test"""
+    clients = []
+
+    def make(**options) -> DatabaseClient:
+        options.setdefault("result_cache_size", 0)
+        client = DatabaseClient(db_path=options.pop("db_path", db_path), **options)
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.pool.close()
@@ -0,0 +1,90 @@
+import duckdb
+import pytest
+
+@pytest.fixture
+def giacenze(db_path) -> str:
+    """`db_path` with a table whose DDL a re-sort must keep"""
+    with duckdb.connect(db_path) as conn:
+        conn.execute(
+            """
+            CREATE TABLE giacenze (
+                id INTEGER PRIMARY KEY,
+                "Quantità" INTEGER NOT NULL DEFAULT 0 CHECK ("Quantità" >= 0),
+                "Lotto" VARCHAR
+            )
+            """
+        )
+        conn.execute("COMMENT ON TABLE giacenze IS 'Giacenze per lotto, l''ultima rilevazione'")
+        conn.execute('COMMENT ON COLUMN giacenze."Lotto" IS \'Codice del lotto\'')
+        conn.execute('CREATE INDEX giacenze_lotto ON giacenze("Lotto")')
+        conn.execute("INSERT INTO giacenze SELECT i, (i * 7919) % 5000, 'L' || i FROM range(5000) t(i)")
+        conn.execute("CREATE TABLE calcolate(v INTEGER, doppio INTEGER GENERATED ALWAYS AS (v * 2))")
+        conn.execute("INSERT INTO calcolate(v) SELECT range FROM range(100)")
+    return db_path
+
+
+def _record_ranges(client, table: str, column: str):
+    for i in range(3):
+        client.query_result(f'SELECT count(*) FROM {table} WHERE "{column}" BETWEEN {i * 100} AND {i * 100 + 50}')
+
+
+def test_advisor_is_off_by_default(make_client):
+    client = make_client()
+    assert client.advisor is None
+    with pytest.raises(ValueError, match="--advisor"):
+        client.advise()
+
+
+def test_records_the_strongest_filter_of_each_column(make_client):
+    client = make_client(advisor=True)
+    client.query_result("""SELECT * FROM uscite WHERE "Articolo" = 'ART1' AND "Quantità" > 3""")
+    client.query_result("""SELECT * FROM uscite u WHERE u."Articolo" IN ('ART1', 'ART2') AND "Articolo" > 'A'""")
+    client.query_result("""WITH uscite AS (SELECT 1 AS "Articolo") SELECT * FROM uscite WHERE "Articolo" = 1""")
+    usage = {(u.column, u.equality, u.range) for u in client.advisor.usage()}
+    assert usage == {("Articolo", 2, 0), ("Quantità", 0, 1)}
+
+
+def test_sort_keeps_the_table_definition(make_client, giacenze):
+    client = make_client(advisor=True)
+    _record_ranges(client, "giacenze", "Quantità")
+    with client._connection() as conn:
+        ddl = conn.execute("SELECT sql FROM duckdb_tables() WHERE table_name = 'giacenze'").fetchone()[0]
+        (proposal,) = client.advisor.advise(conn, min_queries=1, replay=False)
+        assert proposal.kind == "sort"
+        client.advisor.apply(conn, proposal)
+        assert proposal.applied
+        assert conn.execute("SELECT current_database(), current_schema()").fetchone() == ("medicair", "main")
+        assert conn.execute(
+            "SELECT sql, comment FROM duckdb_tables() WHERE table_name = 'giacenze'"
+        ).fetchone() == (ddl, "Giacenze per lotto, l'ultima rilevazione")
+        assert conn.execute(
+            "SELECT column_name, comment FROM duckdb_columns() WHERE table_name = 'giacenze' AND comment IS NOT NULL"
+        ).fetchall() == [("Lotto", "Codice del lotto")]
+        assert conn.execute("SELECT index_name FROM duckdb_indexes()").fetchall() == [("giacenze_lotto",)]
+        quantities = [r[0] for r in conn.execute('SELECT "Quantità" FROM giacenze').fetchall()]
+        assert quantities == sorted(quantities) and len(quantities) == 5000
+        assert conn.execute("SELECT count(*) FROM duckdb_tables() WHERE temporary").fetchone() == (0,)
+        with pytest.raises(duckdb.ConstraintException):
+            conn.execute("INSERT INTO giacenze VALUES (1, 1, 'L1')")
+
+
+def test_failed_sort_leaves_the_table_untouched(make_client, giacenze):
+    client = make_client(advisor=True)
+    _record_ranges(client, "calcolate", "v")
+    with client._connection() as conn:
+        (proposal,) = client.advisor.advise(conn, min_queries=1, replay=False)
+        with pytest.raises(duckdb.BinderException, match="generated column"):
+            client.advisor.apply(conn, proposal)
+        assert not proposal.applied
+        assert conn.execute("SELECT count(*), sum(doppio) FROM calcolate").fetchone() == (100, 9900)
+        assert conn.execute("SELECT count(*) FROM duckdb_tables() WHERE temporary").fetchone() == (0,)
+
+
+def test_index_proposal_is_replayed(make_client):
+    client = make_client(advisor=True)
+    for article in ("ART1", "ART2", "ART3"):
+        client.query_result(f"""SELECT count(*) FROM uscite WHERE "Articolo" = '{article}'""")
+    (proposal,) = client.advise(min_queries=1)
+    assert proposal.kind == "index"
+    assert proposal.replayed_rows == 5000
+    assert proposal.before_ms is not None and proposal.after_ms is not None
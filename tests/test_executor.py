@@ -0,0 +1,42 @@
+import threading
+
+import anyio
+import pytest
+
+from mcp_server_medicair.executor import QueryExecutor
+
+
+@pytest.mark.anyio
+async def test_run_returns_the_result_of_the_worker_thread():
+    executor = QueryExecutor(max_workers=2, max_queue=0)
+    assert await executor.run(lambda a, b: a + b, 1, 2) == 3
+    assert executor.in_flight == 0
+
+
+@pytest.mark.anyio
+async def test_calls_beyond_workers_and_queue_are_rejected():
+    executor = QueryExecutor(max_workers=1, max_queue=0)
+    release = threading.Event()
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(executor.run, release.wait)
+        await anyio.sleep(0.05)
+        with pytest.raises(ValueError, match="Server busy"):
+            await executor.run(lambda: None)
+        release.set()
+    assert executor.in_flight == 0
+
+
+@pytest.mark.anyio
+async def test_cancelled_call_returns_right_away_and_calls_on_cancel():
+    executor = QueryExecutor(max_workers=1, max_queue=0)
+    release = threading.Event()
+    cancelled = []
+
+    def on_cancel():
+        cancelled.append(True)
+        release.set()
+
+    with anyio.move_on_after(0.1):
+        await executor.run(release.wait, on_cancel=on_cancel)
+    assert cancelled == [True]
+    assert executor.in_flight == 0
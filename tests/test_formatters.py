@@ -0,0 +1,53 @@
+import datetime
+from decimal import Decimal
+
+import pytest
+from tabulate import tabulate
+
+from mcp_server_medicair.formatters import render, render_csv, render_markdown, render_pretty, render_tsv
+
+TABLES = {
+    "numbers": (["id", "quantita"], ["INTEGER", "DOUBLE"], [(1, 2.5), (22, -3.0), (333, None)]),
+    "text": (["articolo"], ["VARCHAR"], [("ART1",), ("  spazi  ",), ("",), (None,)]),
+    "unicode": (["descrizione"], ["VARCHAR"], [("Quantità",), ("Città €",), ("東京",)]),
+    "multiline": (["nota", "n"], ["VARCHAR", "INTEGER"], [("prima\nseconda", 1), ("x", 2)]),
+    "mixed": (
+        ["data", "importo", "flag", "blob"],
+        ["DATE", "DECIMAL(10,2)", "BOOLEAN", "BLOB"],
+        [(datetime.date(2024, 1, 31), Decimal("12.50"), True, b"abc"), (None, Decimal("0.00"), False, None)],
+    ),
+    "empty": (["a", "b"], ["INTEGER", "VARCHAR"], []),
+    "control": (["c"], ["VARCHAR"], [("a\tb",), ("\x1b[31mrosso",)]),
+}
+
+
+@pytest.mark.parametrize("table", TABLES.values(), ids=TABLES.keys())
+def test_pretty_matches_tabulate(table):
+    names, types, rows = table
+    headers = [f"{name}\n{column_type}" for name, column_type in zip(names, types)]
+    assert render_pretty(names, types, rows) == tabulate(rows, headers=headers, tablefmt="pretty")
+
+
+def test_pretty_truncates_long_values():
+    out = render_pretty(["d"], ["VARCHAR"], [("abcdefghij",)], max_col_width=4)
+    assert "abc…" in out
+    assert "abcd" not in out
+
+
+def test_csv_quotes_separators_and_line_breaks():
+    out = render_csv(["a", "b"], ["VARCHAR", "VARCHAR"], [("x,y", 'di "lui"'), ("a\nb", None)])
+    assert out == 'a,b\n"x,y","di ""lui"""\n"a\nb",'
+
+
+def test_tsv_keeps_each_row_on_one_line():
+    assert render_tsv(["a", "b"], ["VARCHAR", "VARCHAR"], [("x\ty", "1\n2")]) == "a\tb\nx y\t1 2"
+
+
+def test_markdown_escapes_pipes_and_line_breaks():
+    out = render_markdown(["a|b"], ["VARCHAR"], [("x|y\nz",)])
+    assert out == "| a\\|b |\n|---|\n| x\\|y<br>z |"
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError, match="Unknown result format"):
+        render("xml", ["a"], ["INTEGER"], [(1,)])
@@ -0,0 +1,57 @@
+import pytest
+
+from mcp_server_medicair.pagination import CursorStore
+
+
+def test_single_cursor_pool_still_paginates(make_client):
+    client = make_client(pool_size=1, max_rows=100)
+    first = client.query_result('SELECT * FROM uscite ORDER BY "Data"', session_id="a")
+    assert first.truncated
+    assert first.cursor is not None
+    assert client.pool.stats()["max_size"] == 2
+
+    served = first.row_count
+    cursor = first.cursor
+    while cursor is not None:
+        page = client.fetch_page(cursor)
+        served += page.row_count
+        cursor = page.cursor
+    assert served == 5000
+
+
+def test_pages_continue_where_the_previous_one_stopped(make_client):
+    client = make_client(pool_size=2, max_rows=10)
+    first = client.query_result("SELECT range AS i FROM range(25)", session_id="a")
+    second = client.fetch_page(first.cursor)
+    third = client.fetch_page(second.cursor)
+    assert [r[0] for r in first.rows + second.rows + third.rows] == list(range(25))
+    assert third.cursor is None
+    with pytest.raises(ValueError, match="Unknown or expired cursor"):
+        client.fetch_page(first.cursor)
+
+
+def test_session_limit_closes_its_oldest_cursor():
+    released = []
+    store = CursorStore(ttl=60, max_per_session=1, max_open=4)
+    first = store.open("a", None, ["x"], ["INTEGER"], [], 0, lambda: released.append("first"))
+    second = store.open("a", None, ["x"], ["INTEGER"], [], 0, lambda: released.append("second"))
+    assert released == ["first"]
+    assert store.take(second).token == second
+    with pytest.raises(ValueError):
+        store.take(first)
+
+
+def test_no_cursor_beyond_max_open():
+    store = CursorStore(ttl=60, max_per_session=4, max_open=1)
+    assert store.open("a", None, [], [], [], 0, lambda: None) is not None
+    assert store.open("b", None, [], [], [], 0, lambda: None) is None
+
+
+def test_close_session_releases_only_its_cursors():
+    released = []
+    store = CursorStore(ttl=60, max_per_session=4, max_open=4)
+    store.open("a", None, [], [], [], 0, lambda: released.append("a"))
+    store.open("b", None, [], [], [], 0, lambda: released.append("b"))
+    assert store.close_session("a") == 1
+    assert released == ["a"]
+    assert store.by_session() == {"b": 1}
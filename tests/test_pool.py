@@ -0,0 +1,137 @@
+import time
+
+import duckdb
+import pytest
+
+from mcp_server_medicair.database import CursorPool
+
+
+@pytest.fixture
+def connections(db_path):
+    """Roots opened on `db_path` by a pool, in order"""
+    opened = []
+
+    def connect() -> duckdb.DuckDBPyConnection:
+        opened.append(duckdb.connect(db_path))
+        return opened[-1]
+
+    connect.opened = opened
+    return connect
+
+
+def test_checked_in_cursors_are_reused(connections):
+    pool = CursorPool(connections, max_size=2)
+    first = pool.checkout()
+    second = pool.checkout()
+    assert first is not second
+    with pytest.raises(ValueError, match="Timed out waiting for a free database cursor"):
+        pool.checkout(timeout=0.05)
+
+    pool.checkin(first)
+    assert pool.checkout(timeout=0.05) is first
+    assert pool.stats() == {"size": 2, "idle": 0, "in_use": 2, "max_size": 2, "connected": True}
+    pool.checkin(first)
+    pool.checkin(second, healthy=False)
+    assert pool.stats()["size"] == 1
+    assert len(connections.opened) == 1
+
+    pool.close()
+    with pytest.raises(ValueError, match="The cursor pool is closed"):
+        pool.checkout()
+
+
+def test_unhealthy_idle_cursors_are_replaced(connections):
+    pool = CursorPool(connections, max_size=1, health_check_interval=0)
+    cursor = pool.checkout()
+    pool.checkin(cursor)
+    cursor.close()
+    replacement = pool.checkout()
+    assert replacement is not cursor
+    assert replacement.execute("SELECT count(*) FROM uscite").fetchone() == (5000,)
+    pool.checkin(replacement)
+    pool.close()
+
+
+def test_stale_root_is_reopened_once_its_cursors_are_back(connections):
+    stale = False
+    pool = CursorPool(connections, max_size=2, is_stale=lambda: stale)
+    old = pool.checkout()
+    stale = True
+    # The old root still has a cursor out, so the reopen waits for it
+    with pytest.raises(ValueError, match="Timed out"):
+        pool.checkout(timeout=0.05)
+    pool.checkin(old)
+
+    new = pool.checkout()
+    stale = False
+    assert new is not old and len(connections.opened) == 2
+    with pytest.raises(duckdb.ConnectionException):
+        old.execute("SELECT 1")
+    pool.checkin(new)
+    assert pool.stats()["size"] == 1
+    pool.close()
+
+
+def test_cursors_of_a_released_root_are_dropped_on_checkin(connections):
+    pool = CursorPool(connections, max_size=2, root_idle_timeout=0)
+    busy = pool.checkout()
+    idle = pool.checkout()
+    pool.checkin(idle)
+    # Nothing else is in use: the root and its cursors are released
+    pool.checkin(busy)
+    assert pool.stats() == {"size": 0, "idle": 0, "in_use": 0, "max_size": 2, "connected": False}
+
+    cursor = pool.checkout()
+    assert cursor.execute("SELECT count(*) FROM uscite").fetchone() == (5000,)
+    assert len(connections.opened) == 2
+    pool.checkin(cursor)
+    pool.close()
+
+
+def test_reaper_releases_an_idle_root(connections):
+    pool = CursorPool(connections, max_size=2, idle_timeout=0.05, root_idle_timeout=0.2)
+    with pool.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    deadline = time.monotonic() + 5
+    while pool.stats()["connected"] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert pool.stats() == {"size": 0, "idle": 0, "in_use": 0, "max_size": 2, "connected": False}
+
+    with pool.cursor() as cursor:
+        assert cursor.execute("SELECT count(*) FROM uscite").fetchone() == (5000,)
+    assert len(connections.opened) == 2
+    pool.close()
+    pool._reaper.join(1)
+    assert not pool._reaper.is_alive()
+
+
+@pytest.mark.parametrize(
+    "statement",
+    [
+        "SET threads = 1",
+        "RESET threads",
+        "USE system.main",
+        "CREATE TEMP TABLE scorte AS SELECT 1 AS n",
+        "/* scorte */ CREATE OR REPLACE TEMPORARY VIEW scorte AS SELECT 1 AS n",
+        "PREPARE scorte AS SELECT 1",
+        "SELECT 1; SET threads = 1",
+    ],
+)
+def test_session_state_is_refused(make_client, statement):
+    client = make_client(pool_size=1, max_cursors_per_session=0)
+    threads = client.query_result("SELECT current_setting('threads')").rows
+    with pytest.raises(ValueError, match="only apply to one of the server's pooled connections"):
+        client.query_result(statement)
+    # Nothing ran on the cursor
+    assert client.query_result("SELECT current_setting('threads')").rows == threads
+    assert client.query_result("SELECT current_database()").rows == [("medicair",)]
+    assert client.query_result("SELECT count(*) FROM duckdb_tables() WHERE temporary").rows == [(0,)]
+
+
+def test_statements_shared_by_every_cursor_run(make_client):
+    client = make_client(max_cursors_per_session=0, pool_size=2)
+    client.query_result("SET GLOBAL default_order = 'DESC'")
+    client.query_result("CREATE TABLE scorte AS SELECT unnest([1, 2, 3]) AS n")
+    with client.pool.cursor() as first, client.pool.cursor() as second:
+        for cursor in (first, second):
+            assert cursor.execute("SELECT n FROM scorte ORDER BY n").fetchall() == [(3,), (2,), (1,)]
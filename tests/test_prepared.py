@@ -0,0 +1,103 @@
+import datetime
+import decimal
+import math
+
+import duckdb
+import pytest
+
+from mcp_server_medicair.prepared import PreparedStatements, render_literal
+
+# Every type render_literal accepts, with the values that need care
+VALUES = [
+    None,
+    True,
+    False,
+    0,
+    -5,
+    2**40,
+    1.5,
+    -0.1,
+    1e300,
+    float("inf"),
+    float("-inf"),
+    decimal.Decimal("1.50"),
+    decimal.Decimal("-12345678901234.5678"),
+    decimal.Decimal("Infinity"),
+    "",
+    "it's",
+    "a\\b",
+    "ünï",
+    "line\nbreak",
+    "x'); DROP TABLE uscite; --",
+    datetime.date(2024, 2, 29),
+    datetime.datetime(2024, 1, 2, 3, 4, 5, 678901),
+    datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone(datetime.timedelta(hours=1))),
+    [1, 2, 3],
+    ["a", "b'"],
+    (1.5, 2.5),
+    [[1], [2]],
+    [],
+    {"k": 1, "j'": "x"},
+    {},
+]
+
+
+@pytest.fixture
+def conn():
+    with duckdb.connect() as conn:
+        conn.execute("SET TimeZone = 'UTC'")
+        conn.execute("PREPARE probe AS SELECT $1 AS v, typeof($1) AS t")
+        yield conn
+
+
+@pytest.mark.parametrize("value", VALUES, ids=repr)
+def test_literal_matches_native_binding(conn, value):
+    rendered = conn.execute(f"EXECUTE probe({render_literal(value)})").fetchone()
+    native = conn.execute("SELECT $1 AS v, typeof($1) AS t", [value]).fetchone()
+    assert rendered == native
+
+
+@pytest.mark.parametrize("value", [float("nan"), decimal.Decimal("NaN")], ids=repr)
+def test_nan_keeps_its_type(conn, value):
+    v, t = conn.execute(f"EXECUTE probe({render_literal(value)})").fetchone()
+    native = conn.execute("SELECT typeof($1)", [value]).fetchone()[0]
+    assert math.isnan(v) and t == native
+
+
+def test_huge_integers_stay_exact(conn):
+    assert conn.execute(f"EXECUTE probe({render_literal(2**70)})").fetchone() == (2**70, "HUGEINT")
+
+
+def test_unsupported_values_are_refused():
+    with pytest.raises(ValueError, match="NUL"):
+        render_literal("a\x00b")
+    with pytest.raises(ValueError, match="Unsupported query parameter type: bytes"):
+        render_literal(b"x")
+
+
+def test_parameters_cannot_inject_sql(make_client):
+    client = make_client(prepared_cache_size=4)
+    evil = "ART1' OR '1'='1"
+    result = client.query_result('SELECT count(*) FROM uscite WHERE "Articolo" = ?', params=[evil])
+    assert result.rows == [(0,)]
+    with pytest.raises(ValueError, match="Invalid query parameter name"):
+        client.query_result("SELECT $a", params={"a := 1) --": 1})
+
+
+def test_statements_are_reused_and_evicted():
+    statements = PreparedStatements(max_per_cursor=2)
+    with duckdb.connect() as conn:
+        assert statements.execute(conn, "SELECT ? + 1", [1]).fetchone() == (2,)
+        assert statements.execute(conn, "SELECT ? + 1;", [2]).fetchone() == (3,)
+        assert statements.execute(conn, "SELECT $x || 'b'", {"x": "a"}).fetchone() == ("ab",)
+        assert statements.execute(conn, "SELECT ? * 2", [4]).fetchone() == (8,)
+        stats = statements.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["prepared"]) == (1, 3, 1, 2)
+
+
+def test_failed_statement_is_forgotten():
+    statements = PreparedStatements(max_per_cursor=2)
+    with duckdb.connect() as conn:
+        with pytest.raises(duckdb.Error):
+            statements.execute(conn, "SELECT 1 / ?::INTEGER::UTINYINT", [-1])
+        assert statements.stats()["prepared"] == 0
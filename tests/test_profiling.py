@@ -0,0 +1,76 @@
+import duckdb
+import pytest
+
+from mcp_server_medicair import profiling
+
+QUERY = 'SELECT "Articolo", sum("Quantità") FROM uscite GROUP BY "Articolo"'
+
+
+class ErrorExplain:
+    """Cursor whose EXPLAIN ANALYZE answers like DuckDB does when it has no profile"""
+
+    def __init__(self, conn: duckdb.DuckDBPyConnection):
+        self.conn = conn
+
+    def execute(self, query: str, *args):
+        if query.startswith("EXPLAIN (ANALYZE"):
+            return self.conn.execute("""SELECT 'analyzed_plan', '{"result": "error"}'""")
+        return self.conn.execute(query, *args)
+
+
+def test_explain_on_a_file_database(make_client):
+    client = make_client()
+    profile = client.explain(QUERY)
+    assert profile.analyzed and profile.rows == 20
+    assert profile.latency > 0
+    operators = [op["operator"] for op in profile.operators()]
+    assert "TABLE_SCAN" in operators and "EXPLAIN_ANALYZE" not in operators
+    assert sum(op["rowsScanned"] or 0 for op in profile.operators()) == 5000
+
+    plan = client.explain(QUERY, analyze=False)
+    assert not plan.analyzed and plan.rows is None and plan.operators()
+
+
+def test_query_profile_on_a_file_database(make_client):
+    # One cursor, so the profiled queries run right after the EXPLAIN ANALYZE on it
+    client = make_client(max_rows=10, max_cursors_per_session=0, pool_size=1)
+    for _ in range(2):
+        client.explain(QUERY)
+        small = client.query_result(QUERY, profile=True)
+        assert small.profile is not None and small.profile.rows == 20
+        large = client.query_result("SELECT * FROM uscite", profile=True)
+        assert large.truncated and large.row_count == 10
+        assert large.profile is not None and large.profile.rows == 5000
+    assert [p.rows for p in client.profiles.list()][:3] == [5000, 20, 20]
+
+
+def test_explain_falls_back_to_the_json_profiler(db_path):
+    with duckdb.connect(db_path) as conn:
+        plan, latency, rows = profiling.explain(ErrorExplain(conn), QUERY, True)
+    assert rows == 20
+    assert latency > 0
+    assert plan[0]["operator_cardinality"] == 20
+
+
+def test_missing_profile_is_an_error(db_path):
+    with duckdb.connect(db_path) as conn:
+        with pytest.raises(ValueError, match="DuckDB did not profile the query"):
+            with profiling.capture(conn):
+                # Not read to the end
+                conn.execute("SELECT * FROM uscite").fetchone()
+        # Profiling is off again
+        assert conn.execute("SELECT current_setting('enable_profiling')").fetchone()[0] in (None, "")
+
+
+def test_pipelines_split_at_sinks_and_joins():
+    scan = {"operator_type": "TABLE_SCAN", "operator_timing": 0.5, "children": []}
+    build = {"operator_type": "TABLE_SCAN", "operator_timing": 0.25, "children": []}
+    join = {"operator_type": "HASH_JOIN", "operator_timing": 1.0, "children": [scan, build]}
+    group = {"operator_type": "HASH_GROUP_BY", "operator_timing": 2.0, "children": [join]}
+    root = {"operator_type": "PROJECTION", "operator_timing": 0.125, "children": [group]}
+    profile = profiling.ProfileLog(1).add("q", [root], analyzed=True)
+    assert profile.pipelines() == [
+        {"operators": ["TABLE_SCAN", "HASH_JOIN"], "timing": 0.25},
+        {"operators": ["TABLE_SCAN", "HASH_JOIN", "HASH_GROUP_BY"], "timing": 3.5},
+        {"operators": ["HASH_GROUP_BY", "PROJECTION"], "timing": 0.125},
+    ]
@@ -0,0 +1,118 @@
+import os
+
+import pytest
+
+boto3 = pytest.importorskip("boto3")
+moto_server = pytest.importorskip("moto.server")
+
+import duckdb
+
+from mcp_server_medicair import s3
+from mcp_server_medicair.database import DatabaseClient
+from mcp_server_medicair.s3 import S3Options
+
+BUCKET = "medicair"
+
+
+@pytest.fixture(scope="module")
+def s3_endpoint():
+    """A moto S3 server, standing in for S3 or MinIO"""
+    server = moto_server.ThreadedMotoServer(ip_address="127.0.0.1", port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    yield f"http://{host}:{port}"
+    server.stop()
+
+
+@pytest.fixture
+def s3_env(s3_endpoint, monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setenv("AWS_ENDPOINT_URL", s3_endpoint)
+    return s3_endpoint
+
+
+@pytest.fixture
+def s3_db_path(s3_env, db_path) -> str:
+    client = boto3.client("s3", endpoint_url=s3_env)
+    client.create_bucket(Bucket=BUCKET)
+    client.upload_file(db_path, BUCKET, "medicair.duckdb")
+    return f"s3://{BUCKET}/medicair.duckdb"
+
+
+def _httpfs_or_skip(conn: duckdb.DuckDBPyConnection, options: S3Options):
+    try:
+        return s3.configure(conn, options)
+    except duckdb.Error as e:
+        error = e
+    # Without access to the extension repository, install it from its PyPI package
+    try:
+        import duckdb_extension_httpfs
+
+        extension = os.path.join(
+            os.path.dirname(duckdb_extension_httpfs.__file__),
+            "extensions",
+            f"v{duckdb.__version__}",
+            "httpfs.duckdb_extension",
+        )
+        conn.execute(f"INSTALL '{extension}'")
+        return s3.configure(conn, options)
+    except (ImportError, duckdb.Error):
+        pytest.skip(f"httpfs extension not available: {error}")
+
+
+def test_secret_points_at_the_endpoint_with_path_style_urls(s3_env):
+    conn = duckdb.connect()
+    _httpfs_or_skip(conn, S3Options())
+    s3.create_secret(conn)
+    secret = conn.execute("SELECT secret_string FROM duckdb_secrets() WHERE name = 's3_secret'").fetchone()[0]
+    assert f"endpoint={s3_env.removeprefix('http://')}" in secret
+    assert "url_style=path" in secret
+    assert "use_ssl=false" in secret
+
+
+def test_performance_settings_are_applied(s3_env):
+    conn = duckdb.connect()
+    options = S3Options(http_keep_alive=False, http_timeout=12, http_retries=5, threads=2)
+    assert _httpfs_or_skip(conn, options) is False
+    settings = dict(
+        conn.execute(
+            "SELECT name, value FROM duckdb_settings() WHERE name IN "
+            "('http_keep_alive', 'http_timeout', 'http_retries', 'threads', 'enable_http_metadata_cache')"
+        ).fetchall()
+    )
+    assert settings == {
+        "http_keep_alive": "false",
+        "http_timeout": "12",
+        "http_retries": "5",
+        "threads": "2",
+        "enable_http_metadata_cache": "true",
+    }
+
+
+def test_database_on_s3_is_attached_and_queried(s3_db_path):
+    _httpfs_or_skip(duckdb.connect(), S3Options())
+    client = DatabaseClient(
+        db_path=s3_db_path,
+        s3_options=S3Options(http_timeout=10, http_retries=1, prefetch=False),
+        result_cache_size=0,
+    )
+    try:
+        assert {"httpfs", "attach s3"} <= set(client.setup_timings)
+        result = client.query_result('SELECT count(*) AS n, sum("Quantità") AS q FROM uscite')
+        assert result.rows == [(5000, sum(i % 7 for i in range(5000)))]
+        assert [t.name for t in client.catalog.tables()] == ["uscite"]
+    finally:
+        client.pool.close()
+        client.conn.close()
+
+
+def test_prefetch_reads_every_table(s3_db_path, caplog):
+    conn = duckdb.connect()
+    _httpfs_or_skip(conn, S3Options())
+    s3.create_secret(conn)
+    conn.execute(f"ATTACH '{s3_db_path}' AS s3db (READ_ONLY)")
+    with caplog.at_level("INFO", logger="mcp_server_medicair"):
+        s3.prefetch(conn, [("s3db", "main", "uscite")])
+    assert "Prefetched main.uscite" in caplog.text
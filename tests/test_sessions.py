@@ -0,0 +1,189 @@
+import json
+
+import anyio
+import pytest
+from mcp.types import JSONRPCMessage, JSONRPCResponse
+from starlette.testclient import TestClient
+
+from mcp_server_medicair import create_app, main
+from mcp_server_medicair.events import MemoryEventStore, SQLiteEventStore, handle_scoped
+from mcp_server_medicair.sessions import SessionRegistry
+from mcp_server_medicair.workers import WORKER_OPTIONS_ENV
+
+HEADERS = {"Accept": "application/json, text/event-stream", "Content-Type": "application/json"}
+INITIALIZE = {
+    "jsonrpc": "2.0",
+    "id": 1,
+    "method": "initialize",
+    "params": {"protocolVersion": "2025-06-18", "capabilities": {}, "clientInfo": {"name": "test", "version": "1"}},
+}
+QUERY = {
+    "jsonrpc": "2.0",
+    "id": 2,
+    "method": "tools/call",
+    "params": {"name": "query", "arguments": {"query": "SELECT 41 + 1 AS risposta"}},
+}
+
+
+def test_registry_accounts_each_session():
+    registry = SessionRegistry(idle_timeout=None, on_close=lambda session_id: None)
+    registry.record("a", 0.5, 100, failed=False)
+    registry.record("a", 0.25, None, failed=True)
+    registry.record("b", 1.0, 10, failed=False)
+    usage = {u.session_id: (u.calls, u.errors, u.seconds, u.bytes) for u in registry.sessions()}
+    assert usage == {"a": (2, 1, 0.75, 100), "b": (1, 0, 1.0, 10)}
+
+
+def test_idle_sessions_are_released():
+    closed = []
+
+    def on_close(session_id):
+        closed.append(session_id)
+        raise RuntimeError("already gone")
+
+    registry = SessionRegistry(idle_timeout=60, on_close=on_close)
+    registry.record("idle", 0.1, 1, failed=False)
+    registry.record("active", 0.1, 1, failed=False)
+    next(u for u in registry.sessions() if u.session_id == "idle").last_seen -= 61
+    assert len(registry) == 1
+    assert closed == ["idle"]
+    assert [u.session_id for u in registry.sessions()] == ["active"]
+
+
+def _message(request_id: int) -> JSONRPCMessage:
+    return JSONRPCMessage(JSONRPCResponse(jsonrpc="2.0", id=request_id, result={"n": request_id}))
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(max_events: int):
+        if request.param == "memory":
+            return MemoryEventStore(max_events)
+        return SQLiteEventStore(str(tmp_path / "events.sqlite"), max_events)
+
+    return make
+
+
+async def _store_in_session(store, session_id: str | None, events: list[tuple[str, int | None]]) -> list[str]:
+    """Store `events` while handling a request of `session_id` (None: a request creating session "new")"""
+    ids = []
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"mcp-session-id", b"new")]})
+        for stream_id, request_id in events:
+            ids.append(await store.store_event(stream_id, None if request_id is None else _message(request_id)))
+
+    async def send(message):
+        pass
+
+    headers = [] if session_id is None else [(b"mcp-session-id", session_id.encode())]
+    await handle_scoped(app, {"type": "http", "headers": headers}, None, send)
+    return ids
+
+
+async def _replay(store, last_event_id: str) -> tuple[str | None, list[tuple[str, int]]]:
+    replayed = []
+
+    async def callback(event):
+        replayed.append((event.event_id, event.message.root.id))
+
+    return await store.replay_events_after(last_event_id, callback), replayed
+
+
+@pytest.mark.anyio
+async def test_replay_stays_in_its_session(make_store):
+    store = make_store(100)
+    # Stream ids are request ids: both sessions have a stream "1"
+    a = await _store_in_session(store, "a", [("1", None), ("1", 10), ("2", 20), ("1", 11)])
+    b = await _store_in_session(store, "b", [("1", None), ("1", 30)])
+    new = await _store_in_session(store, None, [("1", 40)])
+    assert await _replay(store, a[0]) == ("1", [(a[1], 10), (a[3], 11)])
+    assert await _replay(store, b[0]) == ("1", [(b[1], 30)])
+    assert await _replay(store, a[3]) == ("1", [])
+    assert await _replay(store, new[0]) == ("1", [])
+    assert await _replay(store, "not-an-id") == (None, [])
+    assert await _replay(store, "999") == (None, [])
+
+
+@pytest.mark.anyio
+async def test_evicted_events_cannot_be_resumed(make_store):
+    store = make_store(3)
+    ids = await _store_in_session(store, "a", [("1", i) for i in range(5)])
+    assert await _replay(store, ids[0]) == (None, [])
+    assert await _replay(store, ids[2]) == ("1", [(ids[3], 3), (ids[4], 4)])
+    assert store.stats()["events"] == 3
+
+
+@pytest.mark.anyio
+async def test_session_id_reaches_tasks_spawned_by_the_request():
+    """The session's message router is spawned while handling its first request, before the id is known"""
+    store = MemoryEventStore(10)
+    ids = []
+
+    async def app(scope, receive, send):
+        async with anyio.create_task_group() as tasks:
+            ready = anyio.Event()
+
+            async def router():
+                await ready.wait()
+                ids.append(await store.store_event("1", _message(1)))
+
+            tasks.start_soon(router)
+            await send({"type": "http.response.start", "status": 200, "headers": [(b"mcp-session-id", b"s")]})
+            ready.set()
+
+    async def send(message):
+        pass
+
+    await handle_scoped(app, {"type": "http", "headers": []}, None, send)
+    later = await _store_in_session(store, "s", [("1", 2)])
+    assert await _replay(store, ids[0]) == ("1", [(later[0], 2)])
+
+
+@pytest.fixture
+def stream_app(db_path, tmp_path, monkeypatch):
+    """The `stream` server's ASGI app for the given command line options"""
+
+    def make(*args: str):
+        ctx = main.make_context(
+            "mcp-server-medicair",
+            ["--transport", "stream", "--db-path", db_path, "--no-summaries", "--no-templates", *args],
+        )
+        monkeypatch.setenv(WORKER_OPTIONS_ENV, json.dumps({"options": ctx.params, "metrics_dir": str(tmp_path)}))
+        return create_app()
+
+    return make
+
+
+def _post(client: TestClient, body: dict, session_id: str | None = None):
+    headers = HEADERS if session_id is None else {**HEADERS, "mcp-session-id": session_id}
+    response = client.post("/mcp/", json=body, headers=headers)
+    data = [line[len("data: ") :] for line in response.text.splitlines() if line.startswith("data: ")]
+    if data:
+        return response, json.loads(data[0])
+    # Notifications are only acknowledged
+    return response, response.json() if response.content else None
+
+
+def test_stateful_sessions_are_kept_and_limited(stream_app):
+    with TestClient(stream_app("--stateful", "--max-sessions", "1")) as client:
+        response, _ = _post(client, INITIALIZE)
+        session_id = response.headers["mcp-session-id"]
+        _post(client, {"jsonrpc": "2.0", "method": "notifications/initialized"}, session_id)
+        response, message = _post(client, QUERY, session_id)
+        assert "42" in message["result"]["content"][0]["text"]
+        # Resumable: the result was stored as an event of the session's stream
+        assert "id: " in response.text
+
+        response, message = _post(client, INITIALIZE)
+        assert response.status_code == 503
+        assert message["error"]["message"] == "Too many open sessions"
+
+
+def test_stateless_requests_open_no_session(stream_app):
+    with TestClient(stream_app("--max-sessions", "1")) as client:
+        for _ in range(3):
+            response, message = _post(client, INITIALIZE)
+            assert response.status_code == 200 and "mcp-session-id" not in response.headers
+        _, message = _post(client, QUERY)
+        assert "42" in message["result"]["content"][0]["text"]
@@ -0,0 +1,86 @@
+from contextlib import contextmanager
+
+import duckdb
+import pytest
+
+from mcp_server_medicair.summaries import SummaryDefinition, SummaryStore
+
+DEFINITION = SummaryDefinition(
+    name="riepilogo_uscite",
+    query="""
+        SELECT "Articolo", "Magazzino", sum("Quantità") AS uscite, count(*) AS righe
+        FROM uscite
+        GROUP BY "Articolo", "Magazzino"
+    """,
+)
+
+# Queries answered by the summary, with their own aliases or none
+MATCHING = [
+    'SELECT "Articolo", "Magazzino", sum("Quantità") AS uscite, count(*) AS righe FROM uscite GROUP BY "Articolo", "Magazzino" ORDER BY 1, 2',
+    'SELECT "Articolo", "Magazzino", sum("Quantità"), count(*) FROM uscite GROUP BY "Articolo", "Magazzino" ORDER BY 1, 2',
+    'SELECT articolo, magazzino, SUM("Quantità") AS totale, COUNT(*) FROM uscite GROUP BY 1, 2 ORDER BY 3 DESC, 1, 2 LIMIT 5',
+    'SELECT "Articolo", "Magazzino", sum("Quantità"), count(*) AS n FROM uscite WHERE "Magazzino" = \'MAG1\' GROUP BY "Articolo", "Magazzino" ORDER BY "Articolo"',
+]
+
+
+@pytest.fixture
+def store(db_path):
+    conn = duckdb.connect(db_path, read_only=True)
+
+    @contextmanager
+    def connection():
+        cursor = conn.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+    store = SummaryStore([DEFINITION], connection, lambda: 1)
+    store.refresh()
+    yield store, conn
+    store.close()
+    conn.close()
+
+
+@pytest.mark.parametrize("query", MATCHING)
+def test_rewritten_query_returns_the_same_columns_and_rows(store, query):
+    store, conn = store
+    rewritten = store.rewrite(query)
+    assert rewritten is not None and "riepilogo_uscite" in rewritten
+
+    original = conn.execute(query)
+    expected_names = [d[0] for d in original.description]
+    expected_rows = original.fetchall()
+    summary = store.cursor().execute(rewritten)
+    assert [d[0] for d in summary.description] == expected_names
+    assert summary.fetchall() == expected_rows
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        # Filter on an aggregated column, lost in the summary
+        'SELECT "Articolo", "Magazzino", sum("Quantità") AS uscite, count(*) AS righe FROM uscite WHERE "Quantità" > 2 GROUP BY "Articolo", "Magazzino"',
+        # Different aggregate
+        'SELECT "Articolo", "Magazzino", max("Quantità") AS uscite, count(*) AS righe FROM uscite GROUP BY "Articolo", "Magazzino"',
+        # Coarser grouping
+        'SELECT "Articolo", sum("Quantità") AS uscite FROM uscite GROUP BY "Articolo"',
+    ],
+)
+def test_other_queries_are_not_rewritten(store, query):
+    store, _ = store
+    assert store.rewrite(query) is None
+
+
+def test_stale_summary_is_not_used(db_path):
+    version = [1]
+    conn = duckdb.connect(db_path, read_only=True)
+    store = SummaryStore([DEFINITION], lambda: contextmanager(lambda: iter([conn.cursor()]))(), lambda: version[0])
+    try:
+        store.refresh()
+        assert store.rewrite(MATCHING[0]) is not None
+        version[0] = 2
+        assert store.rewrite(MATCHING[0]) is None
+    finally:
+        store.close()
+        conn.close()
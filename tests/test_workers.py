@@ -0,0 +1,92 @@
+import json
+import os
+import time
+
+import pytest
+
+from mcp_server_medicair.metrics import Histogram
+from mcp_server_medicair.routing import DatabaseConfig
+from mcp_server_medicair.workers import WorkerMetrics, check_worker_options
+
+
+def _families(queries: float, in_flight: float, latencies: list[float]):
+    histogram = Histogram((0.1, 1.0))
+    for value in latencies:
+        histogram.observe(value)
+    return {
+        "queries_total": ("counter", [({"status": "ok"}, queries)]),
+        "queries_in_flight": ("gauge", [({}, in_flight)]),
+        "query_seconds": ("histogram", [({}, histogram)]),
+    }
+
+
+def _write_snapshot(directory, pid: int, families, age: float = 0.0):
+    metrics = WorkerMetrics(str(directory))
+    metrics.path = os.path.join(directory, f"{pid}.json")
+    metrics._write(families)
+    if age:
+        stamp = time.time() - age
+        os.utime(metrics.path, (stamp, stamp))
+
+
+def test_merge_sums_counters_and_labels_gauges(tmp_path):
+    _write_snapshot(tmp_path, 1001, _families(3, 2, [0.05, 5.0]))
+    _write_snapshot(tmp_path, 1002, _families(4, 1, [0.5]))
+    # Killed without removing its snapshot
+    _write_snapshot(tmp_path, 1003, _families(100, 9, [0.05]), age=60)
+    (tmp_path / "1004.json.tmp").write_text("{")
+    (tmp_path / "1005.json").write_text("not json")
+
+    merged = WorkerMetrics(str(tmp_path), interval=1).merge(_families(1, 5, [0.05]))
+
+    assert merged["queries_total"] == ("counter", [({"status": "ok"}, 8)])
+    kind, gauges = merged["queries_in_flight"]
+    assert kind == "gauge"
+    assert sorted((labels["worker"], value) for labels, value in gauges) == sorted(
+        [("1001", 2), ("1002", 1), (str(os.getpid()), 5)]
+    )
+    ((_, histogram),) = merged["query_seconds"][1]
+    assert histogram.counts == [2, 1, 1] and histogram.count == 4
+    assert histogram.sum == pytest.approx(5.6)
+    assert merged["workers"] == ("gauge", [({}, 3)])
+
+
+def test_stop_removes_the_snapshot(tmp_path):
+    metrics = WorkerMetrics(str(tmp_path), interval=0.05)
+    metrics.start(lambda: _families(1, 1, []))
+    deadline = time.monotonic() + 5
+    while not os.path.exists(metrics.path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    with open(metrics.path) as f:
+        assert json.load(f)["queries_total"] == ["counter", [[{"status": "ok"}, 1]]]
+    metrics.stop()
+    assert not os.path.exists(metrics.path)
+
+
+@pytest.mark.parametrize(
+    "transport, stateful, mirror, message",
+    [
+        ("sse", False, False, "only supported with the `stream` transport"),
+        ("stdio", False, False, "only supported with the `stream` transport"),
+        ("stream", True, False, "can't be combined with --stateful"),
+        ("stream", False, True, "can't be combined with --mirror"),
+    ],
+)
+def test_worker_options_are_refused(transport, stateful, mirror, message):
+    with pytest.raises(ValueError, match=message):
+        check_worker_options(transport, stateful, mirror, "medicair.duckdb", False, [])
+
+
+def test_local_files_are_opened_read_only():
+    databases = [
+        DatabaseConfig(name="magazzino", db_path="/data/magazzino.duckdb"),
+        DatabaseConfig(name="cloud", db_path="md:medicair", read_only=False),
+        DatabaseConfig(name="archivio", db_path="s3://medicair/archivio.duckdb"),
+    ]
+    read_only, adjusted = check_worker_options("stream", False, False, "medicair.duckdb", False, databases)
+    assert read_only
+    assert [d.read_only for d in adjusted] == [True, False, None]
+
+    for db_path in ("md:medicair", "s3://medicair/db.duckdb", ":memory:"):
+        read_only, _ = check_worker_options("stream", False, False, db_path, False, [])
+        assert not read_only